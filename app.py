@@ -3,37 +3,78 @@ Dashboard Northwind avec 10 KPIs obligatoires + ML Clustering
 Architecture modulaire avec thème sombre moderne et navigation multi-pages
 """
 
+import os
+from startup_timeline import timeline
+
+# Chronologie du démarrage (affichée à la fin du module, DASHBOARD_STARTUP_TIMELINE=text|json|off)
+timeline.start()
+
+import pandas as pd
+timeline.lap('import.pandas')
+
+# Sous gunicorn, dash est déjà importé sans IPython (gunicorn.conf.py, lazy_imports)
 import dash
 import dash_bootstrap_components as dbc
 from dash import html, dcc
-from data_model import DataModel
+timeline.lap('import.dash')
+
+from data_model import create_data_model
 from components import create_kpi_card, create_graph_card, create_header, create_filters
-from callbacks import register_callbacks
+from callbacks import (BUSY_ALERT, DASHBOARD_BUSY_MESSAGE, RETRY_INTERVAL, RETRY_INTERVAL_MS, TOP_K,
+                       register_callbacks)
+from clientside import create_clientside_payload, register_clientside_callbacks, register_navigation_callback
 from styles import CUSTOM_CSS
-import joblib
-import pandas as pd
-import numpy as np
+from model_bundle import BUNDLE_PATH, load_bundle
+from transport import cache_layout_response, enable_compression
+from request_coalescing import create_coalescer, register_tab_id_callback, tab_id_store
+from compute_pool import create_compute_pool
+from cache_backend import create_cache
+from profiling import create_profiler
+from distinct_sketch import create_distinct_sketches
+from instrumentation import (cache_collector, compute_pool_collector, create_metrics, data_model_collector,
+                             distinct_sketch_collector, install_metrics_endpoint, process_memory_collector)
+from static_assets import FINGERPRINTED_RE, install_cache_headers, load_manifest, stylesheet_urls
+timeline.lap('import.modules')
+
+# Mode filtrage côté navigateur (opt-in, pour les jeux de données petits et moyens)
+CLIENTSIDE_MODE = os.environ.get('DASHBOARD_CLIENTSIDE', '0') == '1'
+
+# Initialiser le modèle de données (DASHBOARD_PARTITIONS=1 : historique partitionné par mois)
+data_model = create_data_model()
+timeline.lap('data_model')
 
-# Initialiser le modèle de données
-data_model = DataModel()
+# Tables pré-agrégées du mode navigateur ; trop grosses (DASHBOARD_CLIENTSIDE_MAX_KB) : calcul serveur
+clientside_payload = None
+if CLIENTSIDE_MODE:
+    with timeline.phase('clientside_payload'):
+        clientside_payload = create_clientside_payload(data_model)
+    CLIENTSIDE_MODE = clientside_payload is not None
 
-# Charger le modèle de clustering
+# Charger le modèle de clustering (bundle NumPy en priorité, sinon artefacts joblib)
 try:
-    model_artifacts = joblib.load('models/customer_clustering_model.pkl')
-    cluster_data = pd.read_csv('data/enriched/customer_clusters.csv')
-    print("✅ Modèle de clustering chargé avec succès")
+    with timeline.phase('model_artifacts'):
+        if BUNDLE_PATH.exists():
+            model_artifacts = load_bundle(BUNDLE_PATH)
+        else:
+            # Anciens artefacts : joblib (et sklearn, au dépickling) seulement dans ce cas
+            import joblib
+            model_artifacts = joblib.load('models/customer_clustering_model.pkl')
+    with timeline.phase('cluster_csv'):
+        cluster_data = pd.read_csv('data/enriched/customer_clusters.csv')
 except Exception as e:
     print(f"⚠️  Modèle de clustering non disponible: {e}")
     model_artifacts = None
     cluster_data = None
+timeline.lap('model')
+
+# Feuilles de style auto-hébergées (python static_assets.py), sinon CDN
+asset_manifest = load_manifest()
 
 # Initialiser l'application Dash avec thème Bootstrap
 app = dash.Dash(
     __name__,
-    external_stylesheets=[
-        dbc.themes.BOOTSTRAP,
-        "https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css"
-    ],
+    external_stylesheets=stylesheet_urls(asset_manifest),
+    assets_ignore=FINGERPRINTED_RE,  # fichiers de assets/vendor inclus via external_stylesheets
     suppress_callback_exceptions=True
 )
 
@@ -42,7 +83,15 @@ app.title = "Dashboard Northwind - 10 KPIs"
 # Exposer le serveur Flask pour Gunicorn
 server = app.server
 
-# Injecter le CSS personnalisé
+# Compression brotli/gzip des réponses (désactivable avec DASHBOARD_COMPRESS=0)
+if os.environ.get('DASHBOARD_COMPRESS', '1') == '1':
+    enable_compression(server)
+
+# Cache long pour les fichiers avec empreinte de assets/vendor
+install_cache_headers(server)
+
+# Injecter le CSS personnalisé (inline seulement si le build des assets n'a pas été lancé)
+custom_style = '' if 'custom' in asset_manifest else f'<style>{CUSTOM_CSS}</style>'
 app.index_string = f'''
 <!DOCTYPE html>
 <html>
@@ -51,7 +100,7 @@ app.index_string = f'''
         <title>{{%title%}}</title>
         {{%favicon%}}
         {{%css%}}
-        <style>{CUSTOM_CSS}</style>
+        {custom_style}
     </head>
     <body>
         {{%app_entry%}}
@@ -63,12 +112,15 @@ app.index_string = f'''
     </body>
 </html>
 '''
+timeline.lap('dash_app')
 
 # Récupérer les données pour les filtres
-countries = sorted(data_model.full_dataset['country'].dropna().unique())
-categories = sorted(data_model.full_dataset['categoryName'].dropna().unique())
-min_date = data_model.full_dataset['orderDate'].min()
-max_date = data_model.full_dataset['orderDate'].max()
+filter_options = data_model.get_filter_options()
+countries = filter_options['countries']
+categories = filter_options['categories']
+min_date = filter_options['min_date']
+max_date = filter_options['max_date']
+timeline.lap('filter_options')
 
 # Définir les labels des clusters
 cluster_labels = {
@@ -81,9 +133,16 @@ cluster_labels = {
 
 # Layout Dashboard principal
 dashboard_layout = html.Div([
+    # Empreintes des agrégats déjà affichés (mises à jour partielles du callback unique)
+    dcc.Store(id='dashboard-signatures', data={}),
+    
     # Section filtres
     create_filters(countries, categories, min_date, max_date),
     
+    # File de calcul pleine : alerte et nouvel essai automatique (activés par les callbacks)
+    dbc.Alert(DASHBOARD_BUSY_MESSAGE, id=BUSY_ALERT, color="warning", is_open=False),
+    dcc.Interval(id=RETRY_INTERVAL, interval=RETRY_INTERVAL_MS, disabled=True),
+    
     # Section KPIs (1-5)
     dbc.Row([
         dbc.Col(create_kpi_card(1, "Chiffre d'Affaires Total", html.Span(id='kpi-ca'), "dollar-sign", 'primary'), md=12, lg=2, className="mb-3"),
@@ -194,6 +253,14 @@ app.layout = html.Div([
     # URL pour la navigation
     dcc.Location(id='url', refresh=False),
     
+    # Tables pré-agrégées envoyées une seule fois au navigateur (mode clientside), et
+    # demande / réponse du calcul serveur des périodes qui coupent un mois
+    dcc.Store(id='dashboard-data', data=clientside_payload),
+    dcc.Store(id='clientside-fallback-request'),
+    dcc.Store(id='clientside-fallback-result'),
+    # Identifiant de l'onglet (regroupement des rafales de filtres), tiré par le navigateur
+    tab_id_store(),
+    
     # Header avec navigation
     html.Div([
         dbc.Container([
@@ -221,8 +288,12 @@ app.layout = html.Div([
     
     # Container principal
     dbc.Container([
-        # Contenu de la page
-        html.Div(id='page-content')
+        # Contenu des pages (toutes montées, affichées selon l'URL par assets/navigation.js)
+        html.Div([
+            html.Div(dashboard_layout, id='page-dashboard'),
+            html.Div(prediction_layout, id='page-prediction', style={'display': 'none'}),
+            html.Div(clusters_layout, id='page-clusters', style={'display': 'none'})
+        ], id='page-content')
     ], fluid=True, style={'padding': '2rem'}),
     
     # Footer
@@ -236,17 +307,70 @@ app.layout = html.Div([
         ], fluid=True)
     ])
 ])
+timeline.lap('layout')
+
+# Layout statique : sérialisé une seule fois, navigation gérée dans le navigateur
+cache_layout_response(app)
+register_navigation_callback(app)
 
-# Enregistrer tous les callbacks
-register_callbacks(app, data_model)
+# Pool de calcul partagé par les threads du worker (COMPUTE_POOL=1, cf. gunicorn.conf.py)
+compute_pool = create_compute_pool()
 
-# Enregistrer les callbacks ML si le modèle est disponible
+# Latence par phase des callbacks, caches et mémoire exposés sur /metrics (DASHBOARD_METRICS=0 pour désactiver)
+metrics = create_metrics()
+if metrics is not None:
+    metrics.add_collector(data_model_collector(data_model))
+    metrics.add_collector(timeline.collector)
+    metrics.add_collector(process_memory_collector())
+    if compute_pool is not None:
+        metrics.add_collector(compute_pool_collector(compute_pool))
+
+# Enregistrer tous les callbacks (calcul serveur ou navigateur)
+if CLIENTSIDE_MODE:
+    register_clientside_callbacks(app, data_model, compute_pool=compute_pool, metrics=metrics)
+else:
+    register_tab_id_callback(app)
+    with timeline.phase('result_cache'):
+        result_cache = create_cache()
+    # Classements mensuels Top Produits / Top Clients construits avant le fork (partagés avec --preload)
+    # En mode partitionné, ils chargeraient tout l'historique : classement sur les lignes filtrées
+    if data_model.partitions is None:
+        for column in TOP_K:
+            data_model.top_k_index(column)
+    # Commandes et clients distincts estimés (DASHBOARD_DISTINCT=approx)
+    with timeline.phase('distinct_sketches'):
+        sketches = create_distinct_sketches(data_model)
+    register_callbacks(app, data_model, coalescer=create_coalescer(), compute_pool=compute_pool,
+                       cache=result_cache, metrics=metrics, sketches=sketches)
+    if metrics is not None and result_cache is not None:
+        metrics.add_collector(cache_collector(result_cache))
+    if metrics is not None and sketches is not None:
+        metrics.add_collector(distinct_sketch_collector(sketches))
+timeline.lap('callbacks')
+
+# Enregistrer les callbacks ML et l'API de recherche si le modèle est disponible
 if model_artifacts is not None:
     from ml_callbacks import register_ml_callbacks
-    register_ml_callbacks(app, data_model, model_artifacts, cluster_data)
+    from cluster_lookup import ClusterLookup, register_cluster_api
+    
+    with timeline.phase('cluster_lookup'):
+        cluster_lookup = ClusterLookup(cluster_data, data_model.get_customer_features(), model_artifacts, cluster_labels)
+    register_ml_callbacks(app, data_model, model_artifacts, cluster_data, cluster_lookup, compute_pool, metrics)
+    register_cluster_api(server, cluster_lookup)
+timeline.lap('ml_callbacks')
+
+if metrics is not None:
+    install_metrics_endpoint(app, metrics)
+
+# Profils des requêtes lentes ou tirées au sort (DASHBOARD_PROFILE=1)
+profiler = create_profiler()
+if profiler is not None:
+    profiler.install(app)
+timeline.lap('observability')
+timeline.finish()
 
 if __name__ == '__main__':
     print("🚀 Lancement du dashboard Northwind...")
-    print(f"📊 Données chargées: {len(data_model.full_dataset)} lignes")
+    print(f"📊 Données chargées: {len(data_model.partitions or data_model.full_dataset)} lignes")
     print("🌐 Accéder à: http://127.0.0.1:8050")
     app.run_server(debug=True)
@@ -0,0 +1,328 @@
+/*
+ * Callbacks clientside du dashboard Northwind
+ * Recalcule les 10 KPIs dans le navigateur à partir des tables pré-agrégées (mois x pays x
+ * catégorie) construites par clientside.build_clientside_payload (mode DASHBOARD_CLIENTSIDE=1) ;
+ * une période qui coupe un mois est calculée par le serveur (dashboard_fallback)
+ */
+
+(function () {
+    'use strict';
+
+    function formatInt(value) {
+        return Math.round(value).toLocaleString('en-US');
+    }
+
+    function formatMoney(value, decimals) {
+        return '$' + value.toLocaleString('en-US', {
+            minimumFractionDigits: decimals,
+            maximumFractionDigits: decimals
+        });
+    }
+
+    function hexToRgba(hex, alpha) {
+        var r = parseInt(hex.slice(1, 3), 16);
+        var g = parseInt(hex.slice(3, 5), 16);
+        var b = parseInt(hex.slice(5, 7), 16);
+        return 'rgba(' + r + ', ' + g + ', ' + b + ', ' + alpha + ')';
+    }
+
+    // Masque des codes autorisés pour une dimension (null = pas de filtre)
+    function codeMask(labels, selected) {
+        if (!selected || selected.length === 0) {
+            return null;
+        }
+        var wanted = new Set(selected);
+        return labels.map(function (label) { return wanted.has(label); });
+    }
+
+    // Top N d'un tableau de sommes indexé par code, trié comme nlargest()
+    function topN(sums, seen, labels, n) {
+        var entries = [];
+        for (var i = 0; i < sums.length; i++) {
+            if (seen[i]) {
+                entries.push([labels[i], sums[i]]);
+            }
+        }
+        entries.sort(function (a, b) { return b[1] - a[1]; });
+        return entries.slice(0, n);
+    }
+
+    function makeLayout(theme, extra) {
+        var layout = JSON.parse(JSON.stringify(theme.layout));
+        Object.keys(extra).forEach(function (key) {
+            if (key === 'xaxis_title' || key === 'yaxis_title') {
+                var axis = key.split('_')[0];
+                layout[axis] = Object.assign({}, layout[axis], {title: {text: extra[key]}});
+            } else if (key === 'title') {
+                layout.title = {text: extra.title};
+            } else {
+                layout[key] = extra[key];
+            }
+        });
+        return layout;
+    }
+
+    // Clé d'un état de filtres (demande au serveur et réponse comparées sur cette clé)
+    function filterKey(startDay, endDay, countries, categories) {
+        return JSON.stringify([startDay, endDay, countries || [], categories || []]);
+    }
+
+    function day(date) {
+        return date ? date.slice(0, 10) : null;
+    }
+
+    function updateDashboard(startDate, endDate, countries, categories, payload) {
+        var noUpdate = window.dash_clientside.no_update;
+        if (!payload) {
+            return new Array(11).fill(noUpdate);
+        }
+
+        var dims = payload.dims;
+        var theme = payload.theme;
+        var colors = theme.colors;
+
+        // Mois retenus : ceux que la période couvre entièrement (comme MonthIndex.coverage) ;
+        // un mois coupé ne peut pas être lu au grain mensuel, le serveur calcule cet état.
+        // Les lignes sans date (mois -1) ne sont gardées que sans filtre de dates.
+        var startDay = day(startDate), endDay = day(endDate);
+        var dated = !!(startDay || endDay);
+        var nMonths = dims.month.length;
+        var monthOk = new Uint8Array(nMonths);
+        for (var j = 0; j < nMonths; j++) {
+            var first = payload.month_first[j], last = payload.month_last[j];
+            var inside = (!startDay || first >= startDay) && (!endDay || last <= endDay);
+            var touched = (!startDay || last >= startDay) && (!endDay || first <= endDay);
+            if (touched && !inside) {
+                var request = {
+                    key: filterKey(startDay, endDay, countries, categories),
+                    filters: [startDay, endDay, countries, categories]
+                };
+                return new Array(10).fill(noUpdate).concat([request]);
+            }
+            monthOk[j] = inside ? 1 : 0;
+        }
+        var countryOk = codeMask(dims.country, countries);
+        var categoryOk = codeMask(dims.category, categories);
+        var categoryBits = 0;
+        if (categoryOk) {
+            categoryOk.forEach(function (ok, c) { if (ok) categoryBits |= 1 << c; });
+        }
+
+        // Valeurs manquantes (code -1) : exclues par un filtre et des groupby, comme côté serveur
+        function keep(m, co, ca) {
+            if (m < 0 ? dated : !monthOk[m]) return false;
+            if (countryOk && !countryOk[co]) return false;
+            if (categoryOk && ca !== undefined && !categoryOk[ca]) return false;
+            return true;
+        }
+
+        var revenueByMonth = new Float64Array(nMonths);
+        var ordersByMonth = new Float64Array(nMonths);
+        var monthSeen = new Uint8Array(nMonths);
+        var revenueByProduct = new Float64Array(dims.product.length);
+        var productSeen = new Uint8Array(dims.product.length);
+        var revenueByCountry = new Float64Array(dims.country.length);
+        var countrySeen = new Uint8Array(dims.country.length);
+        var revenueByCustomer = new Float64Array(dims.customer.length);
+        var customerNameSeen = new Uint8Array(dims.customer.length);
+        var customerSeen = new Uint8Array(payload.n_customer_ids);
+
+        var revenue = 0, quantity = 0, nOrders = 0, nCustomers = 0;
+        var i, m, co, r;
+
+        // CA et quantités : produit x catégorie x mois x pays
+        var p = payload.products;
+        for (i = 0; i < p.revenue.length; i++) {
+            m = p.month[i]; co = p.country[i];
+            if (!keep(m, co, p.category[i])) continue;
+            r = p.revenue[i];
+            revenue += r;
+            quantity += p.quantity[i];
+            if (m >= 0) {
+                revenueByMonth[m] += r;
+                monthSeen[m] = 1;
+            }
+            if (p.product[i] >= 0) {
+                revenueByProduct[p.product[i]] += r;
+                productSeen[p.product[i]] = 1;
+            }
+            if (co >= 0) {
+                revenueByCountry[co] += r;
+                countrySeen[co] = 1;
+            }
+        }
+
+        // Clients uniques (customerID) et CA par client (companyName)
+        var c = payload.customers;
+        for (i = 0; i < c.revenue.length; i++) {
+            if (!keep(c.month[i], c.country[i], c.category[i])) continue;
+            var id = c.customer_id[i], cu = c.customer[i];
+            if (id >= 0 && !customerSeen[id]) {
+                customerSeen[id] = 1;
+                nCustomers++;
+            }
+            if (cu >= 0) {
+                revenueByCustomer[cu] += c.revenue[i];
+                customerNameSeen[cu] = 1;
+            }
+        }
+
+        // Commandes : une commande compte si l'une de ses catégories est sélectionnée
+        var o = payload.orders;
+        for (i = 0; i < o.orders.length; i++) {
+            m = o.month[i];
+            if (!keep(m, o.country[i])) continue;
+            if (categoryOk && (o.mask[i] & categoryBits) === 0) continue;
+            nOrders += o.orders[i];
+            if (m >= 0) ordersByMonth[m] += o.orders[i];
+        }
+
+        var panier = nOrders > 0 ? revenue / nOrders : 0;
+        var qtyMoyenne = nOrders > 0 ? quantity / nOrders : 0;
+
+        // KPI 6 & 10 : séries mensuelles
+        var months = [], monthlyRevenue = [], monthlyOrders = [];
+        for (j = 0; j < nMonths; j++) {
+            if (monthSeen[j]) {
+                months.push(dims.month[j]);
+                monthlyRevenue.push(revenueByMonth[j]);
+                monthlyOrders.push(ordersByMonth[j]);
+            }
+        }
+
+        var figEvolutionCa = {
+            data: [{
+                type: 'scatter', x: months, y: monthlyRevenue,
+                mode: 'lines+markers', name: 'CA mensuel',
+                line: {color: colors.primary, width: 3}, marker: {size: 8},
+                fill: 'tozeroy', fillcolor: hexToRgba(colors.primary, 0.2)
+            }],
+            layout: makeLayout(theme, {
+                title: "Évolution du Chiffre d'Affaires Mensuel",
+                xaxis_title: 'Mois', yaxis_title: "Chiffre d'Affaires ($)"
+            })
+        };
+
+        // KPI 7 : Top 10 produits
+        var topProducts = topN(revenueByProduct, productSeen, dims.product, 10).reverse();
+        var productValues = topProducts.map(function (e) { return e[1]; });
+        var figTopProducts = {
+            data: [{
+                type: 'bar', orientation: 'h',
+                x: productValues, y: topProducts.map(function (e) { return e[0]; }),
+                marker: {
+                    color: productValues,
+                    colorscale: [[0, colors.info], [1, colors.primary]],
+                    showscale: false
+                },
+                text: productValues.map(function (v) { return formatMoney(v, 0); }),
+                textposition: 'outside'
+            }],
+            layout: makeLayout(theme, {
+                title: "Top 10 Produits par Chiffre d'Affaires",
+                xaxis_title: "Chiffre d'Affaires ($)", yaxis_title: '', height: 500
+            })
+        };
+
+        // KPI 8 : CA par pays (Top 15)
+        var topCountries = topN(revenueByCountry, countrySeen, dims.country, 15);
+        var palette = [colors.primary, colors.success, colors.warning, colors.danger, colors.info];
+        var figCaPays = {
+            data: [{
+                type: 'pie', hole: 0.4,
+                labels: topCountries.map(function (e) { return e[0]; }),
+                values: topCountries.map(function (e) { return e[1]; }),
+                marker: {
+                    colors: topCountries.map(function (e, idx) { return palette[idx % palette.length]; }),
+                    line: {color: colors.background, width: 2}
+                },
+                textposition: 'auto', textinfo: 'label+percent',
+                hovertemplate: '<b>%{label}</b><br>CA: $%{value:,.0f}<br>Part: %{percent}<extra></extra>'
+            }],
+            layout: makeLayout(theme, {title: 'Répartition du CA par Pays (Top 15)', showlegend: false})
+        };
+
+        // KPI 9 : Top 5 clients
+        var topClients = topN(revenueByCustomer, customerNameSeen, dims.customer, 5).reverse();
+        var figTopClients = {
+            data: [{
+                type: 'bar', orientation: 'h',
+                x: topClients.map(function (e) { return e[1]; }),
+                y: topClients.map(function (e) { return e[0]; }),
+                marker: {
+                    color: [colors.success, colors.info, colors.primary, colors.warning, colors.danger],
+                    line: {color: colors.background, width: 1}
+                },
+                text: topClients.map(function (e) { return formatMoney(e[1], 0); }),
+                textposition: 'outside'
+            }],
+            layout: makeLayout(theme, {
+                title: "Top 5 Clients par Chiffre d'Affaires",
+                xaxis_title: "Chiffre d'Affaires ($)", yaxis_title: ''
+            })
+        };
+
+        var figEvolutionOrders = {
+            data: [{
+                type: 'bar', x: months, y: monthlyOrders,
+                marker: {
+                    color: monthlyOrders,
+                    colorscale: [[0, colors.info], [1, colors.success]],
+                    showscale: false,
+                    line: {color: colors.background, width: 1}
+                },
+                text: monthlyOrders, textposition: 'outside'
+            }],
+            layout: makeLayout(theme, {
+                title: 'Évolution du Nombre de Commandes par Mois',
+                xaxis_title: 'Mois', yaxis_title: 'Nombre de Commandes'
+            })
+        };
+
+        return [
+            formatMoney(revenue, 0),
+            formatInt(nOrders),
+            String(nCustomers),
+            formatMoney(panier, 2),
+            qtyMoyenne.toFixed(1),
+            figEvolutionCa,
+            figTopProducts,
+            figCaPays,
+            figTopClients,
+            figEvolutionOrders,
+            noUpdate
+        ];
+    }
+
+    // Réponse du serveur pour une période coupant un mois : affichée seulement si les
+    // filtres sont toujours ceux de la demande (sinon un calcul plus récent l'a remplacée).
+    // Serveur saturé (busy) : affichage gardé, alerte ouverte et nouvel essai programmé.
+    // Retourne les 10 sorties, puis l'ouverture de l'alerte et la désactivation de l'intervalle
+    function applyFallback(result, startDate, endDate, countries, categories) {
+        var noUpdate = window.dash_clientside.no_update;
+        var current = result && result.key === filterKey(day(startDate), day(endDate), countries, categories);
+        if (current && result.busy) {
+            return new Array(10).fill(noUpdate).concat([true, false]);
+        }
+        if (!current) {
+            return new Array(10).fill(noUpdate).concat([false, true]);
+        }
+        return result.outputs.concat([false, true]);
+    }
+
+    // Nouvel essai de la dernière demande (tick de l'intervalle, actif après une réponse busy)
+    function retryFallback(nIntervals, request) {
+        if (!request) {
+            return window.dash_clientside.no_update;
+        }
+        return Object.assign({}, request, {attempt: nIntervals});
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        northwind: Object.assign({}, (window.dash_clientside || {}).northwind, {
+            updateDashboard: updateDashboard,
+            applyFallback: applyFallback,
+            retryFallback: retryFallback
+        })
+    });
+})();
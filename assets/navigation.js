@@ -0,0 +1,36 @@
+/*
+ * Navigation entre les pages du dashboard Northwind
+ * Les trois pages sont présentes dans le layout dès le chargement : changer d'URL
+ * ne fait qu'afficher/masquer des blocs, sans requête serveur ni callback relancé
+ */
+
+(function () {
+    'use strict';
+
+    var HIDDEN = {display: 'none'};
+    var VISIBLE = {};
+
+    function displayPage(pathname) {
+        var page = 'dashboard';
+        if (pathname === '/prediction') {
+            page = 'prediction';
+        } else if (pathname === '/clusters') {
+            page = 'clusters';
+        }
+
+        return [
+            page === 'dashboard' ? VISIBLE : HIDDEN,
+            page === 'prediction' ? VISIBLE : HIDDEN,
+            page === 'clusters' ? VISIBLE : HIDDEN,
+            page === 'dashboard',
+            page === 'prediction',
+            page === 'clusters'
+        ];
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        northwind: Object.assign({}, (window.dash_clientside || {}).northwind, {
+            displayPage: displayPage
+        })
+    });
+})();
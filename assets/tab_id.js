@@ -0,0 +1,29 @@
+/*
+ * Identifiant d'onglet du dashboard Northwind
+ * Tiré au hasard au chargement de la page (dcc.Store en mémoire : un par onglet et par
+ * rechargement) ; sert de clé au regroupement des rafales de filtres côté serveur
+ */
+
+(function () {
+    'use strict';
+
+    function randomHex(bytes) {
+        // crypto.getRandomValues est disponible hors contexte sécurisé (http sur un intranet),
+        // contrairement à crypto.randomUUID
+        var values = new Uint8Array(bytes);
+        window.crypto.getRandomValues(values);
+        return Array.prototype.map.call(values, function (value) {
+            return ('0' + value.toString(16)).slice(-2);
+        }).join('');
+    }
+
+    function tabId(timestamp, current) {
+        return current ? window.dash_clientside.no_update : randomHex(16);
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        northwind: Object.assign({}, (window.dash_clientside || {}).northwind, {
+            tabId: tabId
+        })
+    });
+})();
@@ -0,0 +1,409 @@
+"""
+Benchmarks des chemins critiques du projet, à plusieurs volumes de données
+- Chargement (DataModel, _create_views) et nettoyage (data_cleaning.main)
+- Filtrage (get_filtered_data, en mémoire ou partitionné par mois), décomptes distincts
+  (nunique / HyperLogLog), top-K et callbacks du dashboard et du ML
+- Méthodes d'AdvancedAnalytics, prédiction unitaire et par lot
+Mesures : temps (médiane / min), pic mémoire et mémoire conservée (tracemalloc).
+Les résultats sont comparés à une référence (benchmarks/baseline.json) et
+ajoutés à l'historique (benchmarks/history.jsonl)
+
+Usage :
+    python benchmark.py --scales 1 10 --save-baseline
+    python benchmark.py --scales 1 10            # compare à la référence
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+import warnings
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import data_cleaning
+from data_model import CLEANED_DIR, DataModel
+from distinct_sketch import DistinctSketches, exact_distinct
+from enrichment import AdvancedAnalytics
+from feature_store import model_matrix
+from generate_data import generate
+from load_test import parse_output
+from request_coalescing import TAB_ID_STORE
+from session_state import FilterState
+from topk import TopKIndex
+
+BENCH_DIR = Path("benchmarks")
+BASELINE_PATH = BENCH_DIR / "baseline.json"
+HISTORY_PATH = BENCH_DIR / "history.jsonl"
+
+# Combinaisons de filtres typiques du dashboard
+FILTER_CASES = {
+    'all': (None, None, None, None),
+    'year': ('1997-01-01', '1997-12-31', None, None),
+    'countries': ('1996-07-04', '1998-05-06', ['Germany', 'USA', 'France'], None),
+    'countries+categories': ('1997-01-01', '1998-05-06', ['Germany', 'USA'], ['Beverages', 'Seafood'])
+}
+
+# Affinage progressif dans une même session (cf. session_state)
+REFINEMENT_STEPS = [
+    ('1996-07-04', '1998-05-06', None, None),
+    ('1997-01-01', '1998-05-06', None, None),
+    ('1997-01-01', '1998-05-06', ['Germany', 'USA', 'France'], None),
+    ('1997-01-01', '1998-05-06', ['Germany', 'USA'], ['Beverages'])
+]
+
+
+def dataset_dir(scale):
+    """Répertoire des CSV nettoyés pour un facteur d'échelle (généré si absent)"""
+    if scale == 1:
+        return Path("data"), CLEANED_DIR
+
+    raw_dir = Path("data/synthetic") / f"x{scale:g}"
+    cleaned_dir = raw_dir / "cleaned"
+    if not (cleaned_dir / "order_details_clean.csv").exists():
+        print(f"🏭 Génération du jeu x{scale:g}...")
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate(scale, raw_dir)
+            data_cleaning.main(['--data-dir', str(raw_dir)])
+    return raw_dir, cleaned_dir
+
+
+def quiet(fn, *args, **kwargs):
+    """Appelle fn sans ses affichages (les prints font partie du code mesuré mais pas du rapport)"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(*args, **kwargs)
+
+
+def measure(fn, repeat=5, warmup=1):
+    """
+    Temps (ms) sur `repeat` exécutions, puis une exécution sous tracemalloc
+
+    Le passage mémoire est séparé : tracemalloc ralentit fortement les allocations.
+    """
+    for _ in range(warmup):
+        quiet(fn)
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        quiet(fn)
+        times.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        quiet(fn)
+        after, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'median_ms': float(np.median(times)),
+        'min_ms': float(np.min(times)),
+        'repeat': repeat,
+        'peak_mb': (peak - before) / 1e6,
+        'retained_mb': (after - before) / 1e6
+    }
+
+
+def load_model_artifacts():
+    from model_bundle import BUNDLE_PATH, load_bundle
+    if BUNDLE_PATH.exists():
+        return load_bundle(BUNDLE_PATH)
+    import joblib
+    return joblib.load('models/customer_clustering_model.pkl')
+
+
+class CallbackClient:
+    """Appelle les callbacks enregistrés sur une app Dash de test, comme dash-renderer"""
+
+    def __init__(self, data_model, artifacts, cluster_data, cluster_lookup):
+        import dash
+        from dash import html
+        from callbacks import register_callbacks
+        from ml_callbacks import register_ml_callbacks
+
+        self.app = dash.Dash(__name__, suppress_callback_exceptions=True)
+        self.app.layout = html.Div()
+        register_callbacks(self.app, data_model)
+        register_ml_callbacks(self.app, data_model, artifacts, cluster_data, cluster_lookup)
+        self.client = self.app.server.test_client()
+
+        self.callbacks = {}
+        for dep in self.client.get('/_dash-dependencies').get_json():
+            outputs = parse_output(dep['output'])
+            for output in (outputs if isinstance(outputs, list) else [outputs]):
+                self.callbacks[output['id']] = dep
+
+    def call(self, output_id, values, changed=()):
+        dep = self.callbacks[output_id]
+        # Nouvel onglet à chaque appel : pas de sous-ensemble réutilisé
+        values = {**values, (TAB_ID_STORE, 'data'): uuid.uuid4().hex}
+
+        def with_value(item):
+            return dict(item, value=values.get((item['id'], item['property'])))
+
+        payload = {
+            'output': dep['output'],
+            'outputs': parse_output(dep['output']),
+            'inputs': [with_value(item) for item in dep['inputs']],
+            'state': [with_value(item) for item in dep['state']],
+            'changedPropIds': list(changed)
+        }
+        response = self.client.post('/_dash-update-component', json=payload)
+        if response.status_code != 200:
+            raise RuntimeError(f"{output_id}: HTTP {response.status_code}")
+        return response
+
+
+def run_scale(scale, repeat, include_cleaning=True):
+    """Exécute tous les benchmarks pour un volume ; retourne {cas: mesures}"""
+    from callbacks import FIGURE_BUILDERS, TOP_K, compute_dashboard, compute_graph_aggregates, compute_kpis
+    from cluster_lookup import ClusterLookup
+    from transport import encode_figure
+
+    raw_dir, cleaned_dir = dataset_dir(scale)
+    results = {}
+
+    def bench(name, fn, n=repeat):
+        results[name] = measure(fn, repeat=n)
+        r = results[name]
+        print(f"   {name:<45}{r['median_ms']:>10.1f} ms{r['peak_mb']:>10.1f} Mo")
+
+    # ----- Chargement et nettoyage -----
+    if include_cleaning:
+        with tempfile.TemporaryDirectory() as tmp:
+            bench('data_cleaning.main',
+                  lambda: data_cleaning.main(['--data-dir', str(raw_dir), '--cleaned-dir', tmp]),
+                  n=max(1, repeat // 2))
+
+    bench('DataModel.__init__', lambda: DataModel(cleaned_dir), n=max(1, repeat // 2))
+    data_model = quiet(DataModel, cleaned_dir)
+
+    def create_views():
+        # Vues intermédiaires gardées par le modèle : recalculées à chaque mesure
+        data_model._order_details_enriched = data_model._orders_enriched = None
+        data_model._create_views()
+
+    bench('DataModel._create_views', create_views)
+    quiet(data_model.get_customer_features)
+
+    # ----- Filtrage -----
+    for case, filters in FILTER_CASES.items():
+        bench(f'get_filtered_data[{case}]', lambda f=filters: data_model.get_filtered_data(*f))
+
+    # Historique partitionné par mois : partitions en mémoire (LRU) puis lecture d'une partition sur disque
+    partitioned_model = quiet(DataModel, cleaned_dir, partitioned=True)
+    for case, filters in FILTER_CASES.items():
+        bench(f'get_filtered_data[partitioned, {case}]',
+              lambda f=filters: partitioned_model.get_filtered_data(*f))
+    partitions = partitioned_model.partitions
+    bench('PartitionedDataset._read', lambda: partitions._read(partitions.partitions[len(partitions.partitions) // 2]))
+
+    def refinement():
+        session_id = uuid.uuid4().hex
+        for step in REFINEMENT_STEPS:
+            data_model.get_filtered_data(*step, session_id=session_id)
+    bench('get_filtered_data[affinage session]', refinement)
+
+    # ----- Corps des callbacks du dashboard -----
+    filtered = data_model.get_filtered_data(*FILTER_CASES['all'])
+    bench('callbacks.compute_kpis', lambda: compute_kpis(filtered))
+    bench('callbacks.compute_graph_aggregates', lambda: compute_graph_aggregates(filtered))
+    bench('callbacks.compute_dashboard', lambda: compute_dashboard(filtered))
+
+    # ----- Décomptes distincts : nunique exact et sketches HyperLogLog -----
+    sketches = DistinctSketches(data_model.full_dataset, exact_below=0)
+    bench('DistinctSketches.__init__', lambda: DistinctSketches(data_model.full_dataset), n=max(1, repeat // 2))
+    bench('DistinctSketches.from_partitions', lambda: DistinctSketches.from_partitions(partitions),
+          n=max(1, repeat // 2))
+    for case, filters in FILTER_CASES.items():
+        subset, state = data_model.get_filtered_data(*filters), FilterState(*filters)
+        bench(f'distinct[exact, {case}]', lambda s=subset: exact_distinct(s))
+        bench(f'distinct[hll, {case}]', lambda s=subset, st=state: sketches.count(s, st))
+
+    # ----- Top-K : groupby + nlargest contre partitions mensuelles (topk) -----
+    bench('TopKIndex.__init__', lambda: TopKIndex(data_model.full_dataset, data_model.month_index, 'productName'),
+          n=max(1, repeat // 2))
+    for column, k in TOP_K.items():
+        for case, filters in FILTER_CASES.items():
+            subset = data_model.get_filtered_data(*filters)
+            bench(f'top_k[groupby, {column}, {case}]',
+                  lambda s=subset, c=column, n=k: s.groupby(c, observed=True)['lineTotal'].sum().nlargest(n))
+            bench(f'top_k[index, {column}, {case}]',
+                  lambda c=column, n=k, f=filters, s=subset: data_model.get_top_k(c, n, *f, filtered=s))
+
+    aggregates = compute_graph_aggregates(filtered)
+    for graph_id, builder in FIGURE_BUILDERS.items():
+        bench(f'callbacks.{builder.__name__}', lambda b=builder, g=graph_id: encode_figure(b(aggregates[g])))
+
+    # ----- AdvancedAnalytics -----
+    analytics = AdvancedAnalytics(data_model)
+    for method in ['calculate_rfm', 'analyze_product_performance', 'analyze_sales_trends',
+                   'analyze_cohorts', 'calculate_discount_impact']:
+        bench(f'AdvancedAnalytics.{method}', getattr(analytics, method))
+    with tempfile.TemporaryDirectory() as tmp:
+        bench('AdvancedAnalytics.export_enriched_data', lambda: analytics.export_enriched_data(tmp),
+              n=max(1, repeat // 2))
+
+    # ----- Prédiction et callbacks ML -----
+    artifacts = load_model_artifacts()
+    features = data_model.get_customer_features()
+    scaler, kmeans, columns = artifacts['scaler'], artifacts['kmeans_model'], artifacts['feature_columns']
+    one = features.iloc[[0]]
+
+    bench('predict[1 client]', lambda: kmeans.predict(scaler.transform(model_matrix(one, columns))))
+    bench(f'predict[lot {len(features):,} clients]',
+          lambda: kmeans.predict(scaler.transform(model_matrix(features, columns))))
+
+    cluster_data = pd.DataFrame({
+        'customerID': features['customerID'],
+        'cluster': kmeans.predict(scaler.transform(model_matrix(features, columns)))
+    })
+    bench('ClusterLookup.__init__', lambda: ClusterLookup(cluster_data, features, artifacts), n=max(1, repeat // 2))
+    lookup = ClusterLookup(cluster_data, features, artifacts)
+    sample_ids = cluster_data['customerID'].sample(min(1000, len(cluster_data)), random_state=0).tolist()
+    bench('ClusterLookup.get_many[1000]', lambda: lookup.get_many(sample_ids))
+
+    # ----- Callbacks complets (requête _dash-update-component, sérialisation comprise) -----
+    client = quiet(CallbackClient, data_model, artifacts, cluster_data, lookup)
+    for case, (start, end, countries, categories) in FILTER_CASES.items():
+        values = {
+            ('date-filter', 'start_date'): start, ('date-filter', 'end_date'): end,
+            ('country-filter', 'value'): countries, ('category-filter', 'value'): categories,
+            ('dashboard-signatures', 'data'): {}
+        }
+        bench(f'update_dashboard[{case}]', lambda v=values: client.call('kpi-ca', v, ['country-filter.value']))
+
+    prediction_values = {
+        ('btn-predict', 'n_clicks'): 1, ('input-recency', 'value'): 30, ('input-frequency', 'value'): 12,
+        ('input-monetary', 'value'): 5000, ('input-discount', 'value'): 5,
+        ('input-days-between', 'value'): 25, ('input-recent-ratio', 'value'): 0.4
+    }
+    bench('predict_cluster', lambda: client.call('prediction-result', prediction_values, ['btn-predict.n_clicks']))
+
+    # L'analyse d'un cluster est mémorisée par worker : seul le premier appel (à froid) compte
+    cold = []
+    for cluster_id in sorted(cluster_data['cluster'].unique()):
+        button = f'btn-cluster-{cluster_id}'
+        start = time.perf_counter()
+        client.call('cluster-content', {(button, 'n_clicks'): 1}, [f'{button}.n_clicks'])
+        cold.append((time.perf_counter() - start) * 1000)
+    results['display_cluster_analysis[à froid]'] = {
+        'median_ms': float(np.median(cold)), 'min_ms': float(np.min(cold)), 'repeat': len(cold),
+        'peak_mb': None, 'retained_mb': None
+    }
+    print(f"   {'display_cluster_analysis[à froid]':<45}{np.median(cold):>10.1f} ms")
+
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold, min_delta_ms=1.0):
+    """
+    Liste des régressions : (volume, cas, référence ms, actuel ms, ratio)
+
+    Un cas régresse si son temps médian dépasse la référence de plus de `threshold`
+    et d'au moins `min_delta_ms` (les cas sous la milliseconde sont trop bruités).
+    """
+    regressions = []
+    print("\n" + "="*60)
+    print(f"📏 COMPARAISON À LA RÉFÉRENCE ({baseline['meta'].get('commit')}, seuil x{threshold})")
+    print("="*60)
+    for scale_key, cases in results.items():
+        for case, current in cases.items():
+            reference = baseline['results'].get(scale_key, {}).get(case)
+            if reference is None:
+                continue
+            ratio = current['median_ms'] / reference['median_ms'] if reference['median_ms'] else 1.0
+            regressed = ratio > threshold and current['median_ms'] - reference['median_ms'] >= min_delta_ms
+            flag = '🔴' if regressed else ('🟢' if ratio < 1 / threshold else '  ')
+            print(f"   {flag} {scale_key:<6}{case:<45}{reference['median_ms']:>9.1f} → {current['median_ms']:>9.1f} ms  x{ratio:.2f}")
+            if regressed:
+                regressions.append((scale_key, case, reference['median_ms'], current['median_ms'], ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks des chemins critiques")
+    parser.add_argument('--scales', type=float, nargs='+', default=[1, 10], help="facteurs d'échelle des données")
+    parser.add_argument('--repeat', type=int, default=5, help="exécutions chronométrées par cas")
+    parser.add_argument('--skip-cleaning', action='store_true', help="ne pas mesurer data_cleaning.main")
+    parser.add_argument('--save-baseline', action='store_true', help="enregistre les résultats comme référence")
+    parser.add_argument('--baseline', default=str(BASELINE_PATH), help="fichier de référence")
+    parser.add_argument('--threshold', type=float, default=1.25, help="ratio au-delà duquel un cas régresse")
+    parser.add_argument('--min-delta-ms', type=float, default=1.0, help="écart minimal (ms) pour une régression")
+    parser.add_argument('--output', help="fichier JSON des résultats")
+    args = parser.parse_args()
+
+    # Avertissements pandas répétés à chaque exécution : illisibles dans le rapport
+    warnings.simplefilter('ignore', FutureWarning)
+
+    print("\n" + "="*60)
+    print("⏱️  BENCHMARKS DES CHEMINS CRITIQUES")
+    print("="*60)
+
+    results = {}
+    for scale in args.scales:
+        scale = int(scale) if float(scale).is_integer() else scale
+        print(f"\n📦 Volume x{scale:g}")
+        results[f"x{scale:g}"] = run_scale(scale, args.repeat, include_cleaning=not args.skip_cleaning)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'repeat': args.repeat
+        },
+        'results': results
+    }
+
+    BENCH_DIR.mkdir(exist_ok=True)
+    with open(HISTORY_PATH, 'a') as f:
+        f.write(json.dumps(report) + "\n")
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2) + "\n")
+
+    baseline_path = Path(args.baseline)
+    regressions = []
+    if args.save_baseline:
+        baseline_path.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"\n💾 Référence enregistrée : {baseline_path}")
+    elif baseline_path.exists():
+        regressions = compare(results, json.loads(baseline_path.read_text()), args.threshold, args.min_delta_ms)
+    else:
+        print(f"\nℹ️  Pas de référence ({baseline_path}) : relancer avec --save-baseline")
+
+    print("\n" + "="*60)
+    if regressions:
+        print(f"🔴 {len(regressions)} régression(s) au-delà de x{args.threshold}")
+    else:
+        print("✅ Aucune régression détectée")
+    print("="*60 + "\n")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,323 @@
+"""
+Cache à deux niveaux pour les résultats des callbacks
+- Niveau 1 : LRU en mémoire du processus (quelques centaines d'entrées)
+- Niveau 2 : store partagé par tous les workers de la machine (fichiers ou Redis)
+Les clés sont préfixées par la version des données : un nouveau jeu de données
+n'est jamais servi avec des résultats calculés sur l'ancien
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import stat
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from data_model import CLEANED_DIR
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+# À incrémenter quand le format des valeurs mises en cache change
+CACHE_SCHEMA = 2
+
+DEFAULT_MEMORY_ENTRIES = 256
+DEFAULT_TTL_SECONDS = 24 * 3600
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_SWEEP_SECONDS = 30
+
+
+def data_version(cleaned_dir=CLEANED_DIR):
+    """Empreinte des CSV nettoyés (taille + contenu), utilisée comme namespace du cache"""
+    digest = hashlib.sha256(f"schema-{CACHE_SCHEMA}".encode())
+    for path in sorted(Path(cleaned_dir).glob('*.csv')):
+        digest.update(path.name.encode())
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+def private_directory(directory):
+    """
+    Crée (si besoin) un répertoire réservé à l'utilisateur courant et le vérifie
+
+    Les valeurs du cache fichier sont relues avec pickle : un répertoire créé ou modifiable
+    par un autre utilisateur permettrait d'exécuter du code dans les workers. Un lien
+    symbolique, un autre propriétaire ou des droits pour le groupe / les autres sont refusés.
+
+    Raises:
+        PermissionError
+    """
+    directory = Path(directory)
+    directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+    info = os.lstat(directory)
+    if stat.S_ISLNK(info.st_mode) or not stat.S_ISDIR(info.st_mode):
+        raise PermissionError(f"{directory} n'est pas un répertoire")
+    if info.st_uid != os.getuid():
+        raise PermissionError(f"{directory} appartient à un autre utilisateur (uid {info.st_uid})")
+    if info.st_mode & 0o077:
+        raise PermissionError(f"{directory} est accessible aux autres utilisateurs "
+                              f"(droits {stat.S_IMODE(info.st_mode):o}, attendu 700)")
+    return directory
+
+
+def make_key(*parts):
+    """Clé stable à partir de valeurs JSON (listes triées par l'appelant si l'ordre est indifférent)"""
+    raw = json.dumps(parts, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+class MemoryTier:
+    """LRU en mémoire du processus"""
+
+    name = 'memory'
+
+    def __init__(self, max_entries=DEFAULT_MEMORY_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class FileTier:
+    """
+    Store partagé entre processus : un fichier pickle par clé
+
+    Placé par défaut dans /dev/shm (tmpfs, donc en mémoire), dans un répertoire propre à
+    l'utilisateur (droits 700, vérifiés) ; l'écriture passe par un fichier temporaire
+    renommé, un lecteur ne voit jamais une valeur partielle.
+
+    Taille bornée : au plus une passe de nettoyage par sweep_interval et par worker
+    supprime les fichiers plus vieux que ttl secondes, ceux d'une autre version des données
+    (namespace) et, au-delà de max_bytes ou max_entries, les plus anciennement écrits.
+    """
+
+    name = 'file'
+
+    def __init__(self, directory=None, ttl=DEFAULT_TTL_SECONDS, namespace=None, max_bytes=DEFAULT_MAX_BYTES,
+                 max_entries=None, sweep_interval=DEFAULT_SWEEP_SECONDS):
+        if directory is None:
+            base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+            directory = Path(base) / f'northwind-cache-{os.getuid()}'
+        self.directory = private_directory(directory)
+        self.ttl = ttl
+        self.namespace = namespace
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.sweep_interval = sweep_interval
+        self.evicted = 0
+        self._sweep_lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+        self.sweep()
+
+    def _path(self, key):
+        return self.directory / f"{key}.pkl"
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            if time.time() - path.stat().st_mtime > self.ttl:
+                path.unlink(missing_ok=True)
+                return None
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def set(self, key, value):
+        path = self._path(key)
+        tmp = path.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+        with open(tmp, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        self._maybe_sweep()
+
+    def _maybe_sweep(self):
+        now = time.monotonic()
+        if now - self._last_sweep < self.sweep_interval or not self._sweep_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_sweep = now
+            self.sweep()
+        finally:
+            self._sweep_lock.release()
+
+    def sweep(self):
+        """Supprime les fichiers expirés, d'un autre namespace ou en excès ; retourne leur nombre"""
+        now = time.time()
+        prefix = f"nw:{self.namespace}:" if self.namespace is not None else None
+        kept, removed = [], 0
+        for entry in os.scandir(self.directory):
+            try:
+                info = entry.stat(follow_symlinks=False)
+                stale = now - info.st_mtime > self.ttl
+                if entry.name.endswith('.tmp'):
+                    # Écriture interrompue (worker tué entre l'écriture et le renommage)
+                    stale = now - info.st_mtime > 60
+                elif prefix is not None and not entry.name.startswith(prefix):
+                    stale = True  # version précédente des données
+                if stale:
+                    os.unlink(entry.path)
+                    removed += 1
+                elif not entry.name.endswith('.tmp'):
+                    kept.append((info.st_mtime, info.st_size, entry.path))
+            except FileNotFoundError:
+                pass  # supprimé entre-temps par un autre worker
+
+        # Plafonds : les plus anciennement écrits partent d'abord
+        kept.sort()
+        total = sum(size for _, size, _ in kept)
+        excess = len(kept) - self.max_entries if self.max_entries else 0
+        for _, size, path in kept:
+            if total <= self.max_bytes and excess <= 0:
+                break
+            try:
+                os.unlink(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+            excess -= 1
+        self.evicted += removed
+        return removed
+
+    def disk_usage(self):
+        """(nombre de fichiers, octets) du répertoire"""
+        sizes = [entry.stat(follow_symlinks=False).st_size for entry in os.scandir(self.directory)]
+        return len(sizes), sum(sizes)
+
+
+class RedisTier:
+    """
+    Store partagé via un serveur Redis local (ou tout client compatible get/set)
+
+    Args:
+        client: client déjà construit (ex: stand-in local), sinon créé depuis url
+    """
+
+    name = 'redis'
+
+    def __init__(self, url='redis://localhost:6379/0', client=None, ttl=DEFAULT_TTL_SECONDS):
+        if client is None:
+            if not REDIS_AVAILABLE:
+                raise ImportError("redis n'est pas installé (pip install redis)")
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.ttl = ttl
+
+    def get(self, key):
+        raw = self.client.get(key)
+        return pickle.loads(raw) if raw is not None else None
+
+    def set(self, key, value):
+        self.client.set(key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), ex=self.ttl)
+
+
+class TieredCache:
+    """
+    Cache multi-niveaux : lecture du plus rapide au plus lent, écriture dans tous
+
+    Une valeur trouvée au niveau 2 est recopiée au niveau 1 : un résultat calculé par
+    un worker devient un hit pour tous les autres, puis un hit mémoire au second appel.
+    """
+
+    def __init__(self, tiers, namespace):
+        self.tiers = list(tiers)
+        self.namespace = namespace
+        self.stats = {tier.name: 0 for tier in self.tiers}
+        self.stats['miss'] = 0
+        self.stats['error'] = 0
+
+    def _full_key(self, key):
+        return f"nw:{self.namespace}:{key}"
+
+    def get(self, key):
+        full_key = self._full_key(key)
+        for level, tier in enumerate(self.tiers):
+            try:
+                value = tier.get(full_key)
+            except Exception:
+                # Un store partagé indisponible ne doit pas casser le callback
+                self.stats['error'] += 1
+                continue
+            if value is not None:
+                self.stats[tier.name] += 1
+                for upper in self.tiers[:level]:
+                    upper.set(full_key, value)
+                return value
+        self.stats['miss'] += 1
+        return None
+
+    def set(self, key, value):
+        full_key = self._full_key(key)
+        for tier in self.tiers:
+            try:
+                tier.set(full_key, value)
+            except Exception:
+                self.stats['error'] += 1
+
+    def get_or_compute(self, key, compute):
+        """Retourne la valeur en cache ou la calcule (et la met en cache)"""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def hit_rate(self):
+        hits = sum(count for name, count in self.stats.items() if name not in ('miss', 'error'))
+        total = hits + self.stats['miss']
+        return hits / total if total else 0.0
+
+
+def create_cache(cleaned_dir=CLEANED_DIR):
+    """
+    Crée le cache depuis DASHBOARD_CACHE
+
+    - 'file' (défaut) : mémoire + fichiers partagés (DASHBOARD_CACHE_DIR, au plus
+      DASHBOARD_CACHE_MAX_MB Mo ; les fichiers des autres versions des données sont supprimés)
+    - 'redis://...' : mémoire + Redis
+    - 'memory' : mémoire seule (un cache par worker)
+    - 'off' : pas de cache
+
+    Returns:
+        TieredCache ou None
+    """
+    mode = os.environ.get('DASHBOARD_CACHE', 'file')
+    if mode == 'off':
+        return None
+
+    namespace = data_version(cleaned_dir)
+    tiers = [MemoryTier(int(os.environ.get('DASHBOARD_CACHE_ENTRIES', DEFAULT_MEMORY_ENTRIES)))]
+    try:
+        if mode.startswith('redis://'):
+            tiers.append(RedisTier(mode))
+        elif mode == 'file':
+            max_mb = float(os.environ.get('DASHBOARD_CACHE_MAX_MB', DEFAULT_MAX_BYTES / 2**20))
+            tiers.append(FileTier(os.environ.get('DASHBOARD_CACHE_DIR'), namespace=namespace,
+                                  max_bytes=int(max_mb * 2**20)))
+    except (ImportError, OSError) as e:
+        print(f"⚠️  Cache partagé indisponible ({e}), cache mémoire seul")
+
+    return TieredCache(tiers, namespace=namespace)
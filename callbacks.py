@@ -2,220 +2,351 @@
 Callbacks pour les interactions du dashboard
 """
 
-from dash import Input, Output
+import hashlib
+
+from dash import Input, Output, State, no_update
+import pandas as pd
 import plotly.graph_objects as go
 from styles import GRAPH_LAYOUT, COLORS
+from transport import encode_figure
+from compute_pool import PoolSaturated
+from request_coalescing import TAB_ID_STORE
+from cache_backend import make_key
+from instrumentation import callback_trace
+from session_state import FilterState
 
+# Ordre des sorties du callback unique (5 KPIs puis 5 graphiques)
+KPI_OUTPUTS = ['kpi-ca', 'kpi-orders', 'kpi-clients', 'kpi-panier', 'kpi-qty']
+GRAPH_OUTPUTS = ['graph-evolution-ca', 'graph-top-products', 'graph-ca-pays',
+                 'graph-top-clients', 'graph-evolution-orders']
+# Classements des graphiques Top Produits et Top Clients (colonne -> k)
+TOP_K = {'productName': 10, 'companyName': 5}
 
-def register_callbacks(app, data_model):
-    """Enregistre tous les callbacks de l'application"""
-    
-    @app.callback(
-        Output('kpi-ca', 'children'),
-        Output('kpi-orders', 'children'),
-        Output('kpi-clients', 'children'),
-        Output('kpi-panier', 'children'),
-        Output('kpi-qty', 'children'),
-        Input('date-filter', 'start_date'),
-        Input('date-filter', 'end_date'),
-        Input('country-filter', 'value'),
-        Input('category-filter', 'value')
+# File de calcul pleine : alerte affichée et nouvel essai automatique (composants du layout)
+BUSY_ALERT = 'dashboard-busy'
+RETRY_INTERVAL = 'dashboard-retry'
+RETRY_INTERVAL_MS = 2000
+DASHBOARD_BUSY_MESSAGE = ("⏳ Serveur très sollicité : les indicateurs affichés ne correspondent pas "
+                          "encore aux filtres, nouvel essai automatique dans quelques secondes")
+
+
+def compute_kpis(filtered, distinct=None):
+    """
+    Calcule les 5 premiers KPIs (valeurs formatées)
+
+    Args:
+        distinct: décomptes distincts (distinct_sketch) ; None = nunique exact
+    """
+    ca_total = filtered['lineTotal'].sum()
+    if distinct is None:
+        distinct = {'orders': filtered['orderID'].nunique(), 'customers': filtered['customerID'].nunique(),
+                    'approximate': False}
+    nb_orders = distinct['orders']
+    nb_clients = distinct['customers']
+    panier_moyen = ca_total / nb_orders if nb_orders > 0 else 0
+    qty_moyenne = filtered['quantity'].sum() / nb_orders if nb_orders > 0 else 0
+    # Décomptes estimés (HyperLogLog) signalés à l'affichage
+    approx = "≈ " if distinct['approximate'] else ""
+
+    return {
+        'kpi-ca': f"${ca_total:,.0f}",
+        'kpi-orders': f"{approx}{nb_orders:,}",
+        'kpi-clients': f"{approx}{nb_clients}",
+        'kpi-panier': f"${panier_moyen:,.2f}",
+        'kpi-qty': f"{qty_moyenne:.1f}"
+    }
+
+
+def compute_graph_aggregates(filtered, distinct=None, top=None):
+    """
+    Calcule les agrégats des 5 graphiques à partir d'un seul jeu filtré
+
+    Args:
+        top: classements déjà calculés (DataModel.get_top_k), par colonne ; None = groupby
+    """
+    month = filtered['orderDate'].dt.to_period('M')
+    orders_by_month = distinct['orders_by_month'] if distinct else filtered.groupby(month)['orderID'].nunique()
+    top = top or {}
+    top_products = top.get('productName')
+    if top_products is None:
+        top_products = filtered.groupby('productName', observed=True)['lineTotal'].sum().nlargest(10)
+    top_clients = top.get('companyName')
+    if top_clients is None:
+        top_clients = filtered.groupby('companyName', observed=True)['lineTotal'].sum().nlargest(5)
+
+    return {
+        'graph-evolution-ca': filtered.groupby(month)['lineTotal'].sum(),
+        'graph-top-products': top_products.sort_values(),
+        'graph-ca-pays': filtered.groupby('country', observed=True)['lineTotal'].sum().nlargest(15),
+        'graph-top-clients': top_clients.sort_values(ascending=True),
+        'graph-evolution-orders': orders_by_month
+    }
+
+
+def aggregate_signature(aggregate):
+    """Empreinte courte d'un agrégat (Series) pour détecter s'il a changé"""
+    hashed = pd.util.hash_pandas_object(aggregate, index=True).to_numpy()
+    return hashlib.md5(hashed.tobytes()).hexdigest()
+
+
+def build_evolution_ca_figure(monthly_sales):
+    """KPI 6: Évolution du CA par mois"""
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=[str(period) for period in monthly_sales.index],
+        y=monthly_sales.values,
+        mode='lines+markers',
+        name='CA mensuel',
+        line=dict(color=COLORS['primary'], width=3),
+        marker=dict(size=8),
+        fill='tozeroy',
+        fillcolor=f'rgba({int(COLORS["primary"][1:3], 16)}, {int(COLORS["primary"][3:5], 16)}, {int(COLORS["primary"][5:7], 16)}, 0.2)'
+    ))
+
+    fig.update_layout(
+        **GRAPH_LAYOUT,
+        title="Évolution du Chiffre d'Affaires Mensuel",
+        xaxis_title="Mois",
+        yaxis_title="Chiffre d'Affaires ($)"
     )
-    def update_kpis(start_date, end_date, countries, categories):
-        """Met à jour les 5 premiers KPIs"""
-        
-        # Filtrer les données
-        filtered = data_model.get_filtered_data(start_date, end_date, countries, categories)
-        
-        # Calculer les KPIs
-        ca_total = filtered['lineTotal'].sum()
-        nb_orders = filtered['orderID'].nunique()
-        nb_clients = filtered['customerID'].nunique()
-        panier_moyen = ca_total / nb_orders if nb_orders > 0 else 0
-        qty_moyenne = filtered['quantity'].sum() / nb_orders if nb_orders > 0 else 0
-        
-        return (
-            f"${ca_total:,.0f}",
-            f"{nb_orders:,}",
-            f"{nb_clients}",
-            f"${panier_moyen:,.2f}",
-            f"{qty_moyenne:.1f}"
-        )
-    
-    @app.callback(
-        Output('graph-evolution-ca', 'figure'),
-        Input('date-filter', 'start_date'),
-        Input('date-filter', 'end_date'),
-        Input('country-filter', 'value'),
-        Input('category-filter', 'value')
+
+    return fig
+
+
+def build_top_products_figure(top_products):
+    """KPI 7: Top 10 produits par CA"""
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        x=top_products.values,
+        y=top_products.index,
+        orientation='h',
+        marker=dict(
+            color=top_products.values,
+            colorscale=[[0, COLORS['info']], [1, COLORS['primary']]],
+            showscale=False
+        ),
+        texttemplate='$%{x:,.0f}',
+        textposition='outside'
+    ))
+
+    fig.update_layout(
+        **GRAPH_LAYOUT,
+        title="Top 10 Produits par Chiffre d'Affaires",
+        xaxis_title="Chiffre d'Affaires ($)",
+        yaxis_title="",
+        height=500
     )
-    def update_evolution_ca(start_date, end_date, countries, categories):
-        """KPI 6: Évolution du CA par mois"""
-        
-        filtered = data_model.get_filtered_data(start_date, end_date, countries, categories)
-        monthly_sales = filtered.groupby(filtered['orderDate'].dt.to_period('M'))['lineTotal'].sum()
-        
-        fig = go.Figure()
-        fig.add_trace(go.Scatter(
-            x=[str(period) for period in monthly_sales.index],
-            y=monthly_sales.values,
-            mode='lines+markers',
-            name='CA mensuel',
-            line=dict(color=COLORS['primary'], width=3),
-            marker=dict(size=8),
-            fill='tozeroy',
-            fillcolor=f'rgba({int(COLORS["primary"][1:3], 16)}, {int(COLORS["primary"][3:5], 16)}, {int(COLORS["primary"][5:7], 16)}, 0.2)'
-        ))
-        
-        fig.update_layout(
-            **GRAPH_LAYOUT,
-            title="Évolution du Chiffre d'Affaires Mensuel",
-            xaxis_title="Mois",
-            yaxis_title="Chiffre d'Affaires ($)"
-        )
-        
-        return fig
-    
-    @app.callback(
-        Output('graph-top-products', 'figure'),
-        Input('date-filter', 'start_date'),
-        Input('date-filter', 'end_date'),
-        Input('country-filter', 'value'),
-        Input('category-filter', 'value')
+
+    return fig
+
+
+def build_ca_pays_figure(sales_by_country):
+    """KPI 8: Répartition du CA par pays"""
+    colors_gradient = [COLORS['primary'], COLORS['success'], COLORS['warning'],
+                      COLORS['danger'], COLORS['info']] * 3
+
+    fig = go.Figure()
+    fig.add_trace(go.Pie(
+        labels=sales_by_country.index,
+        values=sales_by_country.values,
+        hole=0.4,
+        marker=dict(colors=colors_gradient[:len(sales_by_country)], line=dict(color=COLORS['background'], width=2)),
+        textposition='auto',
+        textinfo='label+percent',
+        hovertemplate='<b>%{label}</b><br>CA: $%{value:,.0f}<br>Part: %{percent}<extra></extra>'
+    ))
+
+    fig.update_layout(
+        **GRAPH_LAYOUT,
+        title="Répartition du CA par Pays (Top 15)",
+        showlegend=False
     )
-    def update_top_products(start_date, end_date, countries, categories):
-        """KPI 7: Top 10 produits par CA"""
-        
-        filtered = data_model.get_filtered_data(start_date, end_date, countries, categories)
-        top_products = filtered.groupby('productName')['lineTotal'].sum().nlargest(10).sort_values()
-        
-        fig = go.Figure()
-        fig.add_trace(go.Bar(
-            x=top_products.values,
-            y=top_products.index,
-            orientation='h',
-            marker=dict(
-                color=top_products.values,
-                colorscale=[[0, COLORS['info']], [1, COLORS['primary']]],
-                showscale=False
-            ),
-            text=[f"${v:,.0f}" for v in top_products.values],
-            textposition='outside'
-        ))
-        
-        fig.update_layout(
-            **GRAPH_LAYOUT,
-            title="Top 10 Produits par Chiffre d'Affaires",
-            xaxis_title="Chiffre d'Affaires ($)",
-            yaxis_title="",
-            height=500
-        )
-        
-        return fig
-    
-    @app.callback(
-        Output('graph-ca-pays', 'figure'),
-        Input('date-filter', 'start_date'),
-        Input('date-filter', 'end_date'),
-        Input('country-filter', 'value'),
-        Input('category-filter', 'value')
+
+    return fig
+
+
+def build_top_clients_figure(top_clients):
+    """KPI 9: Top 5 clients"""
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        x=top_clients.values,
+        y=top_clients.index,
+        orientation='h',
+        marker=dict(
+            color=[COLORS['success'], COLORS['info'], COLORS['primary'],
+                   COLORS['warning'], COLORS['danger']],
+            line=dict(color=COLORS['background'], width=1)
+        ),
+        texttemplate='$%{x:,.0f}',
+        textposition='outside'
+    ))
+
+    fig.update_layout(
+        **GRAPH_LAYOUT,
+        title="Top 5 Clients par Chiffre d'Affaires",
+        xaxis_title="Chiffre d'Affaires ($)",
+        yaxis_title=""
     )
-    def update_ca_pays(start_date, end_date, countries, categories):
-        """KPI 8: Répartition du CA par pays"""
-        
-        filtered = data_model.get_filtered_data(start_date, end_date, countries, categories)
-        sales_by_country = filtered.groupby('country')['lineTotal'].sum().nlargest(15)
-        
-        colors_gradient = [COLORS['primary'], COLORS['success'], COLORS['warning'], 
-                          COLORS['danger'], COLORS['info']] * 3
-        
-        fig = go.Figure()
-        fig.add_trace(go.Pie(
-            labels=sales_by_country.index,
-            values=sales_by_country.values,
-            hole=0.4,
-            marker=dict(colors=colors_gradient[:len(sales_by_country)], line=dict(color=COLORS['background'], width=2)),
-            textposition='auto',
-            textinfo='label+percent',
-            hovertemplate='<b>%{label}</b><br>CA: $%{value:,.0f}<br>Part: %{percent}<extra></extra>'
-        ))
-        
-        fig.update_layout(
-            **GRAPH_LAYOUT,
-            title="Répartition du CA par Pays (Top 15)",
-            showlegend=False
-        )
-        
-        return fig
-    
-    @app.callback(
-        Output('graph-top-clients', 'figure'),
-        Input('date-filter', 'start_date'),
-        Input('date-filter', 'end_date'),
-        Input('country-filter', 'value'),
-        Input('category-filter', 'value')
+
+    return fig
+
+
+def build_evolution_orders_figure(monthly_orders):
+    """KPI 10: Évolution du nombre de commandes"""
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        x=[str(period) for period in monthly_orders.index],
+        y=monthly_orders.values,
+        marker=dict(
+            color=monthly_orders.values,
+            colorscale=[[0, COLORS['info']], [1, COLORS['success']]],
+            showscale=False,
+            line=dict(color=COLORS['background'], width=1)
+        ),
+        texttemplate='%{y}',
+        textposition='outside'
+    ))
+
+    fig.update_layout(
+        **GRAPH_LAYOUT,
+        title="Évolution du Nombre de Commandes par Mois",
+        xaxis_title="Mois",
+        yaxis_title="Nombre de Commandes"
     )
-    def update_top_clients(start_date, end_date, countries, categories):
-        """KPI 9: Top 5 clients"""
-        
-        filtered = data_model.get_filtered_data(start_date, end_date, countries, categories)
-        top_clients = filtered.groupby('companyName')['lineTotal'].sum().nlargest(5).sort_values(ascending=True)
-        
-        fig = go.Figure()
-        fig.add_trace(go.Bar(
-            x=top_clients.values,
-            y=top_clients.index,
-            orientation='h',
-            marker=dict(
-                color=[COLORS['success'], COLORS['info'], COLORS['primary'], 
-                       COLORS['warning'], COLORS['danger']],
-                line=dict(color=COLORS['background'], width=1)
-            ),
-            text=[f"${v:,.0f}" for v in top_clients.values],
-            textposition='outside'
-        ))
-        
-        fig.update_layout(
-            **GRAPH_LAYOUT,
-            title="Top 5 Clients par Chiffre d'Affaires",
-            xaxis_title="Chiffre d'Affaires ($)",
-            yaxis_title=""
-        )
-        
-        return fig
+
+    return fig
+
+
+FIGURE_BUILDERS = {
+    'graph-evolution-ca': build_evolution_ca_figure,
+    'graph-top-products': build_top_products_figure,
+    'graph-ca-pays': build_ca_pays_figure,
+    'graph-top-clients': build_top_clients_figure,
+    'graph-evolution-orders': build_evolution_orders_figure
+}
+
+
+def compute_dashboard(filtered, distinct=None, top=None):
+    """KPIs, agrégats des graphiques et leurs empreintes (valeur mise en cache)"""
+    kpis = compute_kpis(filtered, distinct)
+    aggregates = compute_graph_aggregates(filtered, distinct, top)
+
+    signatures = dict(kpis)
+    signatures.update({graph_id: aggregate_signature(agg) for graph_id, agg in aggregates.items()})
+
+    return {'kpis': kpis, 'aggregates': aggregates, 'signatures': signatures}
+
+
+def register_callbacks(app, data_model, coalescer=None, compute_pool=None, cache=None, metrics=None, sketches=None):
+    """
+    Enregistre tous les callbacks de l'application
     
+    Args:
+        coalescer: FilterCoalescer optionnel (annule les calculs des états de filtres dépassés)
+        compute_pool: ComputePool optionnel (calculs exécutés dans la file 'kpi')
+        cache: TieredCache optionnel (résultats partagés entre workers, par état de filtres)
+        metrics: CallbackMetrics optionnel (durée par phase et lignes parcourues)
+        sketches: DistinctSketches optionnel (commandes et clients distincts estimés)
+    """
+
     @app.callback(
-        Output('graph-evolution-orders', 'figure'),
+        [Output(kpi_id, 'children') for kpi_id in KPI_OUTPUTS],
+        [Output(graph_id, 'figure') for graph_id in GRAPH_OUTPUTS],
+        Output('dashboard-signatures', 'data'),
+        Output(BUSY_ALERT, 'is_open'),
+        Output(RETRY_INTERVAL, 'disabled'),
         Input('date-filter', 'start_date'),
         Input('date-filter', 'end_date'),
         Input('country-filter', 'value'),
-        Input('category-filter', 'value')
+        Input('category-filter', 'value'),
+        # Tiré au chargement de la page : le premier calcul attend l'identifiant de l'onglet
+        Input(TAB_ID_STORE, 'data'),
+        # Nouvel essai après une file pleine (intervalle actif seulement dans ce cas)
+        Input(RETRY_INTERVAL, 'n_intervals'),
+        State('dashboard-signatures', 'data')
     )
-    def update_evolution_orders(start_date, end_date, countries, categories):
-        """KPI 10: Évolution du nombre de commandes"""
-        
-        filtered = data_model.get_filtered_data(start_date, end_date, countries, categories)
-        monthly_orders = filtered.groupby(filtered['orderDate'].dt.to_period('M'))['orderID'].nunique()
-        
-        fig = go.Figure()
-        fig.add_trace(go.Bar(
-            x=[str(period) for period in monthly_orders.index],
-            y=monthly_orders.values,
-            marker=dict(
-                color=monthly_orders.values,
-                colorscale=[[0, COLORS['info']], [1, COLORS['success']]],
-                showscale=False,
-                line=dict(color=COLORS['background'], width=1)
-            ),
-            text=monthly_orders.values,
-            textposition='outside'
-        ))
-        
-        fig.update_layout(
-            **GRAPH_LAYOUT,
-            title="Évolution du Nombre de Commandes par Mois",
-            xaxis_title="Mois",
-            yaxis_title="Nombre de Commandes"
-        )
-        
-        return fig
+    def update_dashboard(start_date, end_date, countries, categories, tab_id, n_retries, signatures):
+        """
+        Met à jour les 10 KPIs en une seule requête et un seul filtrage
+
+        Seules les sorties dont l'agrégat a changé depuis la dernière réponse
+        envoyée au navigateur sont renvoyées (les autres valent no_update).
+        File de calcul pleine : l'affichage actuel est gardé, une alerte le signale
+        et l'intervalle RETRY_INTERVAL relance le calcul jusqu'à ce qu'il aboutisse.
+        """
+        with callback_trace(metrics, 'update_dashboard') as trace:
+            return compute_dashboard_outputs(trace, start_date, end_date, countries, categories, tab_id, signatures)
+
+    def compute_dashboard_outputs(trace, start_date, end_date, countries, categories, tab_id, signatures):
+        previous = signatures or {}
+
+        # Rafale de changements : seul le dernier état de l'onglet est calculé
+        # (sans identifiant d'onglet, aucune requête n'est regroupée avec une autre)
+        token = None
+        if coalescer is not None and tab_id:
+            token = coalescer.begin('dashboard', tab_id)
+            coalescer.settle(token)
+
+        def aggregate():
+            # Filtrer les données une seule fois (en repartant du sous-ensemble de la session si possible)
+            trace.lap('cache')
+            stats = {}
+            filtered = data_model.get_filtered_data(start_date, end_date, countries, categories, tab_id, stats)
+            trace.add_rows(stats.get('rows_scanned', 0))
+            trace.lap('filter')
+            state = FilterState(start_date, end_date, countries, categories)
+            distinct = None
+            if sketches is not None:
+                distinct = sketches.count(filtered, state)
+            # Top Produits / Top Clients : partitions mensuelles pré-agrégées (topk)
+            top = {column: data_model.get_top_k(column, k, start_date, end_date, countries, categories, filtered)
+                   for column, k in TOP_K.items()}
+            result = compute_dashboard(filtered, distinct, top)
+            trace.lap('aggregate')
+            return result
+
+        def compute():
+            # Attente : regroupement des rafales et file du pool
+            trace.lap('queue')
+            if cache is None:
+                result = aggregate()
+            else:
+                # Décomptes exacts et estimés (selon la précision) ne partagent pas leurs entrées
+                distinct_mode = sketches.precision if sketches is not None else 'exact'
+                key = make_key('dashboard', distinct_mode, start_date, end_date,
+                               sorted(countries or []), sorted(categories or []))
+                result = cache.get_or_compute(key, aggregate)
+            trace.lap('cache')
+
+            if token is not None:
+                coalescer.check(token)
+
+            kpis = result['kpis']
+            aggregates = result['aggregates']
+            new_signatures = result['signatures']
+
+            kpi_values = [
+                no_update if previous.get(kpi_id) == kpis[kpi_id] else kpis[kpi_id]
+                for kpi_id in KPI_OUTPUTS
+            ]
+            figures = []
+            for graph_id in GRAPH_OUTPUTS:
+                if previous.get(graph_id) == new_signatures[graph_id]:
+                    figures.append(no_update)
+                    continue
+                figure = FIGURE_BUILDERS[graph_id](aggregates[graph_id])
+                trace.lap('figure')
+                figures.append(encode_figure(figure))
+                trace.lap('serialize')
+
+            # Alerte fermée, nouvel essai désactivé
+            return (*kpi_values, *figures, new_signatures, False, True)
+
+        if compute_pool is None:
+            return compute()
+
+        try:
+            return compute_pool.run('kpi', compute)
+        except PoolSaturated:
+            # File pleine : affichage actuel gardé, alerte ouverte et nouvel essai programmé
+            return (*[no_update] * (len(KPI_OUTPUTS) + len(GRAPH_OUTPUTS) + 1), True, False)
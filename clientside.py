@@ -0,0 +1,354 @@
+"""
+Mode de filtrage côté navigateur
+Le serveur envoie une seule fois des tables pré-agrégées au grain mensuel (format colonne),
+les KPIs et graphiques sont ensuite recalculés par un callback clientside (assets/clientside.js) ;
+les périodes qui coupent un mois sont calculées par le serveur (dashboard_fallback)
+La navigation entre pages est aussi gérée dans le navigateur (assets/navigation.js)
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from dash import ClientsideFunction, Input, Output, State
+from dash.exceptions import PreventUpdate
+from plotly.utils import PlotlyJSONEncoder
+
+from callbacks import (BUSY_ALERT, FIGURE_BUILDERS, GRAPH_OUTPUTS, KPI_OUTPUTS, RETRY_INTERVAL, compute_dashboard,
+                       compute_kpis)
+from compute_pool import PoolSaturated
+from instrumentation import callback_trace
+from session_state import FilterState
+from styles import GRAPH_LAYOUT, COLORS
+from transport import encode_figure
+
+CLIENTSIDE_JS = Path(__file__).parent / "assets" / "clientside.js"
+
+# Au-delà, le mode navigateur est refusé au démarrage (DASHBOARD_CLIENTSIDE_MAX_KB)
+DEFAULT_MAX_PAYLOAD_BYTES = 2 * 1024 * 1024
+
+# Catégories d'une commande codées en masque de bits (entiers 32 bits de JavaScript)
+MAX_MASK_CATEGORIES = 31
+
+# Filtres de la vérification de parité : mois entiers (calcul navigateur) et
+# périodes coupant des mois (calcul délégué au serveur)
+PARITY_CASES = [
+    (None, None, None, None),
+    ('1997-01-01', '1997-03-31', None, None),
+    ('1996-07-01', '1998-02-28', ['Germany', 'USA'], None),
+    ('1997-05-01', '1997-05-31', None, ['Beverages']),
+    ('1997-11-01', None, ['France'], ['Seafood', 'Confections']),
+    (None, '1996-12-31', None, None),
+    ('1997-01-15', '1997-03-10', None, None),
+    ('1997-05-02', '1997-05-30', None, ['Beverages'])
+]
+
+# Exécute updateDashboard (assets/clientside.js) sous Node.js : JSON {payload, cases} sur stdin
+# Pour chaque cas : les 5 KPIs, ou null si le calcul est délégué au serveur
+NODE_RUNNER = """
+global.window = {dash_clientside: {no_update: null}};
+require(process.argv[2]);
+let input = '';
+process.stdin.on('data', chunk => { input += chunk; });
+process.stdin.on('end', () => {
+    const {payload, cases} = JSON.parse(input);
+    const update = window.dash_clientside.northwind.updateDashboard;
+    console.log(JSON.stringify(cases.map(c => {
+        const outputs = update(c[0], c[1], c[2], c[3], payload);
+        return outputs[outputs.length - 1] ? null : outputs.slice(0, 5);
+    })));
+});
+"""
+
+# Pages de l'application (id du bloc dans le layout, lien de navigation)
+PAGES = [
+    ('page-dashboard', 'nav-dashboard'),
+    ('page-prediction', 'nav-prediction'),
+    ('page-clusters', 'nav-clusters')
+]
+
+
+def _codes(column):
+    """(codes entiers, libellés) triés ; -1 = valeur manquante"""
+    codes, uniques = pd.factorize(column, sort=True)
+    return codes, [str(u) for u in uniques]
+
+
+def _columns(frame):
+    return {name: frame[name].tolist() for name in frame.columns}
+
+
+def build_clientside_payload(full_dataset):
+    """
+    Construit les tables pré-agrégées envoyées au navigateur
+
+    Grain des filtres du dashboard (mois x pays x catégorie) ; la taille dépend du nombre
+    de valeurs des dimensions, pas du nombre de lignes :
+    - 'products' : CA et quantités par produit x catégorie x mois x pays
+    - 'customers' : CA par client x mois x catégorie (pays et nom du client compris),
+      pour les clients uniques et le Top 5 Clients
+    - 'orders' : nombre de commandes par mois x pays x masque des catégories de la
+      commande, pour compter exactement les commandes d'une sélection de catégories
+    Les dimensions sont encodées en entiers (dictionnaire dans 'dims', -1 = valeur manquante) ;
+    'month_first' / 'month_last' donnent le premier et le dernier jour présents de chaque mois.
+
+    Returns:
+        dict JSON-sérialisable
+
+    Raises:
+        ValueError: trop de catégories pour les masques de commandes
+    """
+    df = full_dataset
+    dims, codes = {}, {}
+    months = df['orderDate'].dt.to_period('M')
+    codes['month'], dims['month'] = _codes(months)
+    codes['country'], dims['country'] = _codes(df['country'])
+    codes['category'], dims['category'] = _codes(df['categoryName'])
+    codes['product'], dims['product'] = _codes(df['productName'])
+    codes['customer'], dims['customer'] = _codes(df['companyName'])
+    codes['customer_id'], customer_ids = _codes(df['customerID'])
+    if len(dims['category']) > MAX_MASK_CATEGORIES:
+        raise ValueError(f"{len(dims['category'])} catégories (mode navigateur : {MAX_MASK_CATEGORIES} au plus)")
+
+    days = df['orderDate'].groupby(months).agg(['min', 'max'])
+    lines = pd.DataFrame({
+        **codes,
+        'revenue': df['lineTotal'].to_numpy(dtype=float),
+        'quantity': df['quantity'].to_numpy(dtype=float, na_value=np.nan),
+        'order': df['orderID'].to_numpy()
+    })
+
+    products = lines.groupby(['product', 'category', 'month', 'country'], sort=True).agg(
+        revenue=('revenue', 'sum'), quantity=('quantity', 'sum')).reset_index()
+    customers = lines.groupby(['customer_id', 'customer', 'country', 'month', 'category'], sort=True).agg(
+        revenue=('revenue', 'sum')).reset_index()
+
+    # Une commande : un mois et un pays (celui du client), une ou plusieurs catégories
+    bits = np.where(lines['category'] >= 0, np.left_shift(1, lines['category'].clip(lower=0)), 0)
+    per_order = lines.assign(mask=bits).drop_duplicates(['order', 'category']).groupby('order').agg(
+        month=('month', 'first'), country=('country', 'first'), mask=('mask', 'sum'))
+    orders = per_order.groupby(['month', 'country', 'mask'], sort=True).size().rename('orders').reset_index()
+
+    products['revenue'] = products['revenue'].round(4)
+    products['quantity'] = products['quantity'].astype(int)
+    customers['revenue'] = customers['revenue'].round(4)
+
+    return {
+        'dims': dims,
+        'month_first': days['min'].dt.strftime('%Y-%m-%d').tolist(),
+        'month_last': days['max'].dt.strftime('%Y-%m-%d').tolist(),
+        'n_customer_ids': len(customer_ids),
+        'products': _columns(products),
+        'customers': _columns(customers),
+        'orders': _columns(orders),
+        'theme': {'layout': GRAPH_LAYOUT, 'colors': COLORS}
+    }
+
+
+def payload_size(payload):
+    """Taille du payload sérialisé (octets), telle qu'envoyée dans le layout"""
+    return len(json.dumps(payload, cls=PlotlyJSONEncoder).encode('utf-8'))
+
+
+def create_clientside_payload(data_model, max_bytes=None):
+    """
+    Payload du mode navigateur, ou None s'il est trop gros (le serveur calcule alors les KPIs)
+
+    Args:
+        max_bytes: taille maximale (défaut : DASHBOARD_CLIENTSIDE_MAX_KB, 2 Mo)
+    """
+    if max_bytes is None:
+        max_bytes = int(os.environ.get('DASHBOARD_CLIENTSIDE_MAX_KB', DEFAULT_MAX_PAYLOAD_BYTES // 1024)) * 1024
+    try:
+        payload = build_clientside_payload(data_model.full_dataset)
+    except ValueError as e:
+        print(f"⚠️  Mode navigateur indisponible ({e}), calcul serveur")
+        return None
+    size = payload_size(payload)
+    if size > max_bytes:
+        print(f"⚠️  Payload navigateur de {size / 1024:,.0f} Ko (max {max_bytes / 1024:,.0f} Ko), calcul serveur")
+        return None
+    return payload
+
+
+def clientside_kpis(payload, cases, node='node'):
+    """
+    KPIs calculés par assets/clientside.js pour chaque (start, end, pays, catégories) de cases
+
+    None pour un cas délégué au serveur (période coupant un mois)
+    """
+    with tempfile.NamedTemporaryFile('w', suffix='.js', delete=False) as runner:
+        runner.write(NODE_RUNNER)
+    try:
+        result = subprocess.run(
+            [node, runner.name, str(CLIENTSIDE_JS.resolve())],
+            input=json.dumps({'payload': payload, 'cases': cases}, cls=PlotlyJSONEncoder),
+            capture_output=True, text=True, check=True
+        )
+    finally:
+        Path(runner.name).unlink()
+    return [dict(zip(KPI_OUTPUTS, values)) if values is not None else None
+            for values in json.loads(result.stdout)]
+
+
+def check_parity(data_model, cases=PARITY_CASES, node='node'):
+    """
+    Compare les KPIs du navigateur à compute_kpis (serveur) pour chaque cas de filtres
+
+    Un cas doit être délégué au serveur si et seulement si ses dates coupent un mois.
+
+    Returns:
+        (liste de (cas, KPIs serveur, KPIs navigateur) en désaccord, nombre de cas délégués)
+    """
+    browser = clientside_kpis(build_clientside_payload(data_model.full_dataset), cases, node)
+    mismatches, delegated = [], 0
+    for case, client in zip(cases, browser):
+        server = compute_kpis(data_model.get_filtered_data(*case))
+        _, partial_months = data_model.month_index.coverage(FilterState(*case[:2]))
+        if client is None:
+            delegated += 1
+            if len(partial_months) == 0:
+                mismatches.append((case, server, "délégué au serveur sans mois coupé"))
+        elif server != client:
+            mismatches.append((case, server, client))
+    return mismatches, delegated
+
+
+def register_clientside_callbacks(app, data_model, compute_pool=None, metrics=None):
+    """
+    Enregistre les callbacks du mode navigateur
+
+    - updateDashboard (navigateur) : KPIs et graphiques depuis les tables pré-agrégées ; si
+      les dates coupent un mois, il écrit la demande dans 'clientside-fallback-request'
+    - dashboard_fallback (serveur) : calcule cette demande comme update_dashboard ; file de
+      calcul pleine : répond {'key', 'busy': True}
+    - applyFallback (navigateur) : affiche la réponse si les filtres n'ont pas changé entre-temps,
+      ou l'alerte BUSY_ALERT et active RETRY_INTERVAL si le serveur était saturé
+    - retryFallback (navigateur) : renvoie la demande à chaque tick de RETRY_INTERVAL
+    """
+
+    app.clientside_callback(
+        ClientsideFunction(namespace='northwind', function_name='updateDashboard'),
+        [Output(kpi_id, 'children') for kpi_id in KPI_OUTPUTS],
+        [Output(graph_id, 'figure') for graph_id in GRAPH_OUTPUTS],
+        Output('clientside-fallback-request', 'data'),
+        Input('date-filter', 'start_date'),
+        Input('date-filter', 'end_date'),
+        Input('country-filter', 'value'),
+        Input('category-filter', 'value'),
+        State('dashboard-data', 'data')
+    )
+
+    @app.callback(
+        Output('clientside-fallback-result', 'data'),
+        Input('clientside-fallback-request', 'data'),
+        prevent_initial_call=True
+    )
+    def dashboard_fallback(request):
+        if not request:
+            raise PreventUpdate
+        filters = request['filters']
+        with callback_trace(metrics, 'dashboard_fallback') as trace:
+            def compute():
+                trace.lap('queue')
+                stats = {}
+                filtered = data_model.get_filtered_data(*filters, stats=stats)
+                trace.add_rows(stats.get('rows_scanned', 0))
+                trace.lap('filter')
+                result = compute_dashboard(filtered)
+                trace.lap('aggregate')
+                figures = [encode_figure(FIGURE_BUILDERS[graph_id](result['aggregates'][graph_id]))
+                           for graph_id in GRAPH_OUTPUTS]
+                trace.lap('serialize')
+                return {'key': request['key'],
+                        'outputs': [result['kpis'][kpi_id] for kpi_id in KPI_OUTPUTS] + figures}
+
+            if compute_pool is None:
+                return compute()
+            try:
+                return compute_pool.run('kpi', compute)
+            except PoolSaturated:
+                # Affichage actuel gardé : le navigateur signale l'attente et redemande
+                return {'key': request['key'], 'busy': True}
+
+    app.clientside_callback(
+        ClientsideFunction(namespace='northwind', function_name='applyFallback'),
+        [Output(kpi_id, 'children', allow_duplicate=True) for kpi_id in KPI_OUTPUTS],
+        [Output(graph_id, 'figure', allow_duplicate=True) for graph_id in GRAPH_OUTPUTS],
+        Output(BUSY_ALERT, 'is_open'),
+        Output(RETRY_INTERVAL, 'disabled'),
+        Input('clientside-fallback-result', 'data'),
+        State('date-filter', 'start_date'),
+        State('date-filter', 'end_date'),
+        State('country-filter', 'value'),
+        State('category-filter', 'value'),
+        prevent_initial_call=True
+    )
+
+    app.clientside_callback(
+        ClientsideFunction(namespace='northwind', function_name='retryFallback'),
+        Output('clientside-fallback-request', 'data', allow_duplicate=True),
+        Input(RETRY_INTERVAL, 'n_intervals'),
+        State('clientside-fallback-request', 'data'),
+        prevent_initial_call=True
+    )
+
+
+def register_navigation_callback(app):
+    """
+    Affiche la page correspondant à l'URL (callback clientside, sans requête serveur)
+
+    Les pages restent montées : leurs callbacks ne sont pas relancés à chaque
+    changement de page tant que les filtres n'ont pas changé.
+    """
+
+    app.clientside_callback(
+        ClientsideFunction(namespace='northwind', function_name='displayPage'),
+        [Output(page_id, 'style') for page_id, _ in PAGES],
+        [Output(nav_id, 'active') for _, nav_id in PAGES],
+        Input('url', 'pathname')
+    )
+
+
+def main():
+    """Vérifie que le mode navigateur affiche les mêmes KPIs que le serveur"""
+    from data_model import CLEANED_DIR, DataModel
+
+    parser = argparse.ArgumentParser(description="Parité des KPIs navigateur (clientside.js) / serveur")
+    parser.add_argument('--cleaned-dir', default=str(CLEANED_DIR), help="répertoire des CSV nettoyés")
+    parser.add_argument('--node', default='node', help="exécutable Node.js")
+    args = parser.parse_args()
+
+    print("\n" + "="*60)
+    print("🔁 PARITÉ NAVIGATEUR / SERVEUR")
+    print("="*60 + "\n")
+
+    data_model = DataModel(args.cleaned_dir, verbose=False)
+    payload = build_clientside_payload(data_model.full_dataset)
+    print(f"📦 Payload : {payload_size(payload) / 1024:,.0f} Ko "
+          f"({len(payload['products']['revenue']):,} cellules produits, {len(data_model.full_dataset):,} lignes)")
+
+    mismatches, delegated = check_parity(data_model, node=args.node)
+    for case, server, client in mismatches:
+        print(f"❌ {case}")
+        if isinstance(client, str):
+            print(f"   {client}")
+            continue
+        for kpi_id in KPI_OUTPUTS:
+            if server[kpi_id] != client[kpi_id]:
+                print(f"   {kpi_id:<12} serveur {server[kpi_id]:>14}   navigateur {client[kpi_id]:>14}")
+    if not mismatches:
+        print(f"✅ {len(PARITY_CASES) - delegated} cas identiques au serveur, "
+              f"{delegated} délégués au serveur (mois coupés)")
+    print("="*60 + "\n")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
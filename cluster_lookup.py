@@ -0,0 +1,134 @@
+"""
+Recherche indexée du segment d'un client connu (customerID -> cluster)
+Exposée en JSON sur le serveur Flask du dashboard pour le CRM
+"""
+
+import numpy as np
+from flask import jsonify, request
+
+from feature_store import model_matrix
+
+MAX_BULK_IDS = 10_000
+
+
+class ClusterLookup:
+    """Index customerID -> cluster, features et distance à chaque centroïde"""
+
+    def __init__(self, cluster_data, customer_features, model_artifacts, cluster_labels=None):
+        """
+        Construit l'index une seule fois au chargement
+
+        Args:
+            cluster_data: DataFrame issu de data/enriched/customer_clusters.csv
+            customer_features: table du feature store (DataModel.get_customer_features())
+            model_artifacts: artefacts du modèle (scaler, kmeans_model, feature_columns)
+            cluster_labels: dict {cluster_id: label}
+        """
+        self.cluster_labels = cluster_labels or {}
+        self.customer_ids = cluster_data['customerID'].astype(str).to_numpy()
+        self._index = {customer_id: i for i, customer_id in enumerate(self.customer_ids)}
+        self.clusters = cluster_data['cluster'].to_numpy()
+
+        # Features du modèle alignées sur l'ordre de customer_clusters.csv
+        self.feature_columns = list(model_artifacts['feature_columns'])
+        features = customer_features.set_index('customerID').reindex(self.customer_ids)
+        self.feature_names = [c for c in features.columns if c != 'monetary_log']
+        self.features = features[self.feature_names].to_numpy(dtype=float)
+
+        # Distances à tous les centroïdes, calculées en une opération matricielle
+        known = ~np.isnan(features['recency'].to_numpy(dtype=float))
+        centers = model_artifacts['kmeans_model'].cluster_centers_
+        self.distances = np.full((len(self.customer_ids), len(centers)), np.nan)
+        if known.any():
+            X = model_artifacts['scaler'].transform(model_matrix(features[known], self.feature_columns))
+            self.distances[known] = np.sqrt(((X[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2))
+
+        # Membres de chaque cluster (évite les scans cluster_data['cluster'] == id)
+        self._members = {
+            int(cluster_id): self.customer_ids[self.clusters == cluster_id].tolist()
+            for cluster_id in np.unique(self.clusters)
+        }
+
+    def __len__(self):
+        return len(self.customer_ids)
+
+    def __contains__(self, customer_id):
+        return customer_id in self._index
+
+    def get(self, customer_id):
+        """Retourne la fiche d'un client (dict JSON-sérialisable) ou None s'il est inconnu"""
+        i = self._index.get(customer_id)
+        if i is None:
+            return None
+
+        cluster_id = int(self.clusters[i])
+        return {
+            'customerID': customer_id,
+            'cluster': cluster_id,
+            'cluster_label': self.cluster_labels.get(cluster_id, f'Cluster {cluster_id}'),
+            'features': {
+                name: _json_float(value) for name, value in zip(self.feature_names, self.features[i])
+            },
+            'distances': {
+                str(k): _json_float(d) for k, d in enumerate(self.distances[i])
+            }
+        }
+
+    def get_many(self, customer_ids):
+        """
+        Recherche groupée
+
+        Returns:
+            (liste des fiches trouvées, liste des customerID inconnus)
+        """
+        found, missing = [], []
+        for customer_id in customer_ids:
+            record = self.get(customer_id)
+            if record is None:
+                missing.append(customer_id)
+            else:
+                found.append(record)
+        return found, missing
+
+    def customers_in_cluster(self, cluster_id):
+        """Liste des customerID appartenant à un cluster"""
+        return self._members.get(int(cluster_id), [])
+
+
+def _json_float(value):
+    """Convertit un float NumPy en float JSON (NaN -> None)"""
+    return None if np.isnan(value) else float(value)
+
+
+def register_cluster_api(server, cluster_lookup):
+    """
+    Enregistre les routes JSON de recherche de cluster sur le serveur Flask
+
+    - GET  /api/clusters/<customer_id>          : un client
+    - GET  /api/clusters?ids=ALFKI,ANATR        : plusieurs clients
+    - POST /api/clusters {"customer_ids": [...]}: plusieurs clients
+    """
+
+    @server.route('/api/clusters/<customer_id>', methods=['GET'])
+    def get_customer_cluster(customer_id):
+        record = cluster_lookup.get(customer_id)
+        if record is None:
+            return jsonify({'error': f"Client inconnu : {customer_id}"}), 404
+        return jsonify(record)
+
+    @server.route('/api/clusters', methods=['GET', 'POST'])
+    def get_customer_clusters():
+        if request.method == 'POST':
+            payload = request.get_json(silent=True) or {}
+            customer_ids = payload.get('customer_ids')
+        else:
+            ids = request.args.get('ids', '')
+            customer_ids = [i for i in ids.split(',') if i]
+
+        if not isinstance(customer_ids, list) or not customer_ids:
+            return jsonify({'error': "Paramètre 'customer_ids' (liste) ou 'ids' requis"}), 400
+        if len(customer_ids) > MAX_BULK_IDS:
+            return jsonify({'error': f"Maximum {MAX_BULK_IDS} clients par requête"}), 400
+
+        found, missing = cluster_lookup.get_many([str(i) for i in customer_ids])
+        return jsonify({'results': found, 'not_found': missing})
@@ -0,0 +1,187 @@
+"""
+Entraînement incrémental de la segmentation client (Mini-Batch K-Means)
+Lit les features clients par morceaux et met à jour les centroïdes au fil de l'eau
+"""
+
+import argparse
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.cluster import MiniBatchKMeans
+
+from feature_store import FEATURES_PATH, model_matrix
+from model_bundle import BUNDLE_PATH, export_bundle
+
+MODEL_PATH = Path("models/customer_clustering_model.pkl")
+CHUNK_SIZE = 10_000
+
+
+def iter_feature_chunks(features_path=FEATURES_PATH, chunksize=CHUNK_SIZE):
+    """Lit le fichier de features clients par morceaux de `chunksize` lignes"""
+    return pd.read_csv(features_path, chunksize=chunksize)
+
+
+def iter_batches(X, batch_size):
+    """
+    Découpe une matrice en mini-batchs de `batch_size` lignes
+
+    partial_fit ne redécoupe pas ses données : sans ce découpage, chaque morceau lu
+    (`chunksize` clients) serait un seul mini-batch et batch_size n'aurait aucun effet.
+    """
+    for start in range(0, len(X), batch_size):
+        yield X[start:start + batch_size]
+
+
+def create_streaming_model(model_artifacts, batch_size=1024, random_state=42):
+    """
+    Crée un MiniBatchKMeans initialisé sur les centroïdes du modèle existant
+
+    Partir des centroïdes actuels conserve la numérotation des clusters
+    (et donc les labels 'Low-Value Inactive', 'Lost Customers', 'VIP Premium').
+    """
+    current = model_artifacts.get('kmeans_model')
+    n_clusters = model_artifacts.get('n_clusters', getattr(current, 'n_clusters', 3))
+    init = current.cluster_centers_ if hasattr(current, 'cluster_centers_') else 'k-means++'
+
+    return MiniBatchKMeans(
+        n_clusters=n_clusters,
+        init=init,
+        n_init=1,
+        batch_size=batch_size,
+        random_state=random_state
+    )
+
+
+def compute_cluster_profiles(model_artifacts, kmeans, features_path=FEATURES_PATH, chunksize=CHUNK_SIZE):
+    """
+    Recalcule les profils moyens par cluster en une passe sur les morceaux
+
+    Seules les colonnes déjà présentes dans les profils existants sont conservées.
+    """
+    feature_cols = model_artifacts['feature_columns']
+    scaler = model_artifacts['scaler']
+    previous = model_artifacts.get('cluster_profiles')
+
+    sums, counts = None, None
+    for chunk in iter_feature_chunks(features_path, chunksize):
+        labels = kmeans.predict(scaler.transform(model_matrix(chunk, feature_cols)))
+
+        numeric = chunk.select_dtypes(include=[np.number])
+        if previous is not None:
+            numeric = numeric[[c for c in previous.columns if c in numeric.columns]]
+
+        chunk_sums = numeric.groupby(labels).sum()
+        chunk_counts = numeric.groupby(labels).size()
+        sums = chunk_sums if sums is None else sums.add(chunk_sums, fill_value=0)
+        counts = chunk_counts if counts is None else counts.add(chunk_counts, fill_value=0)
+
+    profiles = sums.div(counts, axis=0)
+    profiles.index.name = previous.index.name if previous is not None else 'cluster'
+    return profiles
+
+
+def train_streaming_kmeans(model_artifacts, features_path=FEATURES_PATH, chunksize=CHUNK_SIZE,
+                           n_epochs=1, batch_size=1024):
+    """
+    Entraîne un MiniBatchKMeans en streaming sur le fichier de features clients
+
+    Le scaler existant est réutilisé tel quel : un RobustScaler (médiane / IQR)
+    ne peut pas être ajusté incrémentalement, et le conserver garde l'espace
+    des centroïdes compatible avec les prédictions du dashboard.
+
+    Args:
+        model_artifacts: dictionnaire chargé depuis customer_clustering_model.pkl
+        features_path: CSV du feature store clients (feature_store.py)
+        chunksize: nombre de clients lus par morceau
+        n_epochs: nombre de passes sur le fichier
+        batch_size: taille des mini-batchs passés à partial_fit (chaque morceau est redécoupé)
+
+    Returns:
+        Nouveau dictionnaire d'artefacts où 'kmeans_model' et 'cluster_profiles' sont remplacés
+    """
+    feature_cols = model_artifacts['feature_columns']
+    scaler = model_artifacts['scaler']
+    kmeans = create_streaming_model(model_artifacts, batch_size=batch_size)
+
+    n_customers = 0
+    for epoch in range(n_epochs):
+        for chunk in iter_feature_chunks(features_path, chunksize):
+            X = scaler.transform(model_matrix(chunk, feature_cols))
+            for batch in iter_batches(X, batch_size):
+                kmeans.partial_fit(batch)
+            if epoch == 0:
+                n_customers += len(chunk)
+        print(f"   ✅ Passe {epoch + 1}/{n_epochs} terminée")
+
+    artifacts = dict(model_artifacts)
+    artifacts['kmeans_model'] = kmeans
+    artifacts['n_clusters'] = kmeans.n_clusters
+    artifacts['cluster_profiles'] = compute_cluster_profiles(model_artifacts, kmeans, features_path, chunksize)
+
+    print(f"   ✅ {n_customers:,} clients intégrés au modèle")
+    return artifacts
+
+
+def fold_in_customers(model_artifacts, customers_df):
+    """
+    Intègre de nouveaux clients au modèle sans réentraînement complet
+
+    Nécessite un 'kmeans_model' de type MiniBatchKMeans (voir train_streaming_kmeans).
+
+    Returns:
+        Array des clusters attribués aux nouveaux clients
+    """
+    kmeans = model_artifacts['kmeans_model']
+    if not hasattr(kmeans, 'partial_fit'):
+        raise TypeError("Le modèle chargé n'est pas incrémental : lancez d'abord train_streaming_kmeans")
+
+    X = model_artifacts['scaler'].transform(
+        model_matrix(customers_df, model_artifacts['feature_columns'])
+    )
+    for batch in iter_batches(X, kmeans.batch_size):
+        kmeans.partial_fit(batch)
+    return kmeans.predict(X)
+
+
+def main():
+    """Réentraîne le modèle de clustering en streaming"""
+    parser = argparse.ArgumentParser(description="Réentraînement Mini-Batch K-Means")
+    parser.add_argument('--features', default=str(FEATURES_PATH), help="CSV de features clients")
+    parser.add_argument('--model', default=str(MODEL_PATH), help="Fichier d'artefacts à mettre à jour")
+    parser.add_argument('--chunksize', type=int, default=CHUNK_SIZE, help="Clients lus par morceau")
+    parser.add_argument('--epochs', type=int, default=1, help="Nombre de passes sur les données")
+    parser.add_argument('--batch-size', type=int, default=1024, help="Taille des mini-batchs")
+    args = parser.parse_args()
+
+    print("\n" + "="*60)
+    print("🚀 RÉENTRAÎNEMENT STREAMING DU CLUSTERING")
+    print("="*60 + "\n")
+
+    model_artifacts = joblib.load(args.model)
+    artifacts = train_streaming_kmeans(
+        model_artifacts,
+        features_path=args.features,
+        chunksize=args.chunksize,
+        n_epochs=args.epochs,
+        batch_size=args.batch_size
+    )
+
+    joblib.dump(artifacts, args.model)
+    print(f"\n💾 Modèle sauvegardé dans {args.model}")
+
+    if Path(args.model) == MODEL_PATH:
+        export_bundle(artifacts, BUNDLE_PATH)
+        print(f"💾 Bundle NumPy mis à jour : {BUNDLE_PATH}")
+
+    print("\n📊 Profils des clusters:")
+    print(artifacts['cluster_profiles'][['recency', 'frequency', 'monetary']].round(1))
+
+    print("\n" + "="*60)
+    print("✅ RÉENTRAÎNEMENT TERMINÉ")
+    print("="*60 + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Pool de calcul partagé dans chaque processus (workers gunicorn threadés)
+Une file par type de travail, avec limite de concurrence et contre-pression
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Limites par défaut : (threads de calcul, requêtes en attente maximum)
+DEFAULT_LANES = {
+    'kpi': (4, 32),       # mises à jour du dashboard (rapides)
+    'cluster': (1, 4),    # analyse d'un segment (lourde)
+    'predict': (2, 16)    # prédiction d'un client
+}
+
+# Thread de calcul -> thread de la requête pour laquelle il travaille (profilage)
+_working_for = {}
+
+
+def delegated_threads(owner):
+    """Threads du pool qui exécutent en ce moment un calcul soumis par le thread owner"""
+    return [ident for ident, submitter in list(_working_for.items()) if submitter == owner]
+
+
+def _run_for(owner, fn, args, kwargs):
+    ident = threading.get_ident()
+    _working_for[ident] = owner
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        _working_for.pop(ident, None)
+
+
+class PoolSaturated(Exception):
+    """La file d'un type de travail est pleine : la requête est refusée"""
+
+
+class ComputeLane:
+    """File de calcul bornée pour un type de travail"""
+
+    def __init__(self, name, max_workers, max_pending, acquire_timeout=0.5):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.acquire_timeout = acquire_timeout
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    @property
+    def executor(self):
+        # Création paresseuse : les threads ne doivent pas exister avant le fork (preload)
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix=f"compute-{self.name}"
+                    )
+        return self._executor
+
+    def run(self, fn, *args, **kwargs):
+        """Exécute fn dans la file et attend son résultat (PoolSaturated si file pleine)"""
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            self.rejected += 1
+            raise PoolSaturated(self.name)
+        try:
+            return self.executor.submit(_run_for, threading.get_ident(), fn, args, kwargs).result()
+        finally:
+            self._slots.release()
+
+    def reset(self):
+        """Oublie l'executor (appelé dans le processus enfant après un fork)"""
+        self._executor = None
+        self._lock = threading.Lock()
+
+
+class ComputePool:
+    """
+    Ensemble de files de calcul indépendantes
+
+    Chaque type de travail a ses propres threads : une analyse de cluster lente
+    n'occupe jamais les threads des KPIs, et une file pleine refuse immédiatement
+    les nouvelles requêtes au lieu de les laisser s'accumuler.
+    """
+
+    def __init__(self, lanes=None, acquire_timeout=0.5):
+        lanes = lanes or DEFAULT_LANES
+        self.lanes = {
+            name: ComputeLane(name, workers, pending, acquire_timeout)
+            for name, (workers, pending) in lanes.items()
+        }
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def run(self, lane, fn, *args, **kwargs):
+        return self.lanes[lane].run(fn, *args, **kwargs)
+
+    def _after_fork(self):
+        for lane in self.lanes.values():
+            lane.reset()
+
+
+def lanes_from_env(environ=os.environ):
+    """
+    Lit les limites depuis l'environnement (ex: COMPUTE_POOL_CLUSTER="2,8")
+
+    Format : "threads,attente" par file.
+    """
+    lanes = dict(DEFAULT_LANES)
+    for name in lanes:
+        value = environ.get(f"COMPUTE_POOL_{name.upper()}")
+        if value:
+            workers, pending = (int(v) for v in value.split(','))
+            lanes[name] = (workers, pending)
+    return lanes
+
+
+def create_compute_pool():
+    """Crée le pool du processus si COMPUTE_POOL=1 (configuration gunicorn threadée)"""
+    if os.environ.get('COMPUTE_POOL', '0') != '1':
+        return None
+    return ComputePool(lanes_from_env())
@@ -3,6 +3,8 @@ Script de nettoyage et typage des données CSV
 Prépare les données pour la visualisation Dash
 """
 
+import argparse
+
 import pandas as pd
 import numpy as np
 from pathlib import Path
@@ -13,11 +15,11 @@ CLEANED_DIR = Path("data/cleaned")
 CLEANED_DIR.mkdir(exist_ok=True)
 
 
-def clean_customers():
+def clean_customers(data_dir=DATA_DIR, cleaned_dir=CLEANED_DIR):
     """Nettoie et type le fichier customers.csv"""
     print("🧹 Nettoyage de customers.csv...")
     
-    df = pd.read_csv(DATA_DIR / "customers.csv")
+    df = pd.read_csv(Path(data_dir) / "customers.csv")
     
     # Remplacer 'NULL' par NaN
     df = df.replace('NULL', np.nan)
@@ -27,16 +29,16 @@ def clean_customers():
     df['companyName'] = df['companyName'].astype(str)
     
     # Sauvegarder
-    df.to_csv(CLEANED_DIR / "customers_clean.csv", index=False)
+    df.to_csv(Path(cleaned_dir) / "customers_clean.csv", index=False)
     print(f"   ✅ {len(df)} clients nettoyés")
     return df
 
 
-def clean_products():
+def clean_products(data_dir=DATA_DIR, cleaned_dir=CLEANED_DIR):
     """Nettoie et type le fichier products.csv"""
     print("🧹 Nettoyage de products.csv...")
     
-    df = pd.read_csv(DATA_DIR / "products.csv")
+    df = pd.read_csv(Path(data_dir) / "products.csv")
     
     # Remplacer 'NULL' par NaN
     df = df.replace('NULL', np.nan)
@@ -53,16 +55,16 @@ def clean_products():
     df['discontinued'] = df['discontinued'].astype(int)
     
     # Sauvegarder
-    df.to_csv(CLEANED_DIR / "products_clean.csv", index=False)
+    df.to_csv(Path(cleaned_dir) / "products_clean.csv", index=False)
     print(f"   ✅ {len(df)} produits nettoyés")
     return df
 
 
-def clean_orders():
+def clean_orders(data_dir=DATA_DIR, cleaned_dir=CLEANED_DIR):
     """Nettoie et type le fichier orders.csv"""
     print("🧹 Nettoyage de orders.csv...")
     
-    df = pd.read_csv(DATA_DIR / "orders.csv")
+    df = pd.read_csv(Path(data_dir) / "orders.csv")
     
     # Remplacer 'NULL' par NaN
     df = df.replace('NULL', np.nan)
@@ -82,17 +84,17 @@ def clean_orders():
     df['freight'] = pd.to_numeric(df['freight'], errors='coerce')
     
     # Sauvegarder
-    df.to_csv(CLEANED_DIR / "orders_clean.csv", index=False)
+    df.to_csv(Path(cleaned_dir) / "orders_clean.csv", index=False)
     print(f"   ✅ {len(df)} commandes nettoyées")
     print(f"   📅 Période : {df['orderDate'].min()} à {df['orderDate'].max()}")
     return df
 
 
-def clean_order_details():
+def clean_order_details(data_dir=DATA_DIR, cleaned_dir=CLEANED_DIR):
     """Nettoie et type le fichier order_details.csv"""
     print("🧹 Nettoyage de order_details.csv...")
     
-    df = pd.read_csv(DATA_DIR / "order_details.csv")
+    df = pd.read_csv(Path(data_dir) / "order_details.csv")
     
     # Types de colonnes
     df['orderID'] = df['orderID'].astype(int)
@@ -105,43 +107,54 @@ def clean_order_details():
     df['lineTotal'] = df['unitPrice'] * df['quantity'] * (1 - df['discount'])
     
     # Sauvegarder
-    df.to_csv(CLEANED_DIR / "order_details_clean.csv", index=False)
+    df.to_csv(Path(cleaned_dir) / "order_details_clean.csv", index=False)
     print(f"   ✅ {len(df)} lignes de détails nettoyées")
     return df
 
 
-def clean_categories():
+def clean_categories(data_dir=DATA_DIR, cleaned_dir=CLEANED_DIR):
     """Nettoie et type le fichier categories.csv"""
     print("🧹 Nettoyage de categories.csv...")
     
-    df = pd.read_csv(DATA_DIR / "categories.csv")
+    df = pd.read_csv(Path(data_dir) / "categories.csv")
     df = df.replace('NULL', np.nan)
     
     df['categoryID'] = df['categoryID'].astype(int)
     df['categoryName'] = df['categoryName'].astype(str)
     
-    df.to_csv(CLEANED_DIR / "categories_clean.csv", index=False)
+    df.to_csv(Path(cleaned_dir) / "categories_clean.csv", index=False)
     print(f"   ✅ {len(df)} catégories nettoyées")
     return df
 
 
-def main():
+def main(argv=None):
     """Lance le nettoyage de tous les fichiers"""
+
+    parser = argparse.ArgumentParser(description="Nettoie les CSV bruts Northwind")
+    parser.add_argument('--data-dir', default=str(DATA_DIR), help="répertoire des CSV bruts")
+    parser.add_argument('--cleaned-dir', help="répertoire de sortie (défaut : <data-dir>/cleaned)")
+    args = parser.parse_args(argv)
+    
+    # Répertoires passés aux fonctions : DATA_DIR / CLEANED_DIR du module restent inchangés
+    data_dir = Path(args.data_dir)
+    cleaned_dir = Path(args.cleaned_dir) if args.cleaned_dir else data_dir / "cleaned"
+    cleaned_dir.mkdir(parents=True, exist_ok=True)
+    
     print("\n" + "="*60)
     print("🚀 NETTOYAGE DES DONNÉES - TP DataViz")
     print("="*60 + "\n")
     
     # Nettoyer les fichiers principaux
-    customers_df = clean_customers()
-    products_df = clean_products()
-    orders_df = clean_orders()
-    order_details_df = clean_order_details()
-    categories_df = clean_categories()
+    customers_df = clean_customers(data_dir, cleaned_dir)
+    products_df = clean_products(data_dir, cleaned_dir)
+    orders_df = clean_orders(data_dir, cleaned_dir)
+    order_details_df = clean_order_details(data_dir, cleaned_dir)
+    categories_df = clean_categories(data_dir, cleaned_dir)
     
     print("\n" + "="*60)
     print("✅ NETTOYAGE TERMINÉ")
     print("="*60)
-    print(f"📁 Fichiers nettoyés dans : {CLEANED_DIR}")
+    print(f"📁 Fichiers nettoyés dans : {cleaned_dir}")
     print("\n📊 Résumé :")
     print(f"   - Clients      : {len(customers_df):,}")
     print(f"   - Produits     : {len(products_df):,}")
@@ -3,63 +3,226 @@ Modèle de données - Création des relations entre tables
 Prépare les DataFrames pour les visualisations Dash
 """
 
+import os
+import threading
+
 import pandas as pd
 import numpy as np
 from pathlib import Path
 
+from month_index import MonthIndex
+from partitions import (DEFAULT_MAX_LOADED, PartitionedDataset, month_groups, partition_fingerprint,
+                        partitions_dir, partitions_fresh, rebuild_lock, write_partitions)
+from session_state import FilterState, create_session_cache, filter_positions
+from startup_timeline import timeline
+from topk import TopKIndex, top_k_rows
+
 CLEANED_DIR = Path("data/cleaned")
 
 
+def compact_frame(df):
+    """
+    Disposition adaptée au partage entre workers (gunicorn --preload, copy-on-write)
+
+    Les colonnes texte (dtype object) deviennent des category : un tableau de codes
+    entiers contigu au lieu d'un pointeur par ligne vers un objet str, dont le compteur
+    de références est écrit à chaque lecture (ce qui copie la page dans le worker).
+    copy() regroupe ensuite les colonnes de même dtype en un seul bloc NumPy.
+    """
+    text_columns = df.select_dtypes(include='object').columns
+    return df.astype({column: 'category' for column in text_columns}).copy()
+
+
 class DataModel:
     """Classe pour gérer le modèle de données avec relations"""
     
-    def __init__(self):
-        """Charge les données nettoyées"""
-        print("📂 Chargement des données nettoyées...")
+    def __init__(self, cleaned_dir=CLEANED_DIR, verbose=True, partitioned=False, max_loaded=DEFAULT_MAX_LOADED):
+        """
+        Charge les données nettoyées
         
-        self.customers = pd.read_csv(CLEANED_DIR / "customers_clean.csv")
-        self.products = pd.read_csv(CLEANED_DIR / "products_clean.csv")
-        self.categories = pd.read_csv(CLEANED_DIR / "categories_clean.csv")
-        self.orders = pd.read_csv(CLEANED_DIR / "orders_clean.csv", parse_dates=['orderDate', 'requiredDate', 'shippedDate'])
-        self.order_details = pd.read_csv(CLEANED_DIR / "order_details_clean.csv")
+        Args:
+            cleaned_dir: répertoire des CSV nettoyés (ex: data/synthetic/x100/cleaned) ;
+                le feature store est rangé dans le répertoire 'enriched' voisin
+            verbose: affiche la progression (app.py l'affiche dans sa chronologie de démarrage)
+            partitioned: full_dataset stocké par mois dans le répertoire 'partitions' voisin
+                (écrit mois par mois s'il est absent ou périmé) ; les filtres ne lisent que les
+                mois utiles, full_dataset n'est jamais gardé en mémoire et orders / order_details
+                ne sont lus qu'au premier accès (reconstruction des partitions ou du feature store)
+            max_loaded: partitions gardées en mémoire en mode partitionné
+        """
+        self.verbose = verbose
+        self._log("📂 Chargement des données nettoyées...")
         
-        print(f"   ✅ Données chargées")
+        self.cleaned_dir = Path(cleaned_dir)
+        with timeline.phase('read_csv.customers'):
+            self.customers = pd.read_csv(self.cleaned_dir / "customers_clean.csv")
+        with timeline.phase('read_csv.products'):
+            self.products = pd.read_csv(self.cleaned_dir / "products_clean.csv")
+        with timeline.phase('read_csv.categories'):
+            self.categories = pd.read_csv(self.cleaned_dir / "categories_clean.csv")
+        self._orders = self._order_details = None
+        self._facts_lock = threading.Lock()
+        self._order_details_enriched = self._orders_enriched = None
+        self._views_lock = threading.Lock()
+        if not partitioned:
+            # Tables de faits lues au démarrage (en mode partitionné : au premier accès)
+            self._orders = self._read_orders()
+            self._order_details = self._read_order_details()
         
-        # Créer les vues enrichies
-        self._create_views()
+        self._log(f"   ✅ Données chargées")
+        
+        self._customer_features = None
+        self._features_lock = threading.Lock()  # workers gunicorn threadés
+        self._month_index = None
+        self._top_k_indexes = {}
+        self._index_lock = threading.Lock()
+        self.session_filters = create_session_cache()
+        
+        self._full_dataset = None
+        self.partitions = None
+        if partitioned:
+            self._open_partitions(max_loaded)
+        else:
+            # Créer les vues enrichies
+            self._create_views()
+    
+    def _log(self, message):
+        if self.verbose:
+            print(message)
+    
+    def _read_orders(self):
+        with timeline.phase('read_csv.orders'):
+            return pd.read_csv(self.cleaned_dir / "orders_clean.csv", parse_dates=['orderDate', 'requiredDate', 'shippedDate'])
+    
+    def _read_order_details(self):
+        with timeline.phase('read_csv.order_details'):
+            return pd.read_csv(self.cleaned_dir / "order_details_clean.csv")
+    
+    @property
+    def orders(self):
+        """Table des commandes (en mode partitionné : lue au premier accès puis gardée)"""
+        if self._orders is None:
+            with self._facts_lock:
+                if self._orders is None:
+                    self._orders = self._read_orders()
+        return self._orders
+    
+    @property
+    def order_details(self):
+        """Lignes de commande (en mode partitionné : lues au premier accès puis gardées)"""
+        if self._order_details is None:
+            with self._facts_lock:
+                if self._order_details is None:
+                    self._order_details = self._read_order_details()
+        return self._order_details
     
     def _create_views(self):
         """Crée des vues enrichies avec jointures"""
-        print("\n🔗 Création des vues avec relations...")
-        
-        # Vue complète : order_details + products + categories
-        self.order_details_enriched = self.order_details.merge(
-            self.products[['productID', 'productName', 'categoryID', 'supplierID']],
-            on='productID',
-            how='left'
-        ).merge(
-            self.categories[['categoryID', 'categoryName']],
-            on='categoryID',
-            how='left'
-        )
-        print(f"   ✅ order_details_enriched créé ({len(self.order_details_enriched)} lignes)")
-        
-        # Vue commandes complètes : orders + customers
-        self.orders_enriched = self.orders.merge(
-            self.customers[['customerID', 'companyName', 'country', 'city', 'region']],
-            on='customerID',
-            how='left'
-        )
-        print(f"   ✅ orders_enriched créé ({len(self.orders_enriched)} lignes)")
+        self._log("\n🔗 Création des vues avec relations...")
         
         # Vue complète : tout ensemble
         # order_details -> products -> categories + orders -> customers
-        self.full_dataset = self.order_details_enriched.merge(
-            self.orders_enriched,
-            on='orderID',
-            how='left'
-        )
-        print(f"   ✅ full_dataset créé ({len(self.full_dataset)} lignes)")
+        # Les vues intermédiaires sont gardées : calculées ici, avant le fork des workers
+        with timeline.phase('merge.order_details_enriched'):
+            order_details_enriched = self.order_details_enriched
+        with timeline.phase('merge.orders_enriched'):
+            orders_enriched = self.orders_enriched
+        with timeline.phase('merge.full_dataset'):
+            self._full_dataset = compact_frame(order_details_enriched.merge(
+                orders_enriched,
+                on='orderID',
+                how='left'
+            ))
+        self._log(f"   ✅ full_dataset créé ({len(self._full_dataset)} lignes)")
+    
+    def _open_partitions(self, max_loaded):
+        """Ouvre les partitions mensuelles, en les (ré)écrivant si les CSV ont changé"""
+        directory = partitions_dir(self.cleaned_dir)
+        if not partitions_fresh(directory, self.cleaned_dir):
+            # Un seul worker reconstruit ; les autres attendent puis trouvent les partitions à jour
+            with rebuild_lock(directory):
+                if not partitions_fresh(directory, self.cleaned_dir):
+                    self.write_partitions(directory)
+        self.partitions = PartitionedDataset(directory, max_loaded)
+        self._log(f"   ✅ {len(self.partitions.partitions)} partitions mensuelles ({len(self.partitions)} lignes)")
+    
+    def _partition_chunks(self):
+        """
+        (nom, lignes de full_dataset) par mois de commande, jointes un mois à la fois
+        
+        Les tables de référence et orders_enriched sont converties en entier avant : toutes
+        les partitions partagent les mêmes catégories. Même index que full_dataset.
+        """
+        order_details = compact_frame(self.order_details)
+        orders_enriched = self.orders_enriched
+        products, categories = self._reference_frames()
+        dates = order_details['orderID'].map(orders_enriched.set_index('orderID')['orderDate'])
+        for name, rows in month_groups(dates):
+            chunk = self._enrich_order_details(order_details.take(rows), products, categories)
+            chunk = chunk.merge(orders_enriched, on='orderID', how='left')
+            yield name, chunk.set_axis(pd.Index(rows), axis=0)
+    
+    def write_partitions(self, directory=None):
+        """
+        Écrit les partitions mensuelles sans construire full_dataset (à appeler sous rebuild_lock)
+        
+        Returns:
+            manifeste (dict)
+        """
+        directory = partitions_dir(self.cleaned_dir) if directory is None else directory
+        fingerprint = partition_fingerprint(self.cleaned_dir)
+        with timeline.phase('partitions.write'):
+            manifest = write_partitions(self._partition_chunks(), directory, fingerprint)
+        self._log(f"   ✅ Partitions réécrites ({manifest['build']})")
+        return manifest
+    
+    @property
+    def full_dataset(self):
+        """
+        Jointure complète
+        
+        En mode partitionné, toutes les partitions sont relues à chaque accès et le résultat
+        n'est pas gardé : réservé aux scripts et au payload du mode navigateur, les callbacks
+        passent par get_filtered_data, get_customer_rows et les index.
+        """
+        if self.partitions is not None:
+            with timeline.phase('partitions.full_dataset'):
+                return self.partitions.frame()
+        return self._full_dataset
+    
+    def _reference_frames(self):
+        """Colonnes de products et categories jointes aux lignes de commande"""
+        # Tables de référence converties avant la jointure : seuls les codes sont recopiés
+        return (compact_frame(self.products[['productID', 'productName', 'categoryID', 'supplierID']]),
+                compact_frame(self.categories[['categoryID', 'categoryName']]))
+    
+    @staticmethod
+    def _enrich_order_details(order_details, products, categories):
+        return order_details.merge(products, on='productID', how='left').merge(
+            categories, on='categoryID', how='left')
+    
+    @property
+    def order_details_enriched(self):
+        """Vue order_details + products + categories (calculée une seule fois)"""
+        if self._order_details_enriched is None:
+            with self._views_lock:
+                if self._order_details_enriched is None:
+                    self._order_details_enriched = self._enrich_order_details(
+                        self.order_details, *self._reference_frames())
+        return self._order_details_enriched
+    
+    @property
+    def orders_enriched(self):
+        """Vue commandes complètes : orders + customers (calculée une seule fois, texte en category)"""
+        if self._orders_enriched is None:
+            with self._views_lock:
+                if self._orders_enriched is None:
+                    self._orders_enriched = compact_frame(self.orders.merge(
+                        compact_frame(self.customers[['customerID', 'companyName', 'country', 'city', 'region']]),
+                        on='customerID',
+                        how='left'
+                    ))
+        return self._orders_enriched
         
     def get_sales_by_period(self, period='M'):
         """
@@ -84,7 +247,7 @@ class DataModel:
     
     def get_top_products(self, top_n=10):
         """Retourne les N produits les plus vendus"""
-        top = self.full_dataset.groupby('productName').agg({
+        top = self.full_dataset.groupby('productName', observed=True).agg({
             'lineTotal': 'sum',
             'quantity': 'sum'
         }).reset_index().sort_values('lineTotal', ascending=False).head(top_n)
@@ -94,7 +257,7 @@ class DataModel:
     
     def get_sales_by_country(self):
         """Retourne les ventes par pays"""
-        sales = self.full_dataset.groupby('country').agg({
+        sales = self.full_dataset.groupby('country', observed=True).agg({
             'lineTotal': 'sum',
             'orderID': 'nunique',
             'customerID': 'nunique'
@@ -105,7 +268,7 @@ class DataModel:
     
     def get_sales_by_category(self):
         """Retourne les ventes par catégorie"""
-        sales = self.full_dataset.groupby('categoryName').agg({
+        sales = self.full_dataset.groupby('categoryName', observed=True).agg({
             'lineTotal': 'sum',
             'quantity': 'sum'
         }).reset_index().sort_values('lineTotal', ascending=False)
@@ -115,7 +278,7 @@ class DataModel:
     
     def get_customer_stats(self):
         """Retourne les statistiques par client"""
-        stats = self.full_dataset.groupby(['customerID', 'companyName', 'country']).agg({
+        stats = self.full_dataset.groupby(['customerID', 'companyName', 'country'], observed=True).agg({
             'lineTotal': 'sum',
             'orderID': 'nunique',
             'quantity': 'sum'
@@ -126,6 +289,88 @@ class DataModel:
         
         return stats
     
+    def get_customer_features(self):
+        """Retourne la table de features clients (feature store, chargée une seule fois)"""
+        if self._customer_features is None:
+            with self._features_lock:
+                if self._customer_features is None:
+                    from feature_store import load_customer_features
+                    enriched_dir = self.cleaned_dir.parent / "enriched"
+                    with timeline.phase('feature_store'):
+                        self._customer_features = load_customer_features(
+                            self,
+                            cleaned_dir=self.cleaned_dir,
+                            features_path=enriched_dir / "customer_features.csv",
+                            meta_path=enriched_dir / "customer_features.meta.json"
+                        )
+        return self._customer_features
+    
+    @property
+    def month_index(self):
+        """
+        Index mensuel de full_dataset (construit une seule fois)
+        
+        En mode partitionné, lu dans le manifeste : mois et bornes de dates, sans positions de lignes
+        """
+        if self._month_index is None:
+            with self._index_lock:
+                if self._month_index is None:
+                    with timeline.phase('month_index'):
+                        if self.partitions is not None:
+                            self._month_index = self.partitions.month_index()
+                        else:
+                            self._month_index = MonthIndex(self.full_dataset['orderDate'])
+        return self._month_index
+    
+    def top_k_index(self, column):
+        """Classement mensuel pré-agrégé de column par CA (construit une seule fois par colonne)"""
+        if self.partitions is not None:
+            raise ValueError("TopKIndex indisponible en mode partitionné (full_dataset non chargé)")
+        index = self._top_k_indexes.get(column)
+        if index is None:
+            month_index = self.month_index
+            with self._index_lock:
+                index = self._top_k_indexes.get(column)
+                if index is None:
+                    with timeline.phase(f'top_k.{column}'):
+                        index = TopKIndex(self.full_dataset, month_index, column)
+                    self._top_k_indexes[column] = index
+        return index
+    
+    def get_top_k(self, column, k, start_date=None, end_date=None, countries=None, categories=None, filtered=None):
+        """
+        Retourne les k valeurs de column au plus fort CA (lineTotal) sous les filtres
+        
+        Équivaut à groupby(column)['lineTotal'].sum().nlargest(k) sur les données filtrées,
+        sans parcourir les mois entièrement couverts par la période.
+        
+        Args:
+            filtered: résultat de get_filtered_data pour les mêmes filtres (optionnel),
+                utilisé si un filtre ne peut pas être lu dans l'index
+        
+        Returns:
+            Series indexée par column, par CA décroissant
+        """
+        if self.partitions is not None:
+            # Mode partitionné : bincount sur les lignes filtrées (seules les partitions utiles sont lues)
+            if filtered is None:
+                filtered = self.get_filtered_data(start_date, end_date, countries, categories)
+            return top_k_rows(filtered, column, k)
+        state = FilterState(start_date, end_date, countries, categories)
+        return self.top_k_index(column).query(state, k, filtered)
+    
+    def get_filter_options(self):
+        """Pays, catégories et bornes de dates proposés par les filtres du dashboard"""
+        if self.partitions is not None:
+            # Lus dans le manifeste : aucune partition chargée
+            return self.partitions.filter_options()
+        return {
+            'countries': sorted(self.full_dataset['country'].dropna().unique()),
+            'categories': sorted(self.full_dataset['categoryName'].dropna().unique()),
+            'min_date': self.full_dataset['orderDate'].min(),
+            'max_date': self.full_dataset['orderDate'].max()
+        }
+    
     def get_kpi_summary(self):
         """Retourne les KPIs principaux"""
         total_revenue = self.full_dataset['lineTotal'].sum()
@@ -142,7 +387,34 @@ class DataModel:
             'active_products': self.full_dataset['productID'].nunique()
         }
     
-    def get_filtered_data(self, start_date=None, end_date=None, countries=None, categories=None):
+    def memory_usage(self):
+        """Mémoire occupée par chaque table chargée, en octets (colonnes objet comprises)"""
+        tables = {
+            'customers': self.customers,
+            'products': self.products,
+            'categories': self.categories
+        }
+        if self._orders is not None:
+            tables['orders'] = self._orders
+        if self._order_details is not None:
+            tables['order_details'] = self._order_details
+        if self._order_details_enriched is not None:
+            tables['order_details_enriched'] = self._order_details_enriched
+        if self._orders_enriched is not None:
+            tables['orders_enriched'] = self._orders_enriched
+        if self._full_dataset is not None:
+            tables['full_dataset'] = self._full_dataset
+        if self._customer_features is not None:
+            tables['customer_features'] = self._customer_features
+        usage = {name: int(df.memory_usage(deep=True).sum()) for name, df in tables.items()}
+        for column, index in self._top_k_indexes.items():
+            usage[f'top_k.{column}'] = index.memory_usage()
+        if self.partitions is not None:
+            usage['partitions'] = self.partitions.memory_usage()
+        return usage
+    
+    def get_filtered_data(self, start_date=None, end_date=None, countries=None, categories=None, session_id=None,
+                          stats=None):
         """
         Retourne les données filtrées selon les critères
         
@@ -151,22 +423,63 @@ class DataModel:
             end_date: date de fin (str ou datetime)
             countries: liste de pays
             categories: liste de catégories
+            session_id: session du navigateur (optionnel) ; si les filtres affinent ceux
+                de la requête précédente de la session, seul son sous-ensemble est refiltré
+            stats: dict optionnel complété avec 'rows_scanned' (lignes parcourues par le filtre)
+        
+        En mode partitionné, seules les partitions mensuelles compatibles sont lues
+        (session_id n'est pas utilisé : les positions gardées par session sont celles de full_dataset).
         """
-        df = self.full_dataset.copy()
+        state = FilterState(start_date, end_date, countries, categories)
+        if self.partitions is not None:
+            return self.partitions.filter(state, stats)
         
-        if start_date:
-            df = df[df['orderDate'] >= pd.to_datetime(start_date)]
+        base = None
+        if session_id is not None:
+            previous = self.session_filters.get(session_id)
+            if previous is not None and state.refines(previous[0]):
+                base = previous[1]
+                self.session_filters.hits += 1
+            else:
+                self.session_filters.misses += 1
         
-        if end_date:
-            df = df[df['orderDate'] <= pd.to_datetime(end_date)]
+        positions = filter_positions(self.full_dataset, state, base)
+        if stats is not None:
+            stats['rows_scanned'] = len(self.full_dataset) if base is None else len(base)
+        if session_id is not None:
+            self.session_filters.set(session_id, state, positions)
         
-        if countries:
-            df = df[df['country'].isin(countries)]
+        return self.full_dataset.take(positions)
+    
+    def get_customer_rows(self, customer_ids, stats=None):
+        """
+        Lignes de full_dataset des clients donnés
         
-        if categories:
-            df = df[df['categoryName'].isin(categories)]
+        En mode partitionné, les partitions sont parcourues une à une et seules les lignes
+        de ces clients sont gardées.
         
-        return df
+        Args:
+            stats: dict optionnel complété avec 'rows_scanned'
+        """
+        if self.partitions is not None:
+            return self.partitions.select('customerID', customer_ids, stats)
+        if stats is not None:
+            stats['rows_scanned'] = len(self.full_dataset)
+        return self.full_dataset[self.full_dataset['customerID'].isin(customer_ids)]
+
+def create_data_model(cleaned_dir=CLEANED_DIR, verbose=False):
+    """
+    Crée le DataModel du serveur
+
+    DASHBOARD_PARTITIONS=1 : full_dataset stocké par mois (voir partitions.py) ;
+    DASHBOARD_PARTITIONS_LOADED : nombre de partitions gardées en mémoire.
+    """
+    return DataModel(
+        cleaned_dir,
+        verbose=verbose,
+        partitioned=os.environ.get('DASHBOARD_PARTITIONS', '0') == '1',
+        max_loaded=int(os.environ.get('DASHBOARD_PARTITIONS_LOADED', DEFAULT_MAX_LOADED))
+    )
 
 
 def main():
@@ -0,0 +1,340 @@
+"""
+Décomptes distincts approchés (HyperLogLog) pour les KPIs du dashboard
+- Un sketch par cellule (mois x pays x catégorie) et par colonne (commandes, clients),
+  calculé une fois au démarrage
+- Sous filtres, les sketches des mois entièrement couverts sont fusionnés (maximum des
+  registres) ; les mois coupés par les dates du filtre sont comptés sur leurs lignes
+- Le coût ne dépend plus du nombre de lignes filtrées mais du nombre de cellules
+
+Mode opt-in (DASHBOARD_DISTINCT=approx) ; les petits résultats restent comptés exactement.
+"""
+
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+from month_index import MonthIndex
+
+DEFAULT_ERROR = 0.02
+DEFAULT_EXACT_BELOW = 20000
+MIN_PRECISION = 4
+MAX_PRECISION = 16
+
+# Colonnes comptées -> nom du décompte
+DISTINCT_COLUMNS = {'orderID': 'orders', 'customerID': 'customers'}
+
+
+def precision_for_error(error):
+    """Précision p (2^p registres) dont l'erreur type 1.04/√(2^p) ne dépasse pas error"""
+    p = math.ceil(math.log2((1.04 / error) ** 2))
+    return min(MAX_PRECISION, max(MIN_PRECISION, p))
+
+
+def hash64(values):
+    """Hachage 64 bits vectorisé d'entiers (finaliseur splitmix64)"""
+    z = values.astype(np.uint64)
+    with np.errstate(over='ignore'):
+        z = z + np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+def register_updates(values, precision):
+    """
+    (registre, rang) de chaque valeur : les p premiers bits du hachage choisissent le
+    registre, le rang est la position du premier bit à 1 dans les bits restants
+    """
+    hashed = hash64(values)
+    index = (hashed >> np.uint64(64 - precision)).astype(np.intp)
+    # Bit sentinelle : rang au plus 64 - p + 1
+    rest = (hashed << np.uint64(precision)) | np.uint64(1 << (precision - 1))
+    bit_length = np.ones(len(rest), dtype=np.uint8)
+    for shift in (32, 16, 8, 4, 2, 1):
+        high = rest >= np.uint64(1 << shift)
+        bit_length += high.astype(np.uint8) * shift
+        rest = np.where(high, rest >> np.uint64(shift), rest)
+    return index, (65 - bit_length).astype(np.uint8)
+
+
+def _sigma(x):
+    if x == 1.0:
+        return math.inf
+    y, z = 1.0, x
+    while True:
+        x *= x
+        previous = z
+        z += x * y
+        y *= 2
+        if z == previous:
+            return z
+
+
+def _tau(x):
+    if x == 0.0 or x == 1.0:
+        return 0.0
+    y, z = 1.0, 1.0 - x
+    while True:
+        x = math.sqrt(x)
+        previous = z
+        y *= 0.5
+        z -= (1 - x) ** 2 * y
+        if z == previous:
+            return z / 3
+
+
+def estimate(registers, precision):
+    """
+    Cardinalité estimée depuis un jeu de registres
+
+    Estimateur amélioré d'Ertl (« New cardinality estimation algorithms for
+    HyperLogLog sketches », 2017) : sans biais sur toute la plage, sans table de
+    correction ni bascule vers le comptage linéaire.
+    """
+    m = 1 << precision
+    q = 64 - precision
+    counts = np.bincount(registers, minlength=q + 2)
+    if counts[0] == m:
+        return 0
+    z = m * _tau(1 - counts[q + 1] / m)
+    for k in range(q, 0, -1):
+        z = 0.5 * (z + counts[k])
+    z += m * _sigma(counts[0] / m)
+    return int(round(m * m / (2 * math.log(2)) / z))
+
+
+class DistinctSketches:
+    """
+    Sketches HyperLogLog par cellule (mois x pays x catégorie) de full_dataset
+
+    Args:
+        dataset: full_dataset (orderDate, country, categoryName, orderID, customerID)
+        precision: 2^precision registres d'un octet par cellule et par colonne
+        exact_below: en dessous de ce nombre de lignes filtrées, décompte exact
+        month_index: MonthIndex de dataset['orderDate'] (construit s'il n'est pas fourni)
+    """
+
+    def __init__(self, dataset, precision=None, exact_below=DEFAULT_EXACT_BELOW, month_index=None):
+        month_index = month_index or MonthIndex(dataset['orderDate'])
+        country_codes, countries = pd.factorize(dataset['country'], sort=True)
+        category_codes, categories = pd.factorize(dataset['categoryName'], sort=True)
+        self._setup(precision, exact_below, month_index, countries, categories)
+        self._build([self._chunk(month_index.codes, country_codes, category_codes, dataset)])
+
+    @classmethod
+    def from_partitions(cls, partitioned, precision=None, exact_below=DEFAULT_EXACT_BELOW, month_index=None):
+        """
+        Sketches d'un PartitionedDataset, construits partition par partition
+
+        Seuls les registres de la partition en cours s'ajoutent aux sketches : le jeu
+        complet n'est jamais chargé. Pays et catégories sont codés selon les catégories
+        du manifeste, communes à toutes les partitions.
+        """
+        sketches = cls.__new__(cls)
+        month_index = month_index or partitioned.month_index()
+        countries = partitioned.dtypes['country'].categories
+        categories = partitioned.dtypes['categoryName'].categories
+        sketches._setup(precision, exact_below, month_index, countries, categories)
+        sketches._build(
+            sketches._chunk(month_index.month_codes(frame['orderDate']), frame['country'].cat.codes.to_numpy(),
+                            frame['categoryName'].cat.codes.to_numpy(), frame)
+            for _, frame in partitioned.scan()
+        )
+        return sketches
+
+    def _setup(self, precision, exact_below, month_index, countries, categories):
+        self.precision = precision or precision_for_error(DEFAULT_ERROR)
+        self.exact_below = exact_below
+        self.counts = {'approx': 0, 'exact': 0}
+        self.month_index = month_index
+        self.months = month_index.months
+        self.countries, self.categories = countries, categories
+
+    def _chunk(self, month_codes, country_codes, category_codes, frame):
+        """
+        Cellules non vides de frame et leurs registres
+
+        Mois (-1 : date manquante), pays et catégories (-1 : valeur manquante) réunis en une
+        clé entière décalée de 1 : l'ordre des clés est celui des mois, puis pays, puis catégorie
+        """
+        n_countries, n_categories = len(self.countries) + 1, len(self.categories) + 1
+        keys = ((month_codes.astype(np.int64) + 1) * n_countries + country_codes + 1) * n_categories + category_codes + 1
+        cells, row_cells = np.unique(keys, return_inverse=True)
+        registers = {}
+        for column, name in DISTINCT_COLUMNS.items():
+            values, present = self._values(frame[column])
+            index, rank = register_updates(values[present], self.precision)
+            registers[name] = np.zeros((len(cells), 1 << self.precision), dtype=np.uint8)
+            np.maximum.at(registers[name], (row_cells[present], index), rank)
+        return cells, registers
+
+    def _build(self, chunks):
+        """Assemble les cellules de chunks (mois disjoints) et pré-fusionne les registres par mois"""
+        all_cells, all_registers = [], {name: [] for name in DISTINCT_COLUMNS.values()}
+        for cells, registers in chunks:
+            all_cells.append(cells)
+            for name, values in registers.items():
+                all_registers[name].append(values)
+        m = 1 << self.precision
+        cells = np.concatenate(all_cells) if all_cells else np.empty(0, dtype=np.int64)
+        order = np.argsort(cells, kind='stable')
+        cells = cells[order]
+
+        n_countries, n_categories = len(self.countries) + 1, len(self.categories) + 1
+        self.cell_month = cells // (n_countries * n_categories) - 1
+        self.cell_country = cells // n_categories % n_countries - 1
+        self.cell_category = cells % n_categories - 1
+
+        # Cellules de chaque mois : tranche [month_start[i], month_start[i + 1]) (cellules triées)
+        self.month_start = np.searchsorted(self.cell_month, np.arange(len(self.months) + 1))
+        undated = slice(0, self.month_start[0])  # cellules sans date (mois -1) en tête
+
+        self.registers, self.month_registers, self.undated_registers = {}, {}, {}
+        for name, parts in all_registers.items():
+            registers = np.concatenate(parts)[order] if parts else np.zeros((0, m), dtype=np.uint8)
+            self.registers[name] = registers
+            # Mois entiers tous pays et catégories confondus (cas sans filtre pays/catégorie)
+            self.month_registers[name] = self._merge_by_month(registers, np.arange(len(cells)),
+                                                              np.arange(len(self.months)))
+            self.undated_registers[name] = registers[undated].max(axis=0, initial=0)
+
+    @staticmethod
+    def _values(column):
+        """Entiers à hacher et masque des valeurs présentes (nunique ignore les manquantes)"""
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            codes = column.cat.codes.to_numpy()
+            return codes, codes >= 0
+        values = column.to_numpy()
+        present = ~pd.isna(values)
+        if values.dtype.kind not in 'iu':
+            # Hachage du contenu : identique pour une valeur quel que soit le sous-ensemble
+            values = pd.util.hash_array(values.astype(object))
+        return values, present
+
+    def memory_usage(self):
+        return sum(registers.nbytes for registers in self.registers.values())
+
+    def _merge_by_month(self, registers, cells, months):
+        """
+        Registres fusionnés par mois (une ligne par mois de months)
+
+        cells : cellules retenues, triées ; celles d'un mois sont contiguës
+        """
+        bounds = np.searchsorted(cells, self.month_start)
+        merged = np.zeros((len(months), registers.shape[1]), dtype=np.uint8)
+        for row, month in enumerate(months):
+            selected = cells[bounds[month]:bounds[month + 1]]
+            if len(selected):
+                merged[row] = registers[selected].max(axis=0)
+        return merged
+
+    def _codes(self, uniques, selected):
+        """Codes des valeurs choisies (None = pas de filtre)"""
+        if selected is None:
+            return None
+        return np.flatnonzero(pd.Index(uniques).isin(list(selected)))
+
+    def count(self, filtered, state):
+        """
+        Décomptes distincts de filtered (lignes de full_dataset retenues par state)
+
+        Returns:
+            dict : 'orders', 'customers' (totaux), 'orders_by_month' (Series indexée
+            par mois), 'approximate' (False si tout a été compté exactement)
+        """
+        full_months, partial_months = self.month_index.coverage(state)
+        if len(filtered) < self.exact_below or len(full_months) == 0:
+            self.counts['exact'] += 1
+            return exact_distinct(filtered)
+
+        # Cellules des mois couverts retenues par les filtres pays et catégorie
+        cells = None
+        if state.countries is not None or state.categories is not None:
+            cell_mask = np.ones(len(self.cell_month), dtype=bool)
+            for codes, selected in ((self.cell_country, self._codes(self.countries, state.countries)),
+                                    (self.cell_category, self._codes(self.categories, state.categories))):
+                if selected is not None:
+                    cell_mask &= np.isin(codes, selected)
+            cells = np.flatnonzero(cell_mask)
+        undated = state.start is None and state.end is None
+
+        # Lignes des mois coupés : comptées sur les lignes filtrées
+        dates = filtered['orderDate'].to_numpy()
+        edge = np.zeros(len(filtered), dtype=bool)
+        for month in partial_months:
+            edge |= (dates >= self.month_index.first[month]) & (dates <= self.month_index.last[month])
+        edge_rows = filtered[edge]
+
+        result = {'approximate': True}
+        by_month = {}
+        for column, name in DISTINCT_COLUMNS.items():
+            registers = self.registers[name]
+            if cells is None:
+                by_month[name] = self.month_registers[name][full_months]
+                merged = by_month[name].max(axis=0)
+                if undated:
+                    merged = np.maximum(merged, self.undated_registers[name])
+            else:
+                by_month[name] = self._merge_by_month(registers, cells, full_months)
+                merged = by_month[name].max(axis=0)
+                if undated:
+                    selected = cells[:np.searchsorted(cells, self.month_start[0])]
+                    merged = np.maximum(merged, registers[selected].max(axis=0, initial=0))
+            values, present = self._values(edge_rows[column])
+            if present.any():
+                index, rank = register_updates(values[present], self.precision)
+                np.maximum.at(merged, index, rank)
+            result[name] = estimate(merged, self.precision)
+
+        # Commandes par mois : mois couverts estimés, mois coupés exacts
+        monthly = {}
+        for month, registers in zip(full_months, by_month['orders']):
+            count = estimate(registers, self.precision)
+            if count:
+                monthly[self.months[month]] = count
+        if len(edge_rows):
+            edge_months = edge_rows['orderDate'].dt.to_period('M')
+            monthly.update(edge_rows.groupby(edge_months)['orderID'].nunique().to_dict())
+        orders_by_month = pd.Series(monthly, dtype='int64').sort_index()
+        orders_by_month.index.name = 'orderDate'
+        result['orders_by_month'] = orders_by_month
+
+        self.counts['approx'] += 1
+        return result
+
+
+def exact_distinct(filtered):
+    """Décomptes distincts exacts (nunique), au format de DistinctSketches.count"""
+    month = filtered['orderDate'].dt.to_period('M')
+    return {
+        'orders': filtered['orderID'].nunique(),
+        'customers': filtered['customerID'].nunique(),
+        'orders_by_month': filtered.groupby(month)['orderID'].nunique(),
+        'approximate': False
+    }
+
+
+def create_distinct_sketches(data_model):
+    """
+    Crée les sketches si DASHBOARD_DISTINCT=approx (défaut 'exact' : nunique)
+
+    Réglages : DASHBOARD_DISTINCT_ERROR (erreur type visée, défaut 2 %),
+    DASHBOARD_DISTINCT_EXACT_BELOW (lignes filtrées sous lesquelles le décompte reste exact).
+
+    Returns:
+        DistinctSketches ou None
+    """
+    if os.environ.get('DASHBOARD_DISTINCT', 'exact') != 'approx':
+        return None
+    error = float(os.environ.get('DASHBOARD_DISTINCT_ERROR', DEFAULT_ERROR))
+    options = {
+        'precision': precision_for_error(error),
+        'exact_below': int(os.environ.get('DASHBOARD_DISTINCT_EXACT_BELOW', DEFAULT_EXACT_BELOW)),
+        'month_index': data_model.month_index
+    }
+    if data_model.partitions is not None:
+        # Mode partitionné : une partition à la fois, full_dataset jamais chargé
+        return DistinctSketches.from_partitions(data_model.partitions, **options)
+    return DistinctSketches(data_model.full_dataset, **options)
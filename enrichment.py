@@ -4,9 +4,7 @@ Calculs de métriques RFM, segmentation, tendances
 """
 
 import pandas as pd
-import numpy as np
 from pathlib import Path
-from datetime import datetime, timedelta
 from data_model import DataModel
 
 class AdvancedAnalytics:
@@ -27,14 +25,8 @@ class AdvancedAnalytics:
         """
         print("📊 Calcul des scores RFM...")
         
-        # Regrouper par client
-        rfm = self.df.groupby('customerID').agg({
-            'orderDate': lambda x: (self.max_date - x.max()).days,  # Récence
-            'orderID': 'nunique',  # Fréquence
-            'lineTotal': 'sum'  # Montant
-        }).reset_index()
-        
-        rfm.columns = ['customerID', 'recency', 'frequency', 'monetary']
+        # Récence, fréquence et montant issus du feature store
+        rfm = self.model.get_customer_features()[['customerID', 'recency', 'frequency', 'monetary']].copy()
         
         # Ajouter les informations client
         rfm = rfm.merge(
@@ -80,7 +72,7 @@ class AdvancedAnalytics:
         """
         print("📦 Analyse de performance produits...")
         
-        perf = self.df.groupby(['productID', 'productName', 'categoryName']).agg({
+        perf = self.df.groupby(['productID', 'productName', 'categoryName'], observed=True).agg({
             'lineTotal': ['sum', 'mean', 'count'],
             'quantity': 'sum',
             'discount': 'mean',
@@ -168,7 +160,7 @@ class AdvancedAnalytics:
         # Identifier la première commande de chaque client
         df['order_month'] = df['orderDate'].dt.to_period('M')
         
-        first_orders = df.groupby('customerID')['orderDate'].min().reset_index()
+        first_orders = df.groupby('customerID', observed=True)['orderDate'].min().reset_index()
         first_orders['cohort'] = first_orders['orderDate'].dt.to_period('M')
         
         df = df.merge(first_orders[['customerID', 'cohort']], on='customerID', how='left')
@@ -237,7 +229,11 @@ class AdvancedAnalytics:
         rfm = self.calculate_rfm()
         rfm.to_csv(output_path / 'rfm_analysis.csv', index=False)
         print(f"   ✅ rfm_analysis.csv")
-        
+
+        # Features clients (feature store, entrée du clustering)
+        self.model.get_customer_features()
+        print(f"   ✅ customer_features.csv")
+
         # Performance produits
         product_perf = self.analyze_product_performance()
         product_perf.to_csv(output_path / 'product_performance.csv', index=False)
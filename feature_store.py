@@ -0,0 +1,269 @@
+"""
+Feature store clients - une seule source de features pour l'enrichissement,
+l'entraînement du clustering et la prédiction dans le dashboard
+"""
+
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+CLEANED_DIR = Path("data/cleaned")
+FEATURES_PATH = Path("data/enriched/customer_features.csv")
+META_PATH = Path("data/enriched/customer_features.meta.json")
+
+# À incrémenter à chaque changement de définition d'une feature
+FEATURE_VERSION = 2
+
+SOURCE_FILES = ["orders_clean.csv", "order_details_clean.csv"]
+
+FEATURE_COLUMNS = [
+    'customerID', 'recency', 'frequency', 'monetary', 'monetary_log',
+    'product_diversity', 'total_quantity', 'avg_discount', 'avg_basket_size',
+    'avg_days_between_orders', 'median_days_between_orders', 'var_days_between_orders',
+    'recent_orders', 'recent_ratio'
+]
+
+RECENT_WINDOW_DAYS = 90
+
+NS_PER_DAY = 86_400 * 10**9
+
+
+def compute_order_gaps(orders):
+    """
+    Statistiques des jours entre commandes successives de chaque client
+
+    Travaille au niveau commande : si `orders` contient des lignes de détail
+    (plusieurs lignes par orderID), elles sont dédoublonnées sur orderID pour que
+    les dates répétées d'une même commande ne créent pas de faux écarts de 0 jour.
+    Un seul tri par (customerID, orderDate), un seul diff vectorisé et un masque
+    de frontière entre clients remplacent les fonctions Python par groupe.
+
+    Args:
+        orders: DataFrame avec customerID et orderDate (et orderID si niveau ligne)
+
+    Returns:
+        DataFrame indexé par customerID : avg/median/var_days_between_orders et n_gaps
+        (NaN pour les clients avec une seule commande)
+    """
+    if 'orderID' in orders.columns:
+        orders = orders.drop_duplicates('orderID')
+    orders = orders.dropna(subset=['customerID', 'orderDate'])
+
+    codes, customers = pd.factorize(orders['customerID'])
+    dates = orders['orderDate'].to_numpy(dtype='datetime64[ns]').view('int64')
+    n_customers = len(customers)
+
+    # Tri unique par (client, date), puis écarts entre commandes consécutives d'un même client
+    order = np.lexsort((dates, codes))
+    codes, dates = codes[order], dates[order]
+    same_customer = codes[1:] == codes[:-1]
+    gaps = (np.diff(dates) // NS_PER_DAY)[same_customer].astype(float)
+    gap_codes = codes[1:][same_customer]
+
+    counts = np.bincount(gap_codes, minlength=n_customers)
+    sums = np.bincount(gap_codes, weights=gaps, minlength=n_customers)
+    squares = np.bincount(gap_codes, weights=gaps ** 2, minlength=n_customers)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = sums / counts
+        var = (squares - counts * mean ** 2) / (counts - 1)
+    var[counts < 2] = np.nan
+
+    # Médiane : écarts triés par client, lecture au milieu de chaque bloc
+    sorted_gaps = gaps[np.lexsort((gaps, gap_codes))]
+    starts = np.cumsum(counts) - counts
+    has_gaps = counts > 0
+    lower = (starts + (counts - 1) // 2)[has_gaps]
+    upper = (starts + counts // 2)[has_gaps]
+    median = np.full(n_customers, np.nan)
+    median[has_gaps] = (sorted_gaps[lower] + sorted_gaps[upper]) / 2
+
+    return pd.DataFrame({
+        'avg_days_between_orders': mean,
+        'median_days_between_orders': median,
+        'var_days_between_orders': np.maximum(var, 0),
+        'n_gaps': counts
+    }, index=pd.Index(customers, name='customerID'))
+
+
+def build_customer_features(orders, order_details, as_of=None):
+    """
+    Calcule toutes les features clients en une passe vectorisée
+
+    Les lignes de commande sont d'abord agrégées au niveau commande,
+    puis les commandes au niveau client : aucune fonction Python par groupe.
+
+    Args:
+        orders: DataFrame orders (orderID, customerID, orderDate)
+        order_details: DataFrame order_details (orderID, productID, quantity, discount, lineTotal)
+        as_of: date de référence pour la récence (défaut : dernière commande)
+
+    Returns:
+        DataFrame avec une ligne par client et les colonnes FEATURE_COLUMNS
+    """
+    orders = orders[['orderID', 'customerID', 'orderDate']].dropna(subset=['orderDate'])
+    as_of = orders['orderDate'].max() if as_of is None else pd.Timestamp(as_of)
+
+    # Lignes -> commandes
+    lines = order_details[['orderID', 'productID', 'quantity', 'discount', 'lineTotal']]
+    per_order = lines.groupby('orderID').agg(
+        order_total=('lineTotal', 'sum'),
+        order_quantity=('quantity', 'sum'),
+        discount_sum=('discount', 'sum'),
+        line_count=('discount', 'size')
+    )
+    orders = orders.join(per_order, on='orderID', how='inner')
+
+    # Commandes -> clients
+    is_recent = orders['orderDate'] >= as_of - pd.Timedelta(days=RECENT_WINDOW_DAYS)
+    features = orders.assign(recent=is_recent).groupby('customerID').agg(
+        last_order=('orderDate', 'max'),
+        frequency=('orderID', 'nunique'),
+        monetary=('order_total', 'sum'),
+        total_quantity=('order_quantity', 'sum'),
+        discount_sum=('discount_sum', 'sum'),
+        line_count=('line_count', 'sum'),
+        recent_orders=('recent', 'sum')
+    )
+
+    features['recency'] = (as_of - features['last_order']).dt.days
+    features['monetary_log'] = np.log1p(features['monetary'])
+    features['avg_discount'] = features['discount_sum'] / features['line_count']
+    features['avg_basket_size'] = features['total_quantity'] / features['frequency']
+    features['recent_ratio'] = features['recent_orders'] / features['frequency']
+
+    # Diversité produits : couples (client, produit) distincts
+    line_customers = lines['orderID'].map(orders.set_index('orderID')['customerID'])
+    pairs = pd.DataFrame({'customerID': line_customers, 'productID': lines['productID']}).dropna()
+    features['product_diversity'] = pairs.drop_duplicates().groupby('customerID').size()
+
+    # Temps entre commandes (moyenne, médiane, variance)
+    gaps = compute_order_gaps(orders).drop(columns='n_gaps')
+    features = features.join(gaps)
+
+    features = features.reset_index()
+    features[FEATURE_COLUMNS[1:]] = features[FEATURE_COLUMNS[1:]].fillna(0)
+    return features[FEATURE_COLUMNS]
+
+
+def model_matrix(df, feature_columns):
+    """
+    Sélectionne les features d'un modèle dans le bon ordre
+
+    Complète 'monetary_log' à partir de 'monetary' si nécessaire (saisie manuelle,
+    anciens fichiers), pour que l'entraînement et la prédiction partagent la même transformation.
+    """
+    df = df.copy()
+    if 'monetary_log' in feature_columns and 'monetary_log' not in df.columns:
+        df['monetary_log'] = np.log1p(df['monetary'])
+    return df[feature_columns].fillna(0)
+
+
+def source_fingerprint(cleaned_dir=CLEANED_DIR, files=SOURCE_FILES):
+    """Empreinte du contenu des fichiers sources (détecte les features ou partitions périmées)"""
+    digest = hashlib.sha256()
+    for name in files:
+        with open(Path(cleaned_dir) / name, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def _replace_atomically(path, write):
+    """
+    write(chemin temporaire) puis renommage : un lecteur (autre worker) ne voit jamais
+    un fichier partiel, comme cache_backend.FileTier.set
+    """
+    path = Path(path)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def save_customer_features(features, fingerprint, features_path=FEATURES_PATH, meta_path=META_PATH):
+    """
+    Persiste la table de features et ses métadonnées de version
+
+    Chaque fichier est remplacé atomiquement, la table avant les métadonnées : des
+    workers qui reconstruisent en même temps écrivent des contenus identiques, et un
+    lecteur qui voit la nouvelle table avec les anciennes métadonnées la juge périmée.
+    """
+    features_path = Path(features_path)
+    features_path.parent.mkdir(parents=True, exist_ok=True)
+    _replace_atomically(features_path, lambda tmp: features.to_csv(tmp, index=False))
+
+    meta = {
+        'version': FEATURE_VERSION,
+        'source_fingerprint': fingerprint,
+        'built_at': datetime.now().isoformat(timespec='seconds'),
+        'n_customers': int(len(features)),
+        'columns': list(features.columns)
+    }
+    _replace_atomically(meta_path, lambda tmp: tmp.write_text(json.dumps(meta, indent=2)))
+    return meta
+
+
+def read_meta(meta_path=META_PATH):
+    """Lit les métadonnées du feature store (None si absentes)"""
+    meta_path = Path(meta_path)
+    if not meta_path.exists():
+        return None
+    return json.loads(meta_path.read_text())
+
+
+def load_customer_features(data_model=None, cleaned_dir=CLEANED_DIR,
+                           features_path=FEATURES_PATH, meta_path=META_PATH):
+    """
+    Charge la table de features, en la reconstruisant si elle est absente ou périmée
+
+    Args:
+        data_model: DataModel déjà chargé (évite de relire les CSV si une reconstruction est nécessaire)
+    """
+    fingerprint = source_fingerprint(cleaned_dir)
+    meta = read_meta(meta_path)
+
+    if (meta is not None and Path(features_path).exists()
+            and meta.get('version') == FEATURE_VERSION
+            and meta.get('source_fingerprint') == fingerprint):
+        return pd.read_csv(features_path)
+
+    print("🧮 Reconstruction du feature store clients...")
+    if data_model is not None:
+        orders, order_details = data_model.orders, data_model.order_details
+    else:
+        orders = pd.read_csv(Path(cleaned_dir) / "orders_clean.csv", parse_dates=['orderDate'])
+        order_details = pd.read_csv(Path(cleaned_dir) / "order_details_clean.csv")
+
+    features = build_customer_features(orders, order_details)
+    save_customer_features(features, fingerprint, features_path, meta_path)
+    print(f"   ✅ {len(features)} clients (version {FEATURE_VERSION})")
+    return features
+
+
+def main():
+    """Reconstruit et persiste le feature store"""
+    print("\n" + "="*60)
+    print("🚀 FEATURE STORE CLIENTS")
+    print("="*60 + "\n")
+
+    orders = pd.read_csv(CLEANED_DIR / "orders_clean.csv", parse_dates=['orderDate'])
+    order_details = pd.read_csv(CLEANED_DIR / "order_details_clean.csv")
+    features = build_customer_features(orders, order_details)
+    meta = save_customer_features(features, source_fingerprint())
+
+    print(f"   ✅ {meta['n_customers']} clients, {len(meta['columns']) - 1} features")
+    print(f"   💾 {FEATURES_PATH} (version {meta['version']}, source {meta['source_fingerprint']})")
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+Générateur de données Northwind synthétiques pour les tests de volume
+Écrit des CSV bruts aux mêmes schémas que data/*.csv, à un facteur d'échelle
+donné (x10 ... x10 000), de façon reproductible (graine) et par blocs de
+commandes : la mémoire utilisée ne dépend pas du volume total généré
+
+Usage :
+    python generate_data.py --scale 100 --seed 42 --output data/synthetic/x100
+    python data_cleaning.py --data-dir data/synthetic/x100   # -> data/synthetic/x100/cleaned
+"""
+
+import argparse
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+DATA_DIR = Path("data")
+
+# Tables de référence copiées telles quelles (non mises à l'échelle)
+STATIC_TABLES = ['categories.csv', 'employees.csv', 'employee_territories.csv',
+                 'regions.csv', 'shippers.csv', 'suppliers.csv', 'territories.csv']
+
+BASE_ORDERS = 830
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S.000'
+FIRST_ORDER_ID = 10248
+
+# Remises du jeu d'origine : ~61% sans remise, le reste par paliers de 5%
+DISCOUNT_LEVELS = np.array([0.05, 0.10, 0.15, 0.20, 0.25])
+NO_DISCOUNT_RATE = 0.61
+
+
+def zipf_weights(n, exponent, rng):
+    """Poids de popularité en loi de puissance, dans un ordre aléatoire"""
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    rng.shuffle(weights)
+    return weights / weights.sum()
+
+
+def seasonal_day_weights(days):
+    """
+    Poids par jour : pic de fin d'année, creux estival, légère croissance et
+    activité réduite le week-end
+    """
+    month = days.month.to_numpy()
+    season = 1 + 0.30 * np.cos(2 * np.pi * (month - 12) / 12)
+    trend = np.linspace(1.0, 1.6, len(days))
+    weekday = np.where(days.dayofweek.to_numpy() >= 5, 0.35, 1.0)
+    weights = season * trend * weekday
+    return weights / weights.sum()
+
+
+def build_customers(base, n_customers, country_weights, rng):
+    """Clients d'origine + clients synthétiques répartis selon le poids des pays"""
+    if n_customers <= len(base):
+        return base.copy()
+
+    extra = n_customers - len(base)
+    countries = rng.choice(country_weights.index.to_numpy(), size=extra, p=country_weights.to_numpy())
+
+    # Adresse, ville, région reprises d'un client existant du même pays
+    template_idx = np.empty(extra, dtype=np.int64)
+    for country, group in base.groupby('country'):
+        mask = countries == country
+        template_idx[mask] = group.index.to_numpy()[rng.integers(0, len(group), size=mask.sum())]
+    synthetic = base.loc[template_idx].reset_index(drop=True)
+
+    numbers = np.arange(1, extra + 1)
+    synthetic['customerID'] = [f"C{n:07d}" for n in numbers]
+    synthetic['companyName'] = [f"{name} {n}" for name, n in zip(synthetic['companyName'], numbers)]
+    synthetic['country'] = countries
+    return pd.concat([base, synthetic], ignore_index=True)
+
+
+def build_products(base, n_products, rng):
+    """Produits d'origine + variantes (même catégorie, prix proche)"""
+    if n_products <= len(base):
+        return base.copy()
+
+    extra = n_products - len(base)
+    template_idx = rng.integers(0, len(base), size=extra)
+    synthetic = base.iloc[template_idx].reset_index(drop=True)
+
+    synthetic['productID'] = np.arange(base['productID'].max() + 1, base['productID'].max() + 1 + extra)
+    synthetic['productName'] = [f"{name} v{n}" for name, n in zip(synthetic['productName'], range(1, extra + 1))]
+    prices = synthetic['unitPrice'].astype(float) * rng.lognormal(0, 0.25, size=extra)
+    synthetic['unitPrice'] = np.round(np.maximum(prices, 1.0), 2)
+    synthetic['unitsInStock'] = rng.integers(0, 125, size=extra)
+    synthetic['unitsOnOrder'] = rng.choice([0, 0, 0, 10, 20, 40, 70], size=extra)
+    synthetic['discontinued'] = (rng.random(extra) < 0.1).astype(int)
+    return pd.concat([base, synthetic], ignore_index=True)
+
+
+def generate_order_chunk(first_id, n_orders, customers, customer_p, days, day_p, products, product_p, rng):
+    """Un bloc de commandes et leurs lignes (DataFrames prêts à écrire)"""
+    order_ids = np.arange(first_id, first_id + n_orders)
+    cust_idx = rng.choice(len(customers), size=n_orders, p=customer_p)
+    order_dates = days[rng.choice(len(days), size=n_orders, p=day_p)]
+
+    shipped = order_dates + pd.to_timedelta(rng.integers(1, 36, size=n_orders), unit='D')
+    unshipped = rng.random(n_orders) < 0.025
+    customer_rows = customers.iloc[cust_idx]
+
+    orders = pd.DataFrame({
+        'orderID': order_ids,
+        'customerID': customer_rows['customerID'].to_numpy(),
+        'employeeID': rng.integers(1, 10, size=n_orders),
+        'orderDate': order_dates.strftime(DATE_FORMAT),
+        'requiredDate': (order_dates + pd.Timedelta(days=28)).strftime(DATE_FORMAT),
+        'shippedDate': np.where(unshipped, 'NULL', shipped.strftime(DATE_FORMAT)),
+        'shipVia': rng.integers(1, 4, size=n_orders),
+        'freight': np.round(rng.lognormal(3.6, 1.1, size=n_orders), 2),
+        'shipName': customer_rows['companyName'].to_numpy(),
+        'shipAddress': customer_rows['address'].to_numpy(),
+        'shipCity': customer_rows['city'].to_numpy(),
+        'shipRegion': customer_rows['region'].to_numpy(),
+        'shipPostalCode': customer_rows['postalCode'].to_numpy(),
+        'shipCountry': customer_rows['country'].to_numpy()
+    })
+
+    # Lignes : 1 + Poisson(1.6) produits par commande (moyenne ~2.6 comme l'original)
+    n_lines = 1 + rng.poisson(1.6, size=n_orders)
+    line_orders = np.repeat(order_ids, n_lines)
+    product_idx = rng.choice(len(products), size=len(line_orders), p=product_p)
+
+    details = pd.DataFrame({'orderID': line_orders, 'product_idx': product_idx})
+    details = details.drop_duplicates(['orderID', 'product_idx'], ignore_index=True)
+    n = len(details)
+
+    product_rows = products.iloc[details['product_idx'].to_numpy()]
+    prices = product_rows['unitPrice'].astype(float).to_numpy()
+    # Une partie des lignes garde l'ancien tarif (-20%), comme dans Northwind
+    prices = np.where(rng.random(n) < 0.3, np.round(prices * 0.8, 2), prices)
+    quantity = np.clip(np.round(rng.gamma(1.6, 15, size=n)), 1, 150).astype(int)
+
+    # Les grosses quantités obtiennent plus souvent une remise
+    discount_prob = (1 - NO_DISCOUNT_RATE) * np.clip(quantity / 24, 0.5, 1.6)
+    discounted = rng.random(n) < np.clip(discount_prob, 0, 0.9)
+    discount = np.where(discounted, rng.choice(DISCOUNT_LEVELS, size=n), 0.0)
+
+    order_details = pd.DataFrame({
+        'orderID': details['orderID'].to_numpy(),
+        'productID': product_rows['productID'].to_numpy(),
+        'unitPrice': np.round(prices, 2),
+        'quantity': quantity,
+        'discount': discount
+    })
+    return orders, order_details
+
+
+def generate(scale, output_dir, seed=42, chunk_orders=200_000, start='1996-07-04', end='1998-05-06',
+             source_dir=DATA_DIR):
+    """
+    Génère un jeu de données complet dans output_dir
+
+    Volumes : commandes x scale, clients x scale, produits x sqrt(scale)
+    (le catalogue grossit moins vite que la clientèle).
+
+    Returns:
+        dict des volumes écrits
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    source_dir = Path(source_dir)
+
+    # Un générateur indépendant par usage, dérivé de la graine : reproductible
+    reference_seed, chunk_seed = np.random.SeedSequence(seed).spawn(2)
+    reference_rng = np.random.default_rng(reference_seed)
+
+    base_customers = pd.read_csv(source_dir / "customers.csv", keep_default_na=False, dtype=str)
+    base_products = pd.read_csv(source_dir / "products.csv", keep_default_na=False)
+    base_orders = pd.read_csv(source_dir / "orders.csv", keep_default_na=False)
+
+    # Poids des pays observés dans les commandes d'origine
+    country_weights = base_orders['shipCountry'].value_counts(normalize=True)
+    country_weights = country_weights[country_weights.index.isin(base_customers['country'])]
+    country_weights = country_weights / country_weights.sum()
+
+    n_orders = int(round(BASE_ORDERS * scale))
+    customers = build_customers(base_customers, int(round(len(base_customers) * scale)), country_weights, reference_rng)
+    products = build_products(base_products, int(round(len(base_products) * np.sqrt(scale))), reference_rng)
+
+    customers.to_csv(output_dir / "customers.csv", index=False)
+    products.to_csv(output_dir / "products.csv", index=False)
+    for name in STATIC_TABLES:
+        if (source_dir / name).exists():
+            shutil.copyfile(source_dir / name, output_dir / name)
+
+    # Popularité : quelques gros clients et best-sellers, une longue traîne
+    customer_p = zipf_weights(len(customers), 0.7, reference_rng)
+    product_p = zipf_weights(len(products), 0.6, reference_rng)
+    days = pd.date_range(start, end, freq='D')
+    day_p = seasonal_day_weights(days)
+
+    orders_path = output_dir / "orders.csv"
+    details_path = output_dir / "order_details.csv"
+    n_chunks = max(1, -(-n_orders // chunk_orders))
+    n_lines = 0
+
+    for chunk, child in enumerate(chunk_seed.spawn(n_chunks)):
+        rng = np.random.default_rng(child)
+        first = chunk * chunk_orders
+        size = min(chunk_orders, n_orders - first)
+        orders, details = generate_order_chunk(
+            FIRST_ORDER_ID + first, size, customers, customer_p, days, day_p, products, product_p, rng
+        )
+        mode, header = ('w', True) if chunk == 0 else ('a', False)
+        orders.to_csv(orders_path, index=False, mode=mode, header=header)
+        details.to_csv(details_path, index=False, mode=mode, header=header)
+        n_lines += len(details)
+        print(f"   ✅ Bloc {chunk + 1}/{n_chunks} : {first + size:,} commandes, {n_lines:,} lignes")
+
+    return {
+        'customers': len(customers),
+        'products': len(products),
+        'orders': n_orders,
+        'order_details': n_lines
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Génère un jeu Northwind synthétique à l'échelle")
+    parser.add_argument('--scale', type=float, default=10, help="facteur d'échelle (x commandes)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="répertoire de sortie (défaut : data/synthetic/x<scale>)")
+    parser.add_argument('--chunk-orders', type=int, default=200_000, help="commandes générées par bloc")
+    parser.add_argument('--start', default='1996-07-04', help="première date de commande")
+    parser.add_argument('--end', default='1998-05-06', help="dernière date de commande")
+    args = parser.parse_args()
+
+    output = args.output or f"data/synthetic/x{args.scale:g}"
+
+    print("\n" + "="*60)
+    print(f"🏭 GÉNÉRATION DE DONNÉES SYNTHÉTIQUES (x{args.scale:g}, graine {args.seed})")
+    print("="*60 + "\n")
+
+    counts = generate(args.scale, output, seed=args.seed, chunk_orders=args.chunk_orders,
+                      start=args.start, end=args.end)
+
+    print("\n" + "="*60)
+    print(f"✅ Données écrites dans {output}/")
+    for table, count in counts.items():
+        print(f"   • {table}: {count:,}")
+    print("="*60 + "\n")
+
+
+if __name__ == "__main__":
+    main()
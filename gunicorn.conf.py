@@ -0,0 +1,72 @@
+"""
+Configuration gunicorn du dashboard (workers threadés + pool de calcul partagé)
+
+Usage : gunicorn -c gunicorn.conf.py app:server
+
+Chaque worker sert plusieurs requêtes en parallèle (threads) avec un seul DataModel
+en mémoire ; les calculs pandas passent par compute_pool.ComputePool, qui isole les
+KPIs rapides des analyses de clusters lentes.
+
+Avec GUNICORN_PRELOAD=1, le master charge l'application (DataModel, modèle, feature
+store, index des clusters) une seule fois avant de forker : les workers démarrent
+en quelques millisecondes et partagent ces pages mémoire (copy-on-write).
+"""
+
+import gc
+import os
+import time
+
+from lazy_imports import import_dash_without_jupyter
+
+# Active le pool de calcul dans app.py (lu à l'import de l'application)
+os.environ.setdefault('COMPUTE_POOL', '1')
+
+# dash importé sans IPython/ipykernel (installés pour le notebook, inutiles dans un worker) ;
+# DASHBOARD_JUPYTER=1 conserve l'intégration. Limité aux processus gunicorn.
+import_dash_without_jupyter()
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8050')
+workers = int(os.environ.get('GUNICORN_WORKERS', 2))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+# Une requête ne bloque plus le worker entier : un délai court suffit
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = 30
+keepalive = 5
+
+# Chargement de l'application dans le master puis fork (aucun thread n'est créé avant le fork :
+# pool de calcul, profileur et relevés mémoire sont démarrés paresseusement dans le worker)
+preload_app = os.environ.get('GUNICORN_PRELOAD', '0') == '1'
+
+if preload_app:
+    # Le ramasse-miettes écrit dans l'en-tête de chaque objet qu'il parcourt : une collecte
+    # dans un worker copierait les pages héritées. Désactivé pendant le chargement, les
+    # objets du master sont gelés (gc.freeze, jamais parcourus) avant chaque fork.
+    gc.disable()
+
+# Recyclage des workers (0 : jamais) ; le gigue évite que tous redémarrent ensemble
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = max_requests // 10
+
+accesslog = '-'
+
+_fork_started = None
+
+
+def pre_fork(server, worker):
+    global _fork_started
+    if preload_app:
+        gc.freeze()
+    _fork_started = time.perf_counter()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        gc.enable()
+
+
+def post_worker_init(worker):
+    # Sans preload, ce délai comprend le chargement complet de l'application par le worker
+    worker.log.info("Worker %s prêt %.0f ms après le fork (preload=%s)",
+                    worker.pid, (time.perf_counter() - _fork_started) * 1000, preload_app)
@@ -0,0 +1,478 @@
+"""
+Instrumentation des callbacks (latence par phase, lignes parcourues) et endpoint /metrics
+- Chaque callback serveur ouvre une trace : temps total et temps par phase
+  (attente, cache, filtre, agrégation, figures, sérialisation), lignes parcourues
+- Les caches, le pool de calcul et la mémoire du DataModel sont relevés à la lecture
+- /metrics expose le tout au format texte Prometheus, pour tous les workers de la machine
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from dash.exceptions import PreventUpdate
+from flask import Response
+
+from startup_timeline import process_memory, resident_memory_bytes
+
+# Bornes des histogrammes (secondes) : de la milliseconde aux callbacks très lents
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# La mémoire du DataModel (memory_usage deep) est coûteuse sur les gros volumes
+MEMORY_REFRESH_SECONDS = 60
+PROCESS_MEMORY_REFRESH_SECONDS = 5
+
+# Publication de l'état d'un worker pour les autres : au plus une fois par seconde
+SNAPSHOT_INTERVAL_SECONDS = 1.0
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_local = threading.local()
+
+
+class Histogram:
+    """Histogramme cumulatif au sens Prometheus (buckets, somme, nombre)"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, labels):
+        rows = [({**labels, 'le': f"{bound:g}"}, count) for bound, count in zip(self.buckets, self.counts)]
+        rows.append(({**labels, 'le': '+Inf'}, self.count))
+        return rows, self.sum, self.count
+
+
+class CallbackTrace:
+    """
+    Mesures d'un appel de callback
+
+    lap(phase) attribue à la phase le temps écoulé depuis le lap précédent (ou le
+    début de la trace) : il suffit de le placer après chaque étape, y compris dans
+    le thread du pool de calcul.
+    """
+
+    def __init__(self, callback):
+        self.callback = callback
+        self.started = time.perf_counter()
+        self._last = self.started
+        self.elapsed = None
+        self.phases = {}
+        self.rows_scanned = 0
+        self.status = 'ok'
+
+    def lap(self, phase):
+        now = time.perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0.0) + now - self._last
+        self._last = now
+
+    def add_rows(self, count):
+        self.rows_scanned += int(count)
+
+
+class NullTrace:
+    """Trace sans effet quand l'instrumentation est désactivée"""
+
+    def lap(self, phase):
+        pass
+
+    def add_rows(self, count):
+        pass
+
+
+NULL_TRACE = NullTrace()
+
+
+class CallbackMetrics:
+    """
+    Registre des mesures du worker courant
+
+    Args:
+        snapshot_dir: répertoire partagé entre workers (None : worker courant seulement).
+            Chaque worker y écrit son état depuis un thread à part, au plus une fois par
+            snapshot_interval et seulement après un callback (jamais dans le temps de
+            réponse) ; /metrics, servi par n'importe quel worker, agrège tous les fichiers
+            (label worker=<pid>).
+    """
+
+    def __init__(self, snapshot_dir=None, buckets=DEFAULT_BUCKETS, snapshot_interval=SNAPSHOT_INTERVAL_SECONDS):
+        self.buckets = buckets
+        self.snapshot_interval = snapshot_interval
+        self.snapshot_dir = Path(snapshot_dir) if snapshot_dir else None
+        if self.snapshot_dir is not None:
+            self.snapshot_dir.mkdir(parents=True, exist_ok=True)
+        self._durations = {}
+        self._phases = {}
+        self._calls = {}
+        self._rows = {}
+        self._response_bytes = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+        self._snapshot_due = threading.Event()
+        self._writer_lock = threading.Lock()
+        self._writer_pid = None
+
+    def record(self, trace, response_bytes=0):
+        with self._lock:
+            callback = trace.callback
+            self._durations.setdefault(callback, Histogram(self.buckets)).observe(trace.elapsed)
+            for phase, seconds in trace.phases.items():
+                self._phases.setdefault((callback, phase), Histogram(self.buckets)).observe(seconds)
+            key = (callback, trace.status)
+            self._calls[key] = self._calls.get(key, 0) + 1
+            self._rows[callback] = self._rows.get(callback, 0) + trace.rows_scanned
+            self._response_bytes[callback] = self._response_bytes.get(callback, 0) + response_bytes
+        if self.snapshot_dir is not None:
+            self._schedule_snapshot()
+
+    def _schedule_snapshot(self):
+        """Demande une écriture au thread de publication (démarré par worker, après le fork)"""
+        self._snapshot_due.set()
+        if self._writer_pid != os.getpid():
+            with self._writer_lock:
+                if self._writer_pid != os.getpid():
+                    self._writer_pid = os.getpid()
+                    threading.Thread(target=self._snapshot_loop, name='metrics-snapshot', daemon=True).start()
+
+    def _snapshot_loop(self):
+        while True:
+            self._snapshot_due.wait()
+            self._snapshot_due.clear()
+            try:
+                self.write_snapshot()
+            except Exception as e:
+                print(f"⚠️  Publication des métriques en erreur : {e}")
+            # Les callbacks de l'intervalle sont regroupés dans l'écriture suivante
+            time.sleep(self.snapshot_interval)
+
+    def add_collector(self, collector):
+        """
+        Ajoute une source relevée à chaque lecture des métriques
+
+        collector() retourne une liste de (nom, type, aide, [(labels, valeur), ...]).
+        """
+        self._collectors.append(collector)
+
+    def families(self):
+        """État courant : liste de (nom, type, aide, échantillons)"""
+        with self._lock:
+            durations = []
+            for callback, histogram in sorted(self._durations.items()):
+                durations.append(histogram.samples({'callback': callback}))
+            phases = []
+            for (callback, phase), histogram in sorted(self._phases.items()):
+                phases.append(histogram.samples({'callback': callback, 'phase': phase}))
+            calls = [({'callback': c, 'status': s}, n) for (c, s), n in sorted(self._calls.items())]
+            rows = [({'callback': c}, n) for c, n in sorted(self._rows.items())]
+            response_bytes = [({'callback': c}, n) for c, n in sorted(self._response_bytes.items())]
+
+        families = [
+            histogram_family('dashboard_callback_duration_seconds',
+                             "Durée totale d'un appel de callback (requête complète)", durations),
+            histogram_family('dashboard_callback_phase_seconds',
+                             "Durée des phases d'un callback (queue, cache, filter, aggregate, figure, serialize)",
+                             phases),
+            ('dashboard_callback_calls_total', 'counter', "Appels de callback par statut", calls),
+            ('dashboard_callback_rows_scanned_total', 'counter', "Lignes du jeu de données parcourues", rows),
+            ('dashboard_callback_response_bytes_total', 'counter', "Octets des réponses JSON (avant compression)",
+             response_bytes),
+            ('process_resident_memory_bytes', 'gauge', "Mémoire résidente du worker",
+             [({}, resident_memory_bytes())])
+        ]
+        for collector in self._collectors:
+            try:
+                families.extend(collector())
+            except Exception as e:
+                print(f"⚠️  Collecteur de métriques en erreur : {e}")
+        return families
+
+    def _snapshot_path(self, pid):
+        return self.snapshot_dir / f"{pid}.json"
+
+    def write_snapshot(self):
+        """Écrit l'état du worker (fichier temporaire renommé : jamais lu à moitié)"""
+        path = self._snapshot_path(os.getpid())
+        tmp = path.with_suffix(f'.{threading.get_ident()}.tmp')
+        tmp.write_text(json.dumps(self.families()))
+        os.replace(tmp, path)
+
+    def worker_families(self):
+        """{pid: familles} pour tous les workers vivants (le worker courant en direct)"""
+        pid = os.getpid()
+        workers = {pid: self.families()}
+        if self.snapshot_dir is None:
+            return workers
+
+        for path in self.snapshot_dir.glob('*.json'):
+            try:
+                other = int(path.stem)
+            except ValueError:
+                continue
+            if other == pid:
+                continue
+            if not pid_alive(other):
+                path.unlink(missing_ok=True)
+                continue
+            try:
+                workers[other] = json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue
+        return workers
+
+    def render(self):
+        """Texte au format d'exposition Prometheus"""
+        merged = {}
+        for pid, families in sorted(self.worker_families().items()):
+            for name, kind, help_text, samples in families:
+                family = merged.setdefault(name, (kind, help_text, []))
+                for sample in samples:
+                    labels, value = sample[0], sample[1]
+                    suffix = sample[2] if len(sample) > 2 else ''
+                    family[2].append((suffix, {**labels, 'worker': str(pid)}, value))
+
+        lines = []
+        for name, (kind, help_text, samples) in merged.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for suffix, labels, value in samples:
+                lines.append(f"{name}{suffix}{format_labels(labels)} {format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    @contextmanager
+    def trace(self, callback):
+        """
+        Trace d'un appel de callback
+
+        Pendant une requête Dash (cf. install_metrics_endpoint), l'enregistrement est
+        différé à la fin de la requête pour inclure la sérialisation de la réponse.
+        """
+        trace = CallbackTrace(callback)
+        try:
+            yield trace
+        except PreventUpdate:
+            trace.status = 'prevented'
+            raise
+        except Exception:
+            trace.status = 'error'
+            raise
+        finally:
+            trace.elapsed = time.perf_counter() - trace.started
+            pending = getattr(_local, 'pending', None)
+            if pending is not None:
+                pending.append(trace)
+            else:
+                self.record(trace)
+
+
+@contextmanager
+def callback_trace(metrics, callback):
+    """metrics.trace(callback), ou une trace sans effet si metrics vaut None"""
+    if metrics is None:
+        yield NULL_TRACE
+    else:
+        with metrics.trace(callback) as trace:
+            yield trace
+
+
+def histogram_family(name, help_text, histograms):
+    samples = []
+    for buckets, total, count in histograms:
+        labels = {k: v for k, v in buckets[0][0].items() if k != 'le'}
+        samples.extend((bucket_labels, value, '_bucket') for bucket_labels, value in buckets)
+        samples.append((labels, total, '_sum'))
+        samples.append((labels, count, '_count'))
+    return (name, 'histogram', help_text, samples)
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (f'{key}="{escape_label(value)}"' for key, value in labels.items())
+    return '{' + ','.join(escaped) + '}'
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_value(value):
+    if isinstance(value, float):
+        return repr(value) if value == value else 'NaN'
+    return str(value)
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def cache_collector(cache):
+    """Compteurs et taux de hit du TieredCache des résultats"""
+    def collect():
+        requests = [({'tier': tier}, count) for tier, count in cache.stats.items()]
+        return [
+            ('dashboard_cache_requests_total', 'counter',
+             "Lectures du cache de résultats par niveau servi (miss, error)", requests),
+            ('dashboard_cache_hit_ratio', 'gauge', "Part des lectures servies par le cache",
+             [({}, cache.hit_rate())])
+        ]
+    return collect
+
+
+def data_model_collector(data_model):
+    """Affinage des filtres par session et mémoire des tables du DataModel"""
+    memory = {'at': None, 'tables': {}}
+    lock = threading.Lock()
+
+    def refresh():
+        memory['tables'] = data_model.memory_usage()
+
+    def collect():
+        # Relevé dans un thread à part : jamais dans le temps de réponse d'un callback
+        now = time.monotonic()
+        with lock:
+            if memory['at'] is None or now - memory['at'] > MEMORY_REFRESH_SECONDS:
+                memory['at'] = now
+                threading.Thread(target=refresh, name='metrics-memory', daemon=True).start()
+            tables = dict(memory['tables'])
+
+        session_cache = data_model.session_filters
+        lookups = session_cache.hits + session_cache.misses
+        return [
+            ('dashboard_session_filter_requests_total', 'counter',
+             "Filtrages par session : affinés depuis le sous-ensemble précédent (hit) ou complets (miss)",
+             [({'result': 'hit'}, session_cache.hits), ({'result': 'miss'}, session_cache.misses)]),
+            ('dashboard_session_filter_hit_ratio', 'gauge', "Part des filtrages affinés",
+             [({}, session_cache.hits / lookups if lookups else 0.0)]),
+            ('dashboard_data_model_bytes', 'gauge', "Mémoire des tables du DataModel (memory_usage deep)",
+             [({'table': table}, size) for table, size in sorted(tables.items())])
+        ]
+    return collect
+
+
+def process_memory_collector():
+    """
+    Mémoire réelle du worker (RSS, USS, PSS) : sous gunicorn --preload, la RSS compte
+    aussi les pages héritées du master ; l'USS est ce que le worker coûte en propre
+    """
+    memory = {'at': None, 'values': None}
+    lock = threading.Lock()
+
+    def collect():
+        # smaps_rollup parcourt les tables de pages : relu au plus toutes les PROCESS_MEMORY_REFRESH_SECONDS
+        now = time.monotonic()
+        with lock:
+            if memory['at'] is None or now - memory['at'] > PROCESS_MEMORY_REFRESH_SECONDS:
+                memory['at'] = now
+                memory['values'] = process_memory()
+            values = memory['values']
+        if values is None:
+            return []
+        return [
+            ('process_memory_bytes', 'gauge', "Mémoire du worker (rss, uss : pages propres, pss, shared)",
+             [({'kind': kind}, size) for kind, size in values.items()])
+        ]
+    return collect
+
+
+def compute_pool_collector(compute_pool):
+    """Requêtes refusées par file du pool de calcul"""
+    def collect():
+        return [
+            ('dashboard_compute_pool_rejected_total', 'counter', "Calculs refusés (file pleine) par file",
+             [({'lane': name}, lane.rejected) for name, lane in sorted(compute_pool.lanes.items())])
+        ]
+    return collect
+
+
+def distinct_sketch_collector(sketches):
+    """Décomptes distincts estimés (HyperLogLog) ou exacts (petits résultats, mois entier absent)"""
+    def collect():
+        return [
+            ('dashboard_distinct_counts_total', 'counter', "Décomptes distincts du dashboard par mode",
+             [({'mode': mode}, count) for mode, count in sorted(sketches.counts.items())]),
+            ('dashboard_distinct_sketch_bytes', 'gauge', "Mémoire des registres HyperLogLog",
+             [({}, sketches.memory_usage())])
+        ]
+    return collect
+
+
+def install_metrics_endpoint(app, metrics, path='/metrics'):
+    """
+    Ajoute /metrics à app.server et mesure la sérialisation des réponses de callbacks
+
+    La vue de dispatch Dash est enveloppée : le temps de la requête qui n'est pas
+    passé dans la fonction du callback (lecture du JSON, sérialisation de la
+    réponse) est compté dans la phase 'serialize'.
+    """
+    server = app.server
+    endpoint = app.config.routes_pathname_prefix + '_dash-update-component'
+    dispatch = server.view_functions[endpoint]
+
+    def instrumented_dispatch(*args, **kwargs):
+        _local.pending = []
+        started = time.perf_counter()
+        response_bytes = 0
+        try:
+            response = dispatch(*args, **kwargs)
+            response_bytes = getattr(response, 'content_length', None) or 0
+            return response
+        finally:
+            elapsed = time.perf_counter() - started
+            traces, _local.pending = _local.pending, None
+            for trace in traces:
+                trace.phases['serialize'] = trace.phases.get('serialize', 0.0) + max(0.0, elapsed - trace.elapsed)
+                trace.elapsed = elapsed
+                metrics.record(trace, response_bytes)
+
+    server.view_functions[endpoint] = instrumented_dispatch
+
+    @server.route(path)
+    def _metrics():
+        return Response(metrics.render(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+
+def create_metrics():
+    """
+    Crée le registre depuis DASHBOARD_METRICS
+
+    - '1' (défaut) : métriques de tous les workers (fichiers dans DASHBOARD_METRICS_DIR)
+    - 'local' : métriques du worker qui sert /metrics seulement
+    - '0' : pas d'instrumentation
+
+    Returns:
+        CallbackMetrics ou None
+    """
+    mode = os.environ.get('DASHBOARD_METRICS', '1')
+    if mode == '0':
+        return None
+    if mode == 'local':
+        return CallbackMetrics()
+
+    directory = os.environ.get('DASHBOARD_METRICS_DIR')
+    if directory is None:
+        base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+        directory = Path(base) / 'northwind-metrics'
+    try:
+        return CallbackMetrics(snapshot_dir=directory)
+    except OSError as e:
+        print(f"⚠️  Répertoire des métriques indisponible ({e}), métriques du worker seulement")
+        return CallbackMetrics()
@@ -0,0 +1,144 @@
+"""
+Imports différés et audit du temps d'import
+- import_dash_without_jupyter() : appelé par gunicorn.conf.py, évite à dash de charger
+  IPython (ipykernel est dans requirements.txt pour le notebook) dans les workers, où il
+  ne sert jamais ; les scripts et le notebook importent dash normalement
+- python lazy_imports.py : mesure les imports d'un module (python -X importtime) dans les
+  conditions d'un worker et liste les paquets les plus coûteux
+
+Les modules lourds qui ne servent qu'à une fonctionnalité (plotly.express pour l'analyse
+des clusters, joblib pour les anciens artefacts) sont importés dans la fonction qui les
+utilise, comme feature_store dans DataModel.get_customer_features.
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+# Paquets dont la présence au démarrage d'un worker mérite une alerte
+HEAVY_PACKAGES = ('IPython', 'jedi', 'prompt_toolkit', 'sklearn', 'scipy', 'joblib', 'matplotlib',
+                  'seaborn', 'statsmodels', 'plotly.express')
+
+IMPORTTIME_RE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)')
+LOADED_MARKER = '__loaded_modules__'
+
+
+def import_dash_without_jupyter():
+    """
+    Importe dash sans son intégration Jupyter (processus serveur : gunicorn.conf.py)
+
+    dash/_jupyter.py importe IPython, ipykernel et prompt_toolkit dès qu'ils sont
+    installés (~350 ms et ~30 Mo par worker) ; le serveur n'en a pas l'usage.
+    IPython n'est masqué que le temps de cet import : ensuite, un import d'IPython
+    (débogueur, bibliothèque tierce) fonctionne normalement.
+    DASHBOARD_JUPYTER=1 conserve l'intégration.
+
+    Returns:
+        True si dash a été importé sans l'intégration
+    """
+    if os.environ.get('DASHBOARD_JUPYTER', '0') == '1':
+        return False
+    if any(name in sys.modules for name in ('dash', 'IPython', 'ipykernel')):
+        return False  # dash déjà importé, ou dans un notebook / une console IPython
+    # Un None dans sys.modules fait échouer l'import (ImportError, géré par dash)
+    sys.modules['IPython'] = None
+    try:
+        import dash  # noqa: F401
+    finally:
+        if 'IPython' in sys.modules and sys.modules['IPython'] is None:
+            del sys.modules['IPython']
+    return True
+
+
+def parse_importtime(stderr):
+    """Lignes de -X importtime -> [(module, self µs, cumulé µs, profondeur)]"""
+    rows = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            rows.append((module, int(self_us), int(cumulative_us), len(indent) // 2))
+    return rows
+
+
+def audit(module, python=sys.executable, env=None):
+    """
+    Importe module dans un interpréteur neuf, dash étant importé comme par gunicorn.conf.py
+
+    Returns:
+        (mesures de -X importtime, noms des modules effectivement chargés)
+    """
+    code = (f"import sys, lazy_imports; lazy_imports.import_dash_without_jupyter(); import {module}; "
+            f"print('{LOADED_MARKER}', *[name for name, m in sys.modules.items() if m is not None])")
+    result = subprocess.run([python, '-X', 'importtime', '-c', code], capture_output=True, text=True, env=env)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr else 'import échoué')
+    marker_line = next(line for line in reversed(result.stdout.splitlines()) if line.startswith(LOADED_MARKER))
+    return parse_importtime(result.stderr), set(marker_line.split()[1:])
+
+
+def by_package(rows):
+    """Temps propre cumulé par paquet de premier niveau (µs)"""
+    totals = defaultdict(int)
+    for module, self_us, _, _ in rows:
+        totals[module.split('.')[0]] += self_us
+    return dict(sorted(totals.items(), key=lambda item: -item[1]))
+
+
+def direct_imports(rows, module):
+    """Imports directs de module (profondeur 1 sous sa ligne) avec leur temps cumulé"""
+    end = next(i for i, row in enumerate(rows) if row[0] == module and row[3] == 0)
+    start = max((i for i, row in enumerate(rows[:end]) if row[3] == 0), default=-1) + 1
+    children = [row for row in rows[start:end] if row[3] == 1]
+    return sorted(children, key=lambda row: -row[2])
+
+
+def heavy_modules(loaded):
+    """Paquets de HEAVY_PACKAGES présents dans sys.modules (une tentative d'import bloquée ne compte pas)"""
+    return [name for name in HEAVY_PACKAGES if name in loaded]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Audit du temps d'import d'un module")
+    parser.add_argument('module', nargs='?', default='app', help="module à importer (défaut : app)")
+    parser.add_argument('--top', type=int, default=15, help="nombre de paquets affichés")
+    parser.add_argument('--budget-ms', type=float, help="échec (code 1) si l'import total dépasse ce temps")
+    args = parser.parse_args()
+
+    env = dict(os.environ, DASHBOARD_STARTUP_TIMELINE='off')
+    rows, loaded = audit(args.module, env=env)
+    total_ms = sum(self_us for _, self_us, _, _ in rows) / 1000
+    packages = by_package(rows)
+
+    print("\n" + "="*60)
+    print(f"📦 AUDIT DES IMPORTS : import {args.module} ({total_ms:.0f} ms, {len(rows)} modules)")
+    print("="*60 + "\n")
+
+    print("⏱️  Temps propre par paquet :")
+    for package, self_us in list(packages.items())[:args.top]:
+        share = 100 * self_us / 1000 / total_ms if total_ms else 0
+        print(f"   {package:<28} {self_us / 1000:>7.0f} ms  {share:>4.0f}%  {'█' * int(share / 2)}")
+
+    print(f"\n🐢 Imports directs de {args.module} (temps cumulé) :")
+    for module, _, cumulative_us, _ in direct_imports(rows, args.module)[:args.top]:
+        print(f"   {module:<40} {cumulative_us / 1000:>7.0f} ms")
+
+    heavy = heavy_modules(loaded)
+    print()
+    if heavy:
+        print(f"⚠️  Paquets lourds chargés au démarrage : {', '.join(heavy)}")
+    else:
+        print("✅ Aucun paquet lourd chargé au démarrage")
+
+    over_budget = args.budget_ms is not None and total_ms > args.budget_ms
+    if over_budget:
+        print(f"🔴 {total_ms:.0f} ms > budget de {args.budget_ms:.0f} ms")
+    print("="*60 + "\n")
+    return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,489 @@
+"""
+Test de charge du dashboard : rejoue des sessions utilisateur réalistes
+- Cible en processus (app.server, client de test Flask) ou serveur HTTP (gunicorn local)
+- Chaque utilisateur virtuel enchaîne chargement, filtres, prédictions et clusters
+- Rapport : latences p50/p95/p99 par étape, débit, erreurs, mémoire par worker
+
+Usage :
+    python load_test.py --users 20 --duration 60
+    python load_test.py --url http://127.0.0.1:8050 --users 50 --master-pid $(cat gunicorn.pid)
+"""
+
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+
+from startup_timeline import process_memory
+
+# Valeurs de filtres rejouées (jeu de données Northwind)
+DATE_RANGES = [
+    ('1996-07-04', '1998-05-06'),
+    ('1997-01-01', '1997-12-31'),
+    ('1997-07-01', '1998-05-06'),
+    ('1996-07-04', '1996-12-31'),
+    ('1998-01-01', '1998-05-06')
+]
+COUNTRIES = ['Germany', 'USA', 'France', 'Brazil', 'UK', 'Austria', 'Venezuela', 'Sweden', 'Canada', 'Italy']
+CATEGORIES = ['Beverages', 'Dairy Products', 'Confections', 'Seafood', 'Meat/Poultry', 'Condiments']
+
+# Store de l'identifiant d'onglet (request_coalescing.TAB_ID_STORE, sans importer dash ici)
+TAB_ID_STORE = 'tab-id'
+
+# Mode navigateur (DASHBOARD_CLIENTSIDE=1, voir clientside.py) : tables pré-agrégées du
+# layout, et demande / réponse du calcul serveur des périodes qui coupent un mois
+CLIENTSIDE_DATA_STORE = 'dashboard-data'
+FALLBACK_REQUEST_STORE = 'clientside-fallback-request'
+FALLBACK_RESULT_STORE = 'clientside-fallback-result'
+
+
+class InProcessTransport:
+    """Requêtes vers app.server via le client de test Flask (un client = un navigateur)"""
+
+    def __init__(self, server):
+        self.client = server.test_client()
+
+    def get(self, path):
+        response = self.client.get(path)
+        return response.status_code, response.get_data()
+
+    def post_json(self, path, payload):
+        response = self.client.post(path, json=payload)
+        return response.status_code, response.get_data()
+
+
+class HttpTransport:
+    """Requêtes HTTP vers un serveur (cookies conservés comme un navigateur)"""
+
+    def __init__(self, base_url, timeout=120):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar())
+        )
+
+    def _send(self, request):
+        try:
+            with self.opener.open(request, timeout=self.timeout) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+    def get(self, path):
+        return self._send(urllib.request.Request(self.base_url + path))
+
+    def post_json(self, path, payload):
+        request = urllib.request.Request(
+            self.base_url + path,
+            data=json.dumps(payload).encode('utf-8'),
+            headers={'Content-Type': 'application/json'},
+            method='POST'
+        )
+        return self._send(request)
+
+
+def find_component(layout, component_id):
+    """Props du composant component_id dans le JSON de /_dash-layout (None si absent)"""
+    stack = [layout]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, dict):
+            props = node.get('props', {})
+            if props.get('id') == component_id:
+                return props
+            stack.append(props.get('children'))
+    return None
+
+
+def parse_output(output):
+    """'..a.children...b.figure..' -> [{'id': 'a', 'property': 'children'}, ...]"""
+    if output.startswith('..'):
+        parts = output[2:-2].split('...')
+        return [dict(zip(('id', 'property'), part.rsplit('.', 1))) for part in parts]
+    return dict(zip(('id', 'property'), output.rsplit('.', 1)))
+
+
+class DashSession:
+    """
+    Un utilisateur virtuel : construit les requêtes _dash-update-component
+    à partir de /_dash-dependencies, comme le fait dash-renderer
+
+    En mode navigateur, les KPIs sont calculés par assets/clientside.js : seules les
+    périodes qui coupent un mois envoient une requête (callback dashboard_fallback).
+    """
+
+    def __init__(self, transport, dependencies, recorder):
+        self.transport = transport
+        self.recorder = recorder
+        self.callbacks = {}
+        for dep in dependencies:
+            if dep.get('clientside_function'):
+                continue
+            outputs = parse_output(dep['output'])
+            for output in (outputs if isinstance(outputs, list) else [outputs]):
+                self.callbacks[output['id']] = dep
+        self.values = {}
+        self.clientside = 'kpi-ca' not in self.callbacks and FALLBACK_RESULT_STORE in self.callbacks
+        # Bornes (premier, dernier jour) de chaque mois du payload, lues dans le layout
+        self.month_bounds = []
+
+    def _timed(self, step, send):
+        start = time.perf_counter()
+        try:
+            status, body = send()
+        except Exception:
+            status, body = 599, b''
+        self.recorder.record(step, time.perf_counter() - start, status, len(body))
+        return status, body
+
+    def fire(self, step, output_id, changed):
+        """
+        Déclenche le callback serveur qui produit output_id avec les valeurs courantes
+
+        Returns:
+            statut HTTP, None si aucun callback serveur ne produit output_id
+        """
+        dep = self.callbacks.get(output_id)
+        if dep is None:
+            return None
+
+        def with_value(item):
+            return dict(item, value=self.values.get((item['id'], item['property'])))
+
+        payload = {
+            'output': dep['output'],
+            'outputs': parse_output(dep['output']),
+            'inputs': [with_value(item) for item in dep['inputs']],
+            'state': [with_value(item) for item in dep['state']],
+            'changedPropIds': changed
+        }
+        status, body = self._timed(step, lambda: self.transport.post_json('/_dash-update-component', payload))
+
+        # Garder les empreintes du dashboard (mises à jour partielles)
+        if status == 200 and output_id == 'kpi-ca':
+            response = json.loads(body).get('response', {})
+            signatures = response.get('dashboard-signatures', {}).get('data')
+            if signatures is not None:
+                self.values[('dashboard-signatures', 'data')] = signatures
+        return status
+
+    def set_filters(self, step, values):
+        """
+        Change des filtres ({(id, propriété): valeur}) et déclenche update_dashboard
+
+        En mode navigateur, envoie la demande de calcul serveur seulement si la période
+        coupe un mois (sinon aucune requête, comme le navigateur)
+        """
+        self.values.update(values)
+        if not self.clientside:
+            changed = [f"{component}.{prop}" for component, prop in values]
+            return self.fire(step, 'kpi-ca', changed)
+        request = self.fallback_request()
+        if request is None:
+            return None
+        self.values[(FALLBACK_REQUEST_STORE, 'data')] = request
+        return self.fire(step, FALLBACK_RESULT_STORE, [f"{FALLBACK_REQUEST_STORE}.data"])
+
+    def fallback_request(self):
+        """Demande envoyée par updateDashboard (clientside.js) pour les filtres courants, ou None"""
+        start, end = (self.values.get(('date-filter', prop)) for prop in ('start_date', 'end_date'))
+        start, end = (date[:10] if date else None for date in (start, end))
+        countries = self.values.get(('country-filter', 'value'))
+        categories = self.values.get(('category-filter', 'value'))
+        for first, last in self.month_bounds:
+            inside = (not start or first >= start) and (not end or last <= end)
+            touched = (not start or last >= start) and (not end or first <= end)
+            if touched and not inside:
+                key = json.dumps([start, end, countries or [], categories or []], separators=(',', ':'))
+                return {'key': key, 'filters': [start, end, countries, categories]}
+        return None
+
+    # ----- Étapes d'une session -----
+
+    def initial_load(self):
+        self._timed('page', lambda: self.transport.get('/'))
+        status, body = self._timed('layout', lambda: self.transport.get('/_dash-layout'))
+        if self.clientside and status == 200:
+            payload = (find_component(json.loads(body), CLIENTSIDE_DATA_STORE) or {}).get('data') or {}
+            self.month_bounds = list(zip(payload.get('month_first', []), payload.get('month_last', [])))
+        self._timed('dependencies', lambda: self.transport.get('/_dash-dependencies'))
+        start, end = DATE_RANGES[0]
+        self.values.update({
+            # Identifiant d'onglet tiré par assets/tab_id.js dans un vrai navigateur
+            (TAB_ID_STORE, 'data'): uuid.uuid4().hex,
+            ('date-filter', 'start_date'): start,
+            ('date-filter', 'end_date'): end,
+            ('country-filter', 'value'): [],
+            ('category-filter', 'value'): []
+        })
+        # Au chargement, dash-renderer déclenche tous les callbacks des pages montées
+        # (en mode navigateur, le dashboard est calculé sans requête sur toute la période)
+        self.fire('initial_dashboard', 'kpi-ca', [])
+        if 'prediction-result' in self.callbacks:
+            self.fire('initial_prediction', 'prediction-result', [])
+        if 'cluster-content' in self.callbacks:
+            self.fire('initial_clusters', 'cluster-content', [])
+
+    def change_dates(self, rng):
+        start, end = rng.choice(DATE_RANGES)
+        self.set_filters('dates', {('date-filter', 'start_date'): start, ('date-filter', 'end_date'): end})
+
+    def select_countries(self, rng):
+        # Sélection multiple progressive : une requête par pays ajouté
+        selected = []
+        for country in rng.sample(COUNTRIES, rng.randint(1, 3)):
+            selected.append(country)
+            self.set_filters('countries', {('country-filter', 'value'): list(selected)})
+
+    def select_categories(self, rng):
+        selected = rng.sample(CATEGORIES, rng.randint(1, 2))
+        self.set_filters('categories', {('category-filter', 'value'): selected})
+
+    def reset_filters(self, rng):
+        self.set_filters('reset', {('country-filter', 'value'): [], ('category-filter', 'value'): []})
+
+    def predict(self, rng):
+        if 'prediction-result' not in self.callbacks:
+            return
+        self.values.update({
+            ('btn-predict', 'n_clicks'): self.values.get(('btn-predict', 'n_clicks'), 0) + 1,
+            ('input-recency', 'value'): rng.randint(1, 600),
+            ('input-frequency', 'value'): rng.randint(1, 30),
+            ('input-monetary', 'value'): rng.randint(100, 50000),
+            ('input-discount', 'value'): rng.randint(0, 25),
+            ('input-days-between', 'value'): rng.randint(5, 120),
+            ('input-recent-ratio', 'value'): round(rng.random(), 2)
+        })
+        self.fire('predict', 'prediction-result', ['btn-predict.n_clicks'])
+
+    def click_cluster(self, rng):
+        if 'cluster-content' not in self.callbacks:
+            return
+        button = f"btn-cluster-{rng.randint(0, 2)}"
+        self.values[(button, 'n_clicks')] = self.values.get((button, 'n_clicks'), 0) + 1
+        self.fire('cluster', 'cluster-content', [f'{button}.n_clicks'])
+
+    def run(self, rng, think_time=0.0):
+        """Une session complète (la navigation entre pages est clientside : aucune requête)"""
+        self.initial_load()
+        steps = [self.change_dates, self.select_countries, self.select_categories,
+                 self.reset_filters, self.predict, self.click_cluster]
+        weights = [3, 3, 2, 1, 1, 1]
+        for _ in range(rng.randint(4, 10)):
+            rng.choices(steps, weights)[0](rng)
+            if think_time:
+                time.sleep(rng.expovariate(1 / think_time))
+
+
+class Recorder:
+    """Latences et statuts par étape (thread-safe)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.bytes = 0
+
+    def record(self, step, seconds, status, size):
+        with self._lock:
+            self.latencies[step].append(seconds)
+            self.statuses[step][status] += 1
+            self.bytes += size
+
+
+def read_rss_mb(pid):
+    """Mémoire résidente d'un processus (Linux, /proc)"""
+    try:
+        for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    except (FileNotFoundError, ProcessLookupError):
+        pass
+    return None
+
+
+def worker_pids(master_pid):
+    """Processus enfants du master gunicorn"""
+    children = []
+    for task in Path(f"/proc/{master_pid}/task").glob('*'):
+        children_file = task / 'children'
+        if children_file.exists():
+            children.extend(int(pid) for pid in children_file.read_text().split())
+    return children
+
+
+class MemorySampler(threading.Thread):
+    """Relève périodiquement la RSS et l'USS des workers (pic par processus)"""
+
+    def __init__(self, master_pid=None, interval=0.5):
+        super().__init__(daemon=True)
+        self.master_pid = master_pid
+        self.interval = interval
+        self.peak = {}
+        self.unique_peak = {}
+        self._stop_event = threading.Event()
+
+    def pids(self):
+        if self.master_pid is None:
+            return [os.getpid()]
+        return worker_pids(self.master_pid)
+
+    def run(self):
+        while not self._stop_event.is_set():
+            for pid in self.pids():
+                rss = read_rss_mb(pid)
+                if rss is not None:
+                    self.peak[pid] = max(self.peak.get(pid, 0), rss)
+                # USS : sous --preload, la RSS compte aussi les pages partagées avec le master
+                memory = process_memory(pid)
+                if memory is not None:
+                    self.unique_peak[pid] = max(self.unique_peak.get(pid, 0), memory['uss'] / 1024**2)
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def run_load_test(make_transport, users=10, duration=30.0, think_time=0.0, seed=42, master_pid=None):
+    """
+    Lance `users` utilisateurs virtuels pendant `duration` secondes
+
+    Returns:
+        dict du rapport (latences en ms)
+    """
+    dependencies = json.loads(make_transport().get('/_dash-dependencies')[1])
+    recorder = Recorder()
+    sampler = MemorySampler(master_pid)
+    sampler.start()
+    deadline = time.monotonic() + duration
+    sessions_done = defaultdict(int)
+
+    def user_loop(user_id):
+        rng = random.Random(seed + user_id)
+        while time.monotonic() < deadline:
+            # Nouvelle session = nouveau navigateur (cookie de session neuf)
+            DashSession(make_transport(), dependencies, recorder).run(rng, think_time)
+            sessions_done[user_id] += 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=user_loop, args=(i,), daemon=True) for i in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    sampler.stop()
+
+    return build_report(recorder, elapsed, users, sum(sessions_done.values()), sampler.peak,
+                        sampler.unique_peak)
+
+
+def build_report(recorder, elapsed, users, sessions, memory_peak, unique_peak=None):
+    steps = {}
+    all_latencies = []
+    for step, values in sorted(recorder.latencies.items()):
+        ms = np.asarray(values) * 1000
+        all_latencies.append(ms)
+        statuses = dict(recorder.statuses[step])
+        steps[step] = {
+            'count': len(ms),
+            'p50': float(np.percentile(ms, 50)),
+            'p95': float(np.percentile(ms, 95)),
+            'p99': float(np.percentile(ms, 99)),
+            'max': float(ms.max()),
+            # 204 = calcul abandonné (état de filtres dépassé), ce n'est pas une erreur
+            'errors': sum(count for status, count in statuses.items() if status >= 400),
+            'statuses': {str(status): count for status, count in statuses.items()}
+        }
+
+    merged = np.concatenate(all_latencies) if all_latencies else np.zeros(1)
+    total = int(sum(step['count'] for step in steps.values()))
+    return {
+        'users': users,
+        'sessions': sessions,
+        'duration_s': elapsed,
+        'requests': total,
+        'throughput_rps': total / elapsed if elapsed else 0.0,
+        'bytes_received': recorder.bytes,
+        'p50': float(np.percentile(merged, 50)),
+        'p95': float(np.percentile(merged, 95)),
+        'p99': float(np.percentile(merged, 99)),
+        'errors': int(sum(step['errors'] for step in steps.values())),
+        'steps': steps,
+        'memory_mb': {str(pid): round(rss, 1) for pid, rss in memory_peak.items()},
+        'unique_memory_mb': {str(pid): round(uss, 1) for pid, uss in (unique_peak or {}).items()}
+    }
+
+
+def print_report(report):
+    print("\n" + "="*60)
+    print("📊 RÉSULTATS DU TEST DE CHARGE")
+    print("="*60)
+    print(f"   Utilisateurs : {report['users']}  |  Sessions : {report['sessions']}  |  Durée : {report['duration_s']:.1f}s")
+    print(f"   Requêtes : {report['requests']}  |  Débit : {report['throughput_rps']:.1f} req/s  |  Erreurs : {report['errors']}")
+    print(f"   Latence globale : p50 {report['p50']:.0f} ms  |  p95 {report['p95']:.0f} ms  |  p99 {report['p99']:.0f} ms\n")
+
+    print(f"   {'Étape':<20}{'n':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}  statuts")
+    for step, stats in report['steps'].items():
+        statuses = ' '.join(f"{status}:{count}" for status, count in sorted(stats['statuses'].items()))
+        print(f"   {step:<20}{stats['count']:>7}{stats['p50']:>9.0f}{stats['p95']:>9.0f}"
+              f"{stats['p99']:>9.0f}{stats['max']:>9.0f}  {statuses}")
+
+    print("\n   💾 Mémoire (pic RSS et pic USS, pages propres, par processus)")
+    for pid, rss in report['memory_mb'].items():
+        uss = report.get('unique_memory_mb', {}).get(pid)
+        print(f"      PID {pid} : {rss:.0f} Mo" + (f"  |  unique {uss:.0f} Mo" if uss is not None else ""))
+    print("="*60 + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test de charge du dashboard Northwind")
+    parser.add_argument('--url', help="serveur HTTP à tester (défaut : app.server en processus)")
+    parser.add_argument('--users', type=int, default=10, help="utilisateurs simultanés")
+    parser.add_argument('--duration', type=float, default=30.0, help="durée du test (s)")
+    parser.add_argument('--think-time', type=float, default=0.0, help="pause moyenne entre deux actions (s)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--master-pid', type=int, help="PID du master gunicorn (mémoire des workers)")
+    parser.add_argument('--output', help="fichier JSON du rapport")
+    args = parser.parse_args()
+
+    print("\n" + "="*60)
+    print("🚀 TEST DE CHARGE DU DASHBOARD")
+    print("="*60 + "\n")
+
+    if args.url:
+        def make_transport():
+            return HttpTransport(args.url)
+        print(f"🌐 Cible : {args.url}")
+    else:
+        from app import server
+
+        def make_transport():
+            return InProcessTransport(server)
+        print("🧪 Cible : app.server (en processus)")
+
+    print(f"👥 {args.users} utilisateurs pendant {args.duration:.0f}s\n")
+    report = run_load_test(make_transport, users=args.users, duration=args.duration,
+                           think_time=args.think_time, seed=args.seed, master_pid=args.master_pid)
+    print_report(report)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2) + "\n")
+        print(f"💾 Rapport sauvegardé : {args.output}")
+
+
+if __name__ == "__main__":
+    main()
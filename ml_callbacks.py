@@ -2,20 +2,42 @@
 Callbacks pour les fonctionnalités ML (prédiction et analyse de clusters)
 """
 
+import threading
+
 from dash import Input, Output, State, html, ctx
 import dash_bootstrap_components as dbc
-import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
-import numpy as np
 from dash import dcc
+from feature_store import model_matrix
+from transport import encode_figure
+from compute_pool import PoolSaturated
+from instrumentation import NULL_TRACE, callback_trace
+
+# Message affiché quand la file de calcul d'un callback est pleine
+BUSY_MESSAGE = "⏳ Serveur très sollicité, veuillez réessayer dans quelques secondes"
 
 
-def register_ml_callbacks(app, data_model, model_artifacts, cluster_data):
+def register_ml_callbacks(app, data_model, model_artifacts, cluster_data, cluster_lookup=None, compute_pool=None,
+                          metrics=None):
     """
     Enregistre tous les callbacks liés au ML
+    
+    Args:
+        cluster_lookup: index ClusterLookup optionnel (évite de scanner cluster_data à chaque clic)
+        compute_pool: ComputePool optionnel (files 'predict' et 'cluster')
+        metrics: CallbackMetrics optionnel (durée par phase et lignes parcourues)
     """
     
+    def run_in_lane(lane, fn, *args):
+        """Exécute fn dans la file du pool (ou directement sans pool)"""
+        if compute_pool is None:
+            return fn(*args)
+        try:
+            return compute_pool.run(lane, fn, *args)
+        except PoolSaturated:
+            return dbc.Alert(BUSY_MESSAGE, color="warning")
+    
     # Définir les labels des clusters
     cluster_labels = {
         0: 'Low-Value Inactive',
@@ -23,25 +45,6 @@ def register_ml_callbacks(app, data_model, model_artifacts, cluster_data):
         2: 'VIP Premium'
     }
     
-    # Callback pour la navigation entre pages
-    @app.callback(
-        [Output('page-content', 'children'),
-         Output('nav-dashboard', 'active'),
-         Output('nav-prediction', 'active'),
-         Output('nav-clusters', 'active')],
-        Input('url', 'pathname')
-    )
-    def display_page(pathname):
-        # Import des layouts (doit être fait ici pour éviter les imports circulaires)
-        from app import dashboard_layout, prediction_layout, clusters_layout
-        
-        if pathname == '/prediction':
-            return prediction_layout, False, True, False
-        elif pathname == '/clusters':
-            return clusters_layout, False, False, True
-        else:  # '/' ou autre
-            return dashboard_layout, True, False, False
-    
     # Callback pour la prédiction
     @app.callback(
         Output('prediction-result', 'children'),
@@ -57,6 +60,12 @@ def register_ml_callbacks(app, data_model, model_artifacts, cluster_data):
         if not n_clicks or model_artifacts is None:
             return html.Div()
         
+        with callback_trace(metrics, 'predict_cluster') as trace:
+            return run_in_lane('predict', build_prediction,
+                               recency, frequency, monetary, discount, days_between, recent_ratio, trace)
+    
+    def build_prediction(recency, frequency, monetary, discount, days_between, recent_ratio, trace=NULL_TRACE):
+        trace.lap('queue')
         try:
             # Validation des inputs
             if None in [recency, frequency, monetary, discount, days_between, recent_ratio]:
@@ -72,16 +81,8 @@ def register_ml_callbacks(app, data_model, model_artifacts, cluster_data):
                 'recent_ratio': recent_ratio
             }
             
-            # Créer un DataFrame
-            customer_df = pd.DataFrame([customer_features])
-            
-            # Appliquer la transformation log à monetary
-            feature_cols = model_artifacts['feature_columns']
-            if 'monetary_log' in feature_cols:
-                customer_df['monetary_log'] = np.log1p(customer_df['monetary'])
-            
-            # Sélectionner les features dans le bon ordre
-            customer_df = customer_df[feature_cols]
+            # Mêmes transformations que pour l'entraînement (feature store)
+            customer_df = model_matrix(pd.DataFrame([customer_features]), model_artifacts['feature_columns'])
             
             # Normaliser
             scaler = model_artifacts['scaler']
@@ -90,10 +91,12 @@ def register_ml_callbacks(app, data_model, model_artifacts, cluster_data):
             # Prédire
             kmeans = model_artifacts['kmeans_model']
             cluster = kmeans.predict(customer_scaled)[0]
+            trace.add_rows(1)
+            trace.lap('predict')
             
             # Récupérer le label et les statistiques du cluster
             label = cluster_labels.get(cluster, f'Cluster {cluster}')
-            cluster_profile = model_artifacts['cluster_profiles'].loc[cluster]
+            cluster_profile = get_cluster_profile(model_artifacts, cluster)
             
             # Définir la couleur selon le cluster
             color_map = {0: 'warning', 1: 'danger', 2: 'success'}
@@ -149,6 +152,7 @@ def register_ml_callbacks(app, data_model, model_artifacts, cluster_data):
                     ])
                 ])
             ], color=color, outline=True, className="shadow")
+            trace.lap('figure')
             
             return result
             
@@ -156,6 +160,24 @@ def register_ml_callbacks(app, data_model, model_artifacts, cluster_data):
             return dbc.Alert(f"❌ Erreur lors de la prédiction : {str(e)}", color="danger")
     
     # Callbacks pour la sélection de cluster
+    # Partagés par les threads du worker : lus et modifiés sous analysis_lock
+    # (le calcul d'une analyse se fait hors du verrou)
+    analysis_cache = {}
+    analysis_hits = {'hit': 0, 'miss': 0}
+    analysis_lock = threading.Lock()
+    
+    def analysis_cache_samples():
+        with analysis_lock:
+            counts = list(analysis_hits.items())
+        return [({'result': result}, count) for result, count in counts]
+    
+    if metrics is not None:
+        metrics.add_collector(lambda: [
+            ('dashboard_cluster_analysis_cache_requests_total', 'counter',
+             "Analyses de cluster servies depuis le cache du worker (hit) ou calculées (miss)",
+             analysis_cache_samples())
+        ])
+    
     @app.callback(
         Output('cluster-content', 'children'),
         [Input('btn-cluster-0', 'n_clicks'),
@@ -163,7 +185,7 @@ def register_ml_callbacks(app, data_model, model_artifacts, cluster_data):
          Input('btn-cluster-2', 'n_clicks')]
     )
     def display_cluster_analysis(n0, n1, n2):
-        # Déterminer quel bouton a été cliqué
+        # Déterminer quel bouton a été cliqué (ctx n'est lisible que dans le thread de la requête)
         triggered_id = ctx.triggered_id
         
         if triggered_id is None:
@@ -171,17 +193,43 @@ def register_ml_callbacks(app, data_model, model_artifacts, cluster_data):
         else:
             cluster_id = int(triggered_id.split('-')[-1])
         
+        with callback_trace(metrics, 'display_cluster_analysis') as trace:
+            # Données statiques : l'analyse d'un cluster n'est calculée qu'une fois par worker
+            with analysis_lock:
+                cached = analysis_cache.get(cluster_id)
+                analysis_hits['hit' if cached is not None else 'miss'] += 1
+            if cached is not None:
+                trace.lap('cache')
+                return cached
+            
+            result = run_in_lane('cluster', build_cluster_analysis, cluster_id, trace)
+            if isinstance(result, dbc.Alert):
+                return result  # erreur ou file pleine : ne pas mettre en cache
+            with analysis_lock:
+                # Deux requêtes simultanées peuvent calculer la même analyse : la première gardée
+                result = analysis_cache.setdefault(cluster_id, result)
+            return result
+    
+    def build_cluster_analysis(cluster_id, trace=NULL_TRACE):
+        # plotly.express (~70 ms d'import) n'est chargé qu'à la première analyse
+        import plotly.express as px
+        trace.lap('queue')
         if cluster_data is None:
             return dbc.Alert("⚠️ Données de clustering non disponibles", color="warning")
         
         try:
             # Filtrer les clients du cluster
-            cluster_customers = cluster_data[cluster_data['cluster'] == cluster_id]['customerID'].tolist()
+            if cluster_lookup is not None:
+                cluster_customers = cluster_lookup.customers_in_cluster(cluster_id)
+            else:
+                cluster_customers = cluster_data[cluster_data['cluster'] == cluster_id]['customerID'].tolist()
+            
+            # Filtrer les données du data_model (partition par partition en mode partitionné)
+            stats = {}
+            cluster_orders = data_model.get_customer_rows(cluster_customers, stats)
             
-            # Filtrer les données du data_model
-            cluster_orders = data_model.full_dataset[
-                data_model.full_dataset['customerID'].isin(cluster_customers)
-            ].copy()
+            trace.add_rows(stats['rows_scanned'])
+            trace.lap('filter')
             
             if len(cluster_orders) == 0:
                 return dbc.Alert(f"⚠️ Aucune donnée pour ce cluster", color="warning")
@@ -192,17 +240,16 @@ def register_ml_callbacks(app, data_model, model_artifacts, cluster_data):
             num_customers = len(cluster_customers)
             num_orders = cluster_orders['orderID'].nunique()
             
-            # Calcul des jours moyens entre commandes
-            orders_by_customer = cluster_orders.groupby('customerID')['orderDate'].apply(
-                lambda x: x.sort_values().diff().dt.days.mean() if len(x) > 1 else 0
-            )
-            avg_days_between = orders_by_customer.mean()
+            # Jours moyens entre commandes (pré-calculés dans le feature store)
+            customer_features = data_model.get_customer_features().set_index('customerID')
+            avg_days_between = customer_features.reindex(cluster_customers)['avg_days_between_orders'].mean()
             
             # Top 10 produits
-            top_products = cluster_orders.groupby('productName').agg({
+            top_products = cluster_orders.groupby('productName', observed=True).agg({
                 'quantity': 'sum',
                 'lineTotal': 'sum'
             }).sort_values('lineTotal', ascending=False).head(10)
+            trace.lap('aggregate')
             
             # Créer le graphique top produits
             fig_products = px.bar(
@@ -220,6 +267,7 @@ def register_ml_callbacks(app, data_model, model_artifacts, cluster_data):
                 showlegend=False,
                 height=450
             )
+            trace.lap('figure')
             
             # Évolution temporelle
             monthly_data = cluster_orders.groupby(
@@ -229,6 +277,7 @@ def register_ml_callbacks(app, data_model, model_artifacts, cluster_data):
                 'orderID': 'nunique'
             }).reset_index()
             monthly_data['orderDate'] = monthly_data['orderDate'].dt.to_timestamp()
+            trace.lap('aggregate')
             
             fig_evolution = go.Figure()
             fig_evolution.add_trace(go.Scatter(
@@ -245,6 +294,10 @@ def register_ml_callbacks(app, data_model, model_artifacts, cluster_data):
                 yaxis_title='Chiffre d\'Affaires ($)',
                 height=450
             )
+            trace.lap('figure')
+            encoded_products = encode_figure(fig_products)
+            encoded_evolution = encode_figure(fig_evolution)
+            trace.lap('serialize')
             
             # Layout du résultat
             result = html.Div([
@@ -304,7 +357,7 @@ def register_ml_callbacks(app, data_model, model_artifacts, cluster_data):
                     dbc.Col([
                         dbc.Card([
                             dbc.CardBody([
-                                dcc.Graph(figure=fig_products)
+                                dcc.Graph(figure=encoded_products)
                             ])
                         ], className="shadow-sm")
                     ], md=6, className="mb-3"),
@@ -312,12 +365,13 @@ def register_ml_callbacks(app, data_model, model_artifacts, cluster_data):
                     dbc.Col([
                         dbc.Card([
                             dbc.CardBody([
-                                dcc.Graph(figure=fig_evolution)
+                                dcc.Graph(figure=encoded_evolution)
                             ])
                         ], className="shadow-sm")
                     ], md=6, className="mb-3"),
                 ])
             ])
+            trace.lap('figure')
             
             return result
             
@@ -325,6 +379,18 @@ def register_ml_callbacks(app, data_model, model_artifacts, cluster_data):
             return dbc.Alert(f"❌ Erreur lors de l'analyse : {str(e)}", color="danger")
 
 
+def get_cluster_profile(model_artifacts, cluster_id):
+    """
+    Retourne le profil moyen d'un cluster (dict-like avec .get)
+    
+    Accepte les profils DataFrame (artefacts joblib) comme dict (bundle .npz).
+    """
+    profiles = model_artifacts['cluster_profiles']
+    if isinstance(profiles, dict):
+        return profiles.get(int(cluster_id), {})
+    return profiles.loc[cluster_id]
+
+
 def get_recommendation(cluster_id, rec_index):
     """
     Retourne une recommandation basée sur le cluster
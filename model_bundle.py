@@ -0,0 +1,144 @@
+"""
+Format d'export des artefacts de clustering sans objets sklearn picklés
+Un seul fichier .npz (tableaux + métadonnées JSON) lisible avec NumPy uniquement
+"""
+
+import json
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+MODEL_PATH = Path("models/customer_clustering_model.pkl")
+BUNDLE_PATH = Path("models/customer_clustering_model.npz")
+
+BUNDLE_FORMAT_VERSION = 1
+
+
+class ArrayScaler:
+    """Équivalent NumPy de RobustScaler / StandardScaler.transform"""
+
+    def __init__(self, center, scale):
+        self.center_ = np.asarray(center, dtype=float)
+        self.scale_ = np.asarray(scale, dtype=float)
+
+    def transform(self, X):
+        return (np.asarray(X, dtype=float) - self.center_) / self.scale_
+
+
+class ArrayKMeans:
+    """Équivalent NumPy de KMeans.predict (centroïde le plus proche)"""
+
+    def __init__(self, cluster_centers):
+        self.cluster_centers_ = np.asarray(cluster_centers, dtype=float)
+        self.n_clusters = len(self.cluster_centers_)
+
+    def transform(self, X):
+        """Distances euclidiennes à chaque centroïde"""
+        X = np.asarray(X, dtype=float)
+        return np.sqrt(((X[:, None, :] - self.cluster_centers_[None, :, :]) ** 2).sum(axis=2))
+
+    def predict(self, X):
+        return self.transform(X).argmin(axis=1)
+
+
+def _scaler_arrays(scaler, n_features):
+    """Extrait (center, scale) d'un RobustScaler / StandardScaler ajusté"""
+    if hasattr(scaler, 'center_'):
+        center = scaler.center_
+    elif hasattr(scaler, 'mean_'):
+        center = scaler.mean_
+    else:
+        raise TypeError(f"Scaler non supporté pour l'export : {type(scaler).__name__}")
+
+    center = np.zeros(n_features) if center is None else center
+    scale = np.ones(n_features) if scaler.scale_ is None else scaler.scale_
+    return np.asarray(center, dtype=float), np.asarray(scale, dtype=float)
+
+
+def export_bundle(model_artifacts, bundle_path=BUNDLE_PATH):
+    """
+    Exporte les artefacts (scaler, centroïdes, features, profils) au format .npz
+
+    Args:
+        model_artifacts: dictionnaire chargé depuis customer_clustering_model.pkl
+        bundle_path: fichier .npz de sortie
+    """
+    feature_columns = list(model_artifacts['feature_columns'])
+    centers = np.asarray(model_artifacts['kmeans_model'].cluster_centers_, dtype=float)
+    center, scale = _scaler_arrays(model_artifacts['scaler'], len(feature_columns))
+
+    profiles = model_artifacts.get('cluster_profiles')
+    meta = {
+        'format_version': BUNDLE_FORMAT_VERSION,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'scaler_type': type(model_artifacts['scaler']).__name__,
+        'model_type': type(model_artifacts['kmeans_model']).__name__,
+        'feature_columns': feature_columns,
+        'n_clusters': int(model_artifacts.get('n_clusters', len(centers))),
+        'profile_columns': [] if profiles is None else [str(c) for c in profiles.columns],
+        'profile_index': [] if profiles is None else [int(i) for i in profiles.index]
+    }
+
+    bundle_path = Path(bundle_path)
+    bundle_path.parent.mkdir(parents=True, exist_ok=True)
+    np.savez_compressed(
+        bundle_path,
+        scaler_center=center,
+        scaler_scale=scale,
+        cluster_centers=centers,
+        cluster_profiles=np.empty((0, 0)) if profiles is None else profiles.to_numpy(dtype=float),
+        meta=np.array(json.dumps(meta))
+    )
+    return meta
+
+
+def load_bundle(bundle_path=BUNDLE_PATH):
+    """
+    Charge un bundle .npz sans sklearn ni pickle
+
+    Returns:
+        dict au même format que les artefacts joblib ('scaler', 'kmeans_model',
+        'feature_columns', 'n_clusters', 'cluster_profiles'), où 'cluster_profiles'
+        est un dict {cluster_id: {feature: valeur moyenne}}
+    """
+    with np.load(bundle_path, allow_pickle=False) as data:
+        meta = json.loads(str(data['meta']))
+        if meta['format_version'] > BUNDLE_FORMAT_VERSION:
+            raise ValueError(f"Format de bundle non supporté : {meta['format_version']}")
+
+        profiles_array = data['cluster_profiles']
+        profiles = {
+            cluster_id: dict(zip(meta['profile_columns'], row.tolist()))
+            for cluster_id, row in zip(meta['profile_index'], profiles_array)
+        }
+
+        return {
+            'scaler': ArrayScaler(data['scaler_center'], data['scaler_scale']),
+            'kmeans_model': ArrayKMeans(data['cluster_centers']),
+            'feature_columns': meta['feature_columns'],
+            'n_clusters': meta['n_clusters'],
+            'cluster_profiles': profiles,
+            'meta': meta
+        }
+
+
+def main():
+    """Convertit customer_clustering_model.pkl en bundle .npz"""
+    import joblib
+
+    print("\n" + "="*60)
+    print("🚀 EXPORT DU MODÈLE DE CLUSTERING")
+    print("="*60 + "\n")
+
+    model_artifacts = joblib.load(MODEL_PATH)
+    meta = export_bundle(model_artifacts)
+
+    print(f"   ✅ {meta['model_type']} ({meta['n_clusters']} clusters) + {meta['scaler_type']}")
+    print(f"   ✅ {len(meta['feature_columns'])} features : {', '.join(meta['feature_columns'])}")
+    print(f"   💾 {BUNDLE_PATH} ({BUNDLE_PATH.stat().st_size / 1024:.1f} Ko)")
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Index mensuel des lignes de full_dataset
+Positions des lignes regroupées par mois de commande, premier et dernier instant de chaque
+mois : un filtre de dates se traduit en mois entièrement couverts (agrégats pré-calculés)
+et en mois coupés (seules leurs lignes sont parcourues)
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class MonthIndex:
+    """
+    Mois calendaires de dates (du premier au dernier, mois vides compris)
+
+    Attributs :
+        codes : mois de chaque ligne (0..n_months-1, -1 si date manquante)
+        months : PeriodIndex des mois
+        first, last : premier et dernier instant présents dans chaque mois (NaT si vide)
+
+    Construit par from_bounds (mode partitionné), l'index n'a que months, first et last :
+    coverage() et month_codes() restent disponibles, pas les positions de lignes.
+    """
+
+    def __init__(self, dates):
+        values = dates.to_numpy(dtype='datetime64[ns]')
+        present = ~np.isnat(values)
+        month_numbers = values.astype('datetime64[M]').astype(np.int64)
+        origin = month_numbers[present].min() if present.any() else 0
+        self.n_months = int(month_numbers[present].max() - origin + 1) if present.any() else 0
+        self.codes = np.where(present, month_numbers - origin, -1).astype(np.int32)
+        self.months = pd.period_range(start=pd.Period(np.datetime64(int(origin), 'M'), 'M'),
+                                      periods=self.n_months, freq='M')
+
+        # Positions triées par mois : les lignes sans date d'abord, puis chaque mois
+        # Tri stable sur 16 bits : tri par base (radix), linéaire
+        self.order = np.argsort(self.codes.astype(np.int16), kind='stable').astype(np.int32)
+        self.offsets = np.searchsorted(self.codes[self.order], np.arange(-1, self.n_months + 1))
+
+        self.first = np.full(self.n_months, np.datetime64('NaT'), dtype='datetime64[ns]')
+        self.last = self.first.copy()
+        starts, ends = self.offsets[1:-1], self.offsets[2:]
+        nonempty = np.flatnonzero(ends > starts)
+        if len(nonempty):
+            sorted_dates = values[self.order].view(np.int64)
+            self.first[nonempty] = np.minimum.reduceat(sorted_dates, starts[nonempty]).view('datetime64[ns]')
+            self.last[nonempty] = np.maximum.reduceat(sorted_dates, starts[nonempty]).view('datetime64[ns]')
+
+    @classmethod
+    def from_bounds(cls, bounds):
+        """
+        Index sans positions de lignes, depuis {mois (Period): (premier, dernier instant)}
+        """
+        index = cls.__new__(cls)
+        index.codes = index.order = index.offsets = None
+        if bounds:
+            index.months = pd.period_range(start=min(bounds), end=max(bounds), freq='M')
+        else:
+            index.months = pd.PeriodIndex([], freq='M')
+        index.n_months = len(index.months)
+        index.first = np.full(index.n_months, np.datetime64('NaT'), dtype='datetime64[ns]')
+        index.last = index.first.copy()
+        for month, (first, last) in bounds.items():
+            position = index.months.get_loc(month)
+            index.first[position] = pd.Timestamp(first).to_datetime64()
+            index.last[position] = pd.Timestamp(last).to_datetime64()
+        return index
+
+    def month_codes(self, dates):
+        """Mois de chaque date dans cet index (-1 si date manquante ou hors de l'index)"""
+        values = dates.to_numpy(dtype='datetime64[ns]')
+        present = ~np.isnat(values)
+        codes = values.astype('datetime64[M]').astype(np.int64) - (self.months[0].ordinal if self.n_months else 0)
+        present &= (codes >= 0) & (codes < self.n_months)
+        return np.where(present, codes, -1).astype(np.int32)
+
+    def rows(self, months):
+        """Positions des lignes des mois donnés"""
+        slices = [self.order[self.offsets[m + 1]:self.offsets[m + 2]] for m in months]
+        return np.concatenate(slices) if slices else np.empty(0, dtype=np.int32)
+
+    def undated_rows(self):
+        return self.order[self.offsets[0]:self.offsets[1]]
+
+    def coverage(self, state):
+        """
+        Mois entièrement couverts et mois coupés par les dates de state (FilterState)
+
+        Un mois est couvert si le filtre contient son premier et son dernier instant
+        (les mois vides ne sont ni l'un ni l'autre)
+        """
+        start = state.start.to_datetime64() if state.start is not None else None
+        end = state.end.to_datetime64() if state.end is not None else None
+        nonempty = ~np.isnat(self.first)
+        inside, touched = nonempty.copy(), nonempty.copy()
+        if start is not None:
+            inside &= self.first >= start
+            touched &= self.last >= start
+        if end is not None:
+            inside &= self.last <= end
+            touched &= self.first <= end
+        return np.flatnonzero(inside), np.flatnonzero(touched & ~inside)
@@ -0,0 +1,427 @@
+"""
+Stockage partitionné par mois de full_dataset
+- Un fichier colonnaire par mois de commande (NumPy .npz : un tableau par colonne, codes
+  entiers pour les colonnes category) et un manifeste JSON avec les statistiques de chaque
+  partition (min/max de la date, du pays et de la catégorie, valeurs présentes)
+- Un filtre ne lit que les partitions compatibles avec ses statistiques ; celles qu'il
+  couvre entièrement ne sont pas refiltrées
+- Les partitions restent sur disque et sont chargées à la demande (LRU des plus récemment lues) ;
+  les parcours complets (analyse de cluster, sketches) les lisent une à une sans les garder
+- Écriture concurrente sûre (plusieurs workers gunicorn au démarrage) : reconstruction sous
+  verrou fcntl, chaque build dans son propre sous-répertoire, manifeste remplacé en dernier
+"""
+
+import argparse
+import json
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+from month_index import MonthIndex
+from session_state import filter_positions
+
+CLEANED_DIR = Path("data/cleaned")
+
+# À incrémenter à chaque changement du format des partitions
+# (2 : fichiers rangés dans un sous-répertoire par build)
+LAYOUT_VERSION = 2
+
+# Fichiers dont dépend full_dataset (partitions périmées s'ils changent)
+SOURCE_FILES = ["customers_clean.csv", "products_clean.csv", "categories_clean.csv",
+                "orders_clean.csv", "order_details_clean.csv"]
+
+MANIFEST_NAME = "manifest.json"
+LOCK_NAME = ".lock"
+BUILD_PREFIX = "build-"
+UNDATED = "undated"
+INDEX_COLUMN = "__index__"
+
+# Colonnes des statistiques : date, puis dimensions filtrables (colonne -> attribut de FilterState)
+DATE_COLUMN = 'orderDate'
+DIMENSIONS = {'country': 'countries', 'categoryName': 'categories'}
+
+DEFAULT_MAX_LOADED = 24
+
+
+def partitions_dir(cleaned_dir):
+    """Répertoire des partitions, voisin de cleaned (comme 'enriched')"""
+    return Path(cleaned_dir).parent / "partitions"
+
+
+def _column_spec(name, column):
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return {'name': name, 'dtype': 'category', 'categories': column.cat.categories.tolist()}
+    return {'name': name, 'dtype': str(column.dtype)}
+
+
+def _partition_stats(frame):
+    """Statistiques d'une partition (valeurs manquantes ignorées, None si aucune valeur)"""
+    dates = frame[DATE_COLUMN].dropna()
+    stats = {
+        'rows': int(len(frame)),
+        DATE_COLUMN: {'min': dates.min().isoformat() if len(dates) else None,
+                      'max': dates.max().isoformat() if len(dates) else None}
+    }
+    for column in DIMENSIONS:
+        values = sorted(frame[column].dropna().unique().tolist())
+        stats[column] = {'min': values[0] if values else None, 'max': values[-1] if values else None,
+                         'values': values, 'missing': int(frame[column].isna().sum())}
+    return stats
+
+
+def _merge_column_specs(specs, other):
+    """Types de colonnes communs à deux partitions (entier + flottant -> flottant)"""
+    if [spec['name'] for spec in specs] != [spec['name'] for spec in other]:
+        raise ValueError("Colonnes différentes entre partitions")
+    merged = []
+    for spec, spec_other in zip(specs, other):
+        if spec == spec_other:
+            merged.append(spec)
+        elif 'category' in (spec['dtype'], spec_other['dtype']):
+            # Les codes ne sont valables que pour une liste de catégories commune
+            raise ValueError(f"Catégories différentes entre partitions pour {spec['name']}")
+        else:
+            merged.append({'name': spec['name'],
+                           'dtype': str(np.result_type(np.dtype(spec['dtype']), np.dtype(spec_other['dtype'])))})
+    return merged
+
+
+def month_groups(dates):
+    """(nom de partition, positions triées) par mois de dates, puis les dates manquantes"""
+    month_index = MonthIndex(dates)
+    groups = [(str(month), month_index.rows([m])) for m, month in enumerate(month_index.months)]
+    groups.append((UNDATED, month_index.undated_rows()))
+    return [(name, np.sort(rows)) for name, rows in groups if len(rows)]
+
+
+def month_chunks(dataset):
+    """(nom, lignes) de dataset par mois de dataset['orderDate'], à passer à write_partitions"""
+    for name, rows in month_groups(dataset[DATE_COLUMN]):
+        yield name, dataset.take(rows)
+
+
+@contextmanager
+def rebuild_lock(directory):
+    """
+    Verrou exclusif (fcntl) entre processus autour d'une reconstruction des partitions
+
+    Sans fcntl (Windows), aucun verrou : chaque build reste isolé dans son sous-répertoire.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    if not FCNTL_AVAILABLE:
+        yield
+        return
+    with open(directory / LOCK_NAME, 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _prune_builds(directory, keep):
+    """Supprime les builds non référencés (et les fichiers du format 1, à la racine)"""
+    for path in directory.iterdir():
+        if path.is_dir() and path.name.startswith(BUILD_PREFIX) and path.name not in keep:
+            shutil.rmtree(path, ignore_errors=True)
+        elif path.is_file() and path.suffix == '.npz':
+            path.unlink()
+
+
+def write_partitions(chunks, directory, fingerprint=None):
+    """
+    Écrit une partition par (nom, DataFrame) de chunks (voir month_chunks)
+
+    Les fichiers sont écrits dans un nouveau sous-répertoire build-* et le manifeste est
+    remplacé en dernier (os.replace) : un lecteur voit l'ancien build ou le nouveau, jamais
+    un mélange, et une écriture interrompue laisse les anciennes partitions considérées
+    comme périmées. Le build précédent est gardé pour les workers qui l'ont déjà ouvert ;
+    les plus anciens sont supprimés. À appeler sous rebuild_lock entre processus.
+
+    Returns:
+        manifeste (dict)
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    previous = read_manifest(directory)
+    build = f"{BUILD_PREFIX}{datetime.now():%Y%m%d-%H%M%S-%f}-{os.getpid()}"
+    (directory / build).mkdir()
+
+    partitions, columns, rows = [], [], 0
+    for name, frame in chunks:
+        arrays = {INDEX_COLUMN: frame.index.to_numpy()}
+        for column in frame.columns:
+            values = frame[column]
+            arrays[column] = (values.cat.codes.to_numpy() if isinstance(values.dtype, pd.CategoricalDtype)
+                              else values.to_numpy())
+        file_name = f"{build}/{name}.npz"
+        np.savez(directory / file_name, **arrays)
+        partitions.append({'name': name, 'file': file_name, **_partition_stats(frame)})
+        specs = [_column_spec(column, frame[column]) for column in frame.columns]
+        columns = _merge_column_specs(columns, specs) if partitions[1:] else specs
+        rows += len(frame)
+
+    manifest = {
+        'version': LAYOUT_VERSION,
+        'source_fingerprint': fingerprint,
+        'built_at': datetime.now().isoformat(timespec='seconds'),
+        'build': build,
+        'rows': rows,
+        'columns': columns,
+        'partitions': partitions
+    }
+    tmp_path = directory / f"{MANIFEST_NAME}.{os.getpid()}.tmp"
+    tmp_path.write_text(json.dumps(manifest, indent=2, ensure_ascii=False))
+    os.replace(tmp_path, directory / MANIFEST_NAME)
+
+    _prune_builds(directory, keep={build, (previous or {}).get('build')})
+    return manifest
+
+
+def partition_fingerprint(cleaned_dir):
+    """Empreinte des CSV nettoyés dont dépend full_dataset"""
+    from feature_store import source_fingerprint
+    return source_fingerprint(cleaned_dir, SOURCE_FILES)
+
+
+def read_manifest(directory):
+    """Lit le manifeste des partitions (None si absent)"""
+    path = Path(directory) / MANIFEST_NAME
+    if not path.exists():
+        return None
+    return json.loads(path.read_text())
+
+
+def partitions_fresh(directory, cleaned_dir):
+    """True si les partitions de directory correspondent aux CSV nettoyés actuels"""
+    manifest = read_manifest(directory)
+    return (manifest is not None and manifest.get('version') == LAYOUT_VERSION
+            and manifest.get('source_fingerprint') == partition_fingerprint(cleaned_dir))
+
+
+def may_match(partition, state):
+    """False si les statistiques de la partition excluent toute ligne retenue par state (FilterState)"""
+    dates = partition[DATE_COLUMN]
+    if state.start is not None or state.end is not None:
+        # Lignes sans date : jamais retenues par un filtre de dates
+        if dates['min'] is None:
+            return False
+        if state.start is not None and pd.Timestamp(dates['max']) < state.start:
+            return False
+        if state.end is not None and pd.Timestamp(dates['min']) > state.end:
+            return False
+    for column, attr in DIMENSIONS.items():
+        selected = getattr(state, attr)
+        if selected is not None and selected.isdisjoint(partition[column]['values']):
+            return False
+    return True
+
+
+def covers(partition, state):
+    """True si state retient toutes les lignes de la partition (pas de refiltrage)"""
+    dates = partition[DATE_COLUMN]
+    if state.start is not None or state.end is not None:
+        if partition['name'] == UNDATED:
+            return False
+        if state.start is not None and pd.Timestamp(dates['min']) < state.start:
+            return False
+        if state.end is not None and pd.Timestamp(dates['max']) > state.end:
+            return False
+    for column, attr in DIMENSIONS.items():
+        selected = getattr(state, attr)
+        if selected is None:
+            continue
+        # Une valeur manquante n'est jamais retenue par un filtre de valeurs
+        if partition[column]['missing'] or not selected.issuperset(partition[column]['values']):
+            return False
+    return True
+
+
+class PartitionedDataset:
+    """
+    Partitions mensuelles d'un répertoire, chargées à la demande
+
+    Args:
+        directory: répertoire écrit par write_partitions
+        max_loaded: nombre de partitions gardées en mémoire (LRU)
+    """
+
+    def __init__(self, directory, max_loaded=DEFAULT_MAX_LOADED):
+        self.directory = Path(directory)
+        self.max_loaded = max_loaded
+        self.manifest = read_manifest(self.directory)
+        if self.manifest is None:
+            raise FileNotFoundError(f"Pas de manifeste de partitions dans {self.directory}")
+        self.partitions = self.manifest['partitions']
+        self.dtypes = {
+            spec['name']: pd.CategoricalDtype(spec['categories']) if spec['dtype'] == 'category'
+            else np.dtype(spec['dtype'])
+            for spec in self.manifest['columns']
+        }
+        self._loaded = OrderedDict()
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    def __len__(self):
+        return self.manifest['rows']
+
+    def _read(self, partition):
+        with np.load(self.directory / partition['file'], allow_pickle=False) as arrays:
+            columns = {}
+            for name, dtype in self.dtypes.items():
+                if isinstance(dtype, pd.CategoricalDtype):
+                    columns[name] = pd.Categorical.from_codes(arrays[name], dtype=dtype)
+                else:
+                    columns[name] = arrays[name]
+            index = pd.Index(arrays[INDEX_COLUMN])
+        return pd.DataFrame(columns, index=index)
+
+    def load(self, partition):
+        """DataFrame d'une partition (lue sur disque si elle n'est pas en mémoire)"""
+        name = partition['name']
+        with self._lock:
+            frame = self._loaded.get(name)
+            if frame is not None:
+                self._loaded.move_to_end(name)
+                return frame
+        frame = self._read(partition)
+        with self._lock:
+            self.loads += 1
+            self._loaded[name] = frame
+            self._loaded.move_to_end(name)
+            while len(self._loaded) > self.max_loaded:
+                self._loaded.popitem(last=False)
+        return frame
+
+    def loaded(self):
+        """Noms des partitions en mémoire"""
+        with self._lock:
+            return list(self._loaded)
+
+    def memory_usage(self):
+        with self._lock:
+            frames = list(self._loaded.values())
+        return int(sum(frame.memory_usage(deep=True).sum() for frame in frames))
+
+    def empty(self):
+        return pd.DataFrame({name: pd.Series(dtype=dtype) for name, dtype in self.dtypes.items()})
+
+    def filter(self, state, stats=None):
+        """
+        Lignes retenues par state (FilterState), lues dans les seules partitions compatibles
+
+        Args:
+            stats: dict optionnel complété avec 'rows_scanned' (lignes refiltrées),
+                'partitions_read' et 'partitions_pruned'
+        """
+        selected = [partition for partition in self.partitions if may_match(partition, state)]
+        frames, scanned = [], 0
+        for partition in selected:
+            frame = self.load(partition)
+            if not covers(partition, state):
+                scanned += len(frame)
+                frame = frame.take(filter_positions(frame, state))
+            frames.append(frame)
+        if stats is not None:
+            stats['rows_scanned'] = scanned
+            stats['partitions_read'] = len(selected)
+            stats['partitions_pruned'] = len(self.partitions) - len(selected)
+        return pd.concat(frames) if frames else self.empty()
+
+    def scan(self):
+        """
+        (partition, DataFrame) de chaque partition, lues une à une
+
+        Les partitions déjà en mémoire sont réutilisées ; les autres ne sont pas ajoutées
+        au LRU, qu'un parcours complet viderait des mois consultés par les filtres.
+        """
+        for partition in self.partitions:
+            with self._lock:
+                frame = self._loaded.get(partition['name'])
+            yield partition, frame if frame is not None else self._read(partition)
+
+    def select(self, column, values, stats=None):
+        """
+        Lignes dont column est dans values, partition par partition (seules ces lignes sont gardées)
+
+        Args:
+            stats: dict optionnel complété avec 'rows_scanned'
+        """
+        values = list(values)
+        frames, scanned = [], 0
+        for _, frame in self.scan():
+            scanned += len(frame)
+            frames.append(frame[frame[column].isin(values)])
+        if stats is not None:
+            stats['rows_scanned'] = scanned
+        return pd.concat(frames) if frames else self.empty()
+
+    def month_index(self):
+        """MonthIndex sans positions de lignes, depuis les bornes de dates du manifeste"""
+        return MonthIndex.from_bounds({
+            pd.Period(partition['name'], 'M'): (partition[DATE_COLUMN]['min'], partition[DATE_COLUMN]['max'])
+            for partition in self.partitions if partition['name'] != UNDATED
+        })
+
+    def frame(self):
+        """Toutes les partitions en un seul DataFrame (sans passer par le LRU), pour les scripts"""
+        frames = [self._read(partition) for partition in self.partitions]
+        return pd.concat(frames) if frames else self.empty()
+
+    def filter_options(self):
+        """Pays, catégories et bornes de dates, lus dans le manifeste (aucune partition chargée)"""
+        options = {}
+        for column, attr in DIMENSIONS.items():
+            options[attr] = sorted(set().union(*(partition[column]['values'] for partition in self.partitions)))
+        dated = [partition[DATE_COLUMN] for partition in self.partitions if partition[DATE_COLUMN]['min'] is not None]
+        options['min_date'] = min((pd.Timestamp(d['min']) for d in dated), default=pd.NaT)
+        options['max_date'] = max((pd.Timestamp(d['max']) for d in dated), default=pd.NaT)
+        return options
+
+
+def main():
+    """(Re)construit les partitions mensuelles de full_dataset"""
+    from data_model import DataModel
+
+    parser = argparse.ArgumentParser(description="Partitions mensuelles de full_dataset")
+    parser.add_argument('--cleaned-dir', default=str(CLEANED_DIR), help="répertoire des CSV nettoyés")
+    parser.add_argument('--force', action='store_true', help="réécrit les partitions même si elles sont à jour")
+    args = parser.parse_args()
+
+    print("\n" + "="*60)
+    print("🗂️  PARTITIONS MENSUELLES")
+    print("="*60 + "\n")
+
+    directory = partitions_dir(args.cleaned_dir)
+    fresh = partitions_fresh(directory, args.cleaned_dir)
+    # Ouvre les partitions (réécrites si elles sont absentes ou périmées)
+    model = DataModel(args.cleaned_dir, partitioned=True)
+    if args.force and fresh:
+        with rebuild_lock(directory):
+            model.write_partitions(directory)
+    elif fresh:
+        print("   ✅ Partitions à jour (--force pour les réécrire)")
+    manifest = read_manifest(directory)
+    size = sum(path.stat().st_size for path in (directory / manifest['build']).glob("*.npz"))
+
+    print(f"\n   ✅ {len(manifest['partitions'])} partitions, {manifest['rows']:,} lignes")
+    print(f"   💾 {directory / manifest['build']} ({size / 1e6:.1f} Mo, version {manifest['version']})")
+    print()
+
+
+if __name__ == "__main__":
+    main()
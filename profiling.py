@@ -0,0 +1,243 @@
+"""
+Profilage par échantillonnage des requêtes en production (opt-in : DASHBOARD_PROFILE=1)
+Un thread relève la pile d'appels des requêtes en cours à intervalle régulier ; à la
+fin de la requête, le profil est gardé si elle est tirée au sort ou plus lente que le
+seuil, et écrit au format « collapsed stacks » (flamegraph.pl, speedscope, inferno)
+"""
+
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from flask import g, request
+
+from cache_backend import make_key
+from compute_pool import delegated_threads
+
+DEFAULT_PROFILE_DIR = Path("profiles")
+DEFAULT_SAMPLE_RATE = 0.01
+DEFAULT_SLOW_MS = 1000
+DEFAULT_INTERVAL_MS = 10
+DEFAULT_MAX_FILES = 500
+
+# Fichiers statiques : jamais profilés
+SKIPPED_PREFIXES = ('/assets/', '/_dash-component-suites/', '/_favicon.ico', '/metrics')
+
+SITE_PACKAGES = f"site-packages{os.sep}"
+
+
+def frame_label(code):
+    """fonction (fichier:ligne) avec un chemin court (projet ou paquet)"""
+    filename = code.co_filename
+    if SITE_PACKAGES in filename:
+        filename = filename.split(SITE_PACKAGES, 1)[1]
+    else:
+        filename = os.path.relpath(filename) if os.path.isabs(filename) else filename
+        if filename.startswith('..'):
+            filename = os.path.basename(code.co_filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+def collapse_stack(frame, root):
+    """Pile de la racine vers la feuille, au format collapsed (séparée par ';')"""
+    labels = []
+    while frame is not None:
+        labels.append(frame_label(frame.f_code))
+        frame = frame.f_back
+    labels.append(root)
+    return ';'.join(reversed(labels))
+
+
+class ProfileSession:
+    """Échantillons d'une requête en cours (thread de la requête + threads du pool à son service)"""
+
+    def __init__(self, thread_id):
+        self.thread_id = thread_id
+        self.started = time.perf_counter()
+        self.stacks = Counter()
+        self.samples = 0
+
+
+class StackSampler:
+    """
+    Thread d'échantillonnage partagé par toutes les requêtes du worker
+
+    Il ne tourne que si au moins une requête est en cours ; créé paresseusement
+    (et recréé après un fork) pour ne pas exister dans le processus maître.
+    """
+
+    def __init__(self, interval=DEFAULT_INTERVAL_MS / 1000):
+        self.interval = interval
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def _ensure_thread(self):
+        if self._thread is None or self._pid != os.getpid():
+            with self._lock:
+                if self._thread is None or self._pid != os.getpid():
+                    self._pid = os.getpid()
+                    self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+                    self._thread.start()
+
+    def start(self, thread_id):
+        self._ensure_thread()
+        session = ProfileSession(thread_id)
+        with self._lock:
+            self._sessions[thread_id] = session
+        self._wakeup.set()
+        return session
+
+    def stop(self, session):
+        with self._lock:
+            self._sessions.pop(session.thread_id, None)
+        return time.perf_counter() - session.started
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            time.sleep(self.interval)
+            with self._lock:
+                sessions = list(self._sessions.values())
+                if not sessions:
+                    self._wakeup.clear()
+                    continue
+            self.sample(sessions)
+
+    def sample(self, sessions):
+        frames = sys._current_frames()
+        for session in sessions:
+            frame = frames.get(session.thread_id)
+            if frame is not None:
+                session.stacks[collapse_stack(frame, 'request')] += 1
+            for ident in delegated_threads(session.thread_id):
+                frame = frames.get(ident)
+                if frame is not None:
+                    session.stacks[collapse_stack(frame, 'compute-pool')] += 1
+            session.samples += 1
+
+
+class RequestProfiler:
+    """
+    Profils des requêtes tirées au sort ou lentes
+
+    Args:
+        directory: répertoire des profils (<horodatage>_<callback>_<clé filtres>_<ms>ms.folded
+            et .json voisin : callback, entrées, durée, motif)
+        sample_rate: part des requêtes dont le profil est gardé (0 à 1)
+        slow_ms: toute requête plus lente est gardée
+        max_files: nombre de profils conservés (les plus anciens sont supprimés)
+    """
+
+    def __init__(self, directory=DEFAULT_PROFILE_DIR, sample_rate=DEFAULT_SAMPLE_RATE, slow_ms=DEFAULT_SLOW_MS,
+                 interval_ms=DEFAULT_INTERVAL_MS, max_files=DEFAULT_MAX_FILES):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.max_files = max_files
+        self.sampler = StackSampler(interval_ms / 1000)
+        self.written = 0
+
+    def describe_request(self, app):
+        """(identifiant du callback, clé des filtres, entrées) de la requête Dash courante"""
+        dispatch = app.config.routes_pathname_prefix + '_dash-update-component'
+        if request.path != dispatch:
+            return request.path.strip('/').replace('/', '-') or 'index', None, None
+
+        body = request.get_json(silent=True) or {}
+        callback = app.callback_map.get(body.get('output'), {}).get('callback')
+        callback_id = getattr(callback, '__name__', None) or body.get('output', 'callback').strip('.')[:40]
+        inputs = {
+            f"{item.get('id')}.{item.get('property')}": item.get('value')
+            for item in body.get('inputs', []) if isinstance(item, dict)
+        }
+        return callback_id, make_key(inputs)[:10], inputs
+
+    def save(self, session, elapsed_ms, reason, callback_id, filter_key, inputs):
+        stamp = time.strftime('%Y%m%d-%H%M%S') + f"-{int(time.time() * 1000) % 1000:03d}"
+        tag = re.sub(r'[^\w.-]+', '-', callback_id)
+        stem = f"{stamp}_{os.getpid()}_{tag}_{filter_key or 'nofilter'}_{elapsed_ms:.0f}ms"
+
+        lines = [f"{stack} {count}" for stack, count in session.stacks.most_common()]
+        (self.directory / f"{stem}.folded").write_text("\n".join(lines) + "\n")
+        (self.directory / f"{stem}.json").write_text(json.dumps({
+            'callback': callback_id,
+            'filter_key': filter_key,
+            'inputs': inputs,
+            'elapsed_ms': round(elapsed_ms, 1),
+            'reason': reason,
+            'samples': session.samples,
+            'interval_ms': self.sampler.interval * 1000,
+            'pid': os.getpid()
+        }, indent=2, default=str))
+
+        self.written += 1
+        if self.written % 50 == 0:
+            self.prune()
+
+    def prune(self):
+        """Garde les max_files profils les plus récents"""
+        profiles = sorted(self.directory.glob('*.folded'), key=lambda p: p.stat().st_mtime)
+        for path in profiles[:max(0, len(profiles) - self.max_files)]:
+            path.unlink(missing_ok=True)
+            path.with_suffix('.json').unlink(missing_ok=True)
+
+    def install(self, app):
+        """Profile chaque requête de app.server (hors fichiers statiques)"""
+        server = app.server
+
+        @server.before_request
+        def _start_profile():
+            if not request.path.startswith(SKIPPED_PREFIXES):
+                g.profile_session = self.sampler.start(threading.get_ident())
+
+        @server.teardown_request
+        def _stop_profile(exc):
+            session = g.pop('profile_session', None)
+            if session is None:
+                return
+            elapsed_ms = self.sampler.stop(session) * 1000
+
+            if elapsed_ms >= self.slow_ms:
+                reason = 'slow'
+            elif random.random() < self.sample_rate:
+                reason = 'sampled'
+            else:
+                return
+            if not session.stacks:
+                return
+            try:
+                self.save(session, elapsed_ms, reason, *self.describe_request(app))
+            except OSError as e:
+                print(f"⚠️  Profil non écrit : {e}")
+
+
+def create_profiler():
+    """
+    Crée le profileur si DASHBOARD_PROFILE=1
+
+    Réglages : DASHBOARD_PROFILE_RATE (part des requêtes gardées), DASHBOARD_PROFILE_SLOW_MS
+    (seuil des requêtes lentes), DASHBOARD_PROFILE_INTERVAL_MS (période d'échantillonnage),
+    DASHBOARD_PROFILE_DIR, DASHBOARD_PROFILE_MAX_FILES.
+
+    Returns:
+        RequestProfiler ou None
+    """
+    if os.environ.get('DASHBOARD_PROFILE', '0') != '1':
+        return None
+    return RequestProfiler(
+        directory=os.environ.get('DASHBOARD_PROFILE_DIR', DEFAULT_PROFILE_DIR),
+        sample_rate=float(os.environ.get('DASHBOARD_PROFILE_RATE', DEFAULT_SAMPLE_RATE)),
+        slow_ms=float(os.environ.get('DASHBOARD_PROFILE_SLOW_MS', DEFAULT_SLOW_MS)),
+        interval_ms=float(os.environ.get('DASHBOARD_PROFILE_INTERVAL_MS', DEFAULT_INTERVAL_MS)),
+        max_files=int(os.environ.get('DASHBOARD_PROFILE_MAX_FILES', DEFAULT_MAX_FILES))
+    )
@@ -0,0 +1,203 @@
+"""
+Regroupement des changements de filtres rapides (debounce + annulation)
+Quand un même onglet envoie un nouvel état de filtres, les calculs
+en attente ou en cours pour les états précédents sont abandonnés
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from dash import ClientsideFunction, Input, Output, State, dcc
+from dash.exceptions import PreventUpdate
+
+from session_state import DEFAULT_TTL_SECONDS
+
+TAB_ID_STORE = 'tab-id'
+DEFAULT_DEBOUNCE_MS = 150
+
+
+def tab_id_store():
+    """
+    Store de l'identifiant d'onglet (à placer dans le layout)
+
+    Rempli dans le navigateur (assets/tab_id.js) : le layout est sérialisé une seule fois
+    pour tous les clients, il ne peut pas porter l'identifiant lui-même. Deux onglets d'un
+    même navigateur, ou deux utilisateurs derrière la même IP, ont des identifiants distincts.
+    """
+    return dcc.Store(id=TAB_ID_STORE, storage_type='memory')
+
+
+def register_tab_id_callback(app):
+    """Tire l'identifiant d'onglet au chargement de la page (callback clientside)"""
+
+    app.clientside_callback(
+        ClientsideFunction(namespace='northwind', function_name='tabId'),
+        Output(TAB_ID_STORE, 'data'),
+        Input(TAB_ID_STORE, 'modified_timestamp'),
+        State(TAB_ID_STORE, 'data')
+    )
+
+
+class MemoryGenerationStore:
+    """Dernière génération par onglet, dans le processus courant"""
+
+    def __init__(self, max_sessions=10_000):
+        self._latest = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_sessions = max_sessions
+
+    def set(self, key, generation):
+        with self._lock:
+            self._latest[key] = generation
+            self._latest.move_to_end(key)
+            while len(self._latest) > self.max_sessions:
+                self._latest.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            return self._latest.get(key)
+
+
+class FileGenerationStore:
+    """
+    Dernière génération par onglet, partagée entre les workers d'une même machine
+
+    Un petit fichier par onglet dans un répertoire local (tmpfs /dev/shm si disponible) :
+    une requête traitée par un worker gunicorn peut ainsi être annulée par une requête
+    plus récente arrivée sur un autre worker. Les fichiers des onglets inactifs depuis
+    ttl secondes sont supprimés (au plus une passe par prune_interval et par worker).
+    """
+
+    def __init__(self, directory=None, ttl=DEFAULT_TTL_SECONDS, prune_interval=60):
+        if directory is None:
+            base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+            directory = Path(base) / 'northwind-coalescing'
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.prune_interval = prune_interval
+        self._last_prune = time.monotonic()
+        self._prune_lock = threading.Lock()
+
+    def _path(self, key):
+        return self.directory / hashlib.sha1(key.encode()).hexdigest()
+
+    def set(self, key, generation):
+        path = self._path(key)
+        tmp = path.with_suffix(f'.{os.getpid()}.{threading.get_ident()}')
+        tmp.write_text(str(generation))
+        os.replace(tmp, path)
+        self._maybe_prune()
+
+    def _maybe_prune(self):
+        now = time.monotonic()
+        if now - self._last_prune < self.prune_interval or not self._prune_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_prune = now
+            self.prune()
+        finally:
+            self._prune_lock.release()
+
+    def prune(self):
+        """Supprime les fichiers non modifiés depuis ttl secondes ; retourne leur nombre"""
+        cutoff = time.time() - self.ttl
+        removed = 0
+        for path in self.directory.iterdir():
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    removed += 1
+            except FileNotFoundError:
+                pass  # supprimé entre-temps par un autre worker
+        return removed
+
+    def __len__(self):
+        return sum(1 for _ in self.directory.iterdir())
+
+    def get(self, key):
+        try:
+            return int(self._path(key).read_text())
+        except (FileNotFoundError, ValueError):
+            return None
+
+
+class CoalescingToken:
+    """Jeton d'une requête : onglet, canal, génération et rafale en cours"""
+
+    __slots__ = ('key', 'generation', 'burst')
+
+    def __init__(self, key, generation, burst=False):
+        self.key = key
+        self.generation = generation
+        self.burst = burst
+
+
+class FilterCoalescer:
+    """
+    Debounce et annulation des calculs pour les états de filtres obsolètes
+
+    Usage dans un callback (tab_id : valeur du Store TAB_ID_STORE) :
+        token = coalescer.begin('dashboard', tab_id)
+        coalescer.settle(token)       # attend la fin de la rafale
+        ...calcul...
+        coalescer.check(token)        # abandonne si un état plus récent est arrivé
+    """
+
+    def __init__(self, debounce_ms=DEFAULT_DEBOUNCE_MS, store=None):
+        self.debounce = max(debounce_ms, 0) / 1000
+        self.store = store if store is not None else MemoryGenerationStore()
+        self.cancelled = 0
+
+    def begin(self, channel, tab_id):
+        """
+        Enregistre un nouvel état de filtres pour l'onglet (supplante les précédents)
+
+        L'état est dans une rafale si le précédent de l'onglet date de moins d'une
+        fenêtre de debounce (sa requête est encore en attente ou en calcul).
+        """
+        key = f"{tab_id}:{channel}"
+        previous = self.store.get(key)
+        generation = time.time_ns()
+        burst = previous is not None and generation - previous < self.debounce * 1e9
+        token = CoalescingToken(key, generation, burst)
+        self.store.set(key, token.generation)
+        return token
+
+    def is_current(self, token):
+        latest = self.store.get(token.key)
+        return latest is None or latest <= token.generation
+
+    def check(self, token):
+        """Lève PreventUpdate (réponse 204) si un état plus récent a été reçu"""
+        if not self.is_current(token):
+            self.cancelled += 1
+            raise PreventUpdate
+
+    def settle(self, token):
+        """
+        Dans une rafale, attend la fenêtre de debounce puis vérifie que l'état est toujours
+        le dernier ; un changement isolé (chargement initial compris) part sans attendre
+        """
+        if self.debounce and token.burst:
+            time.sleep(self.debounce)
+        self.check(token)
+
+
+def create_coalescer():
+    """
+    Crée le coalesceur à partir de DASHBOARD_DEBOUNCE_MS (store fichier partagé entre workers,
+    fichiers des onglets inactifs depuis DASHBOARD_SESSION_TTL secondes supprimés)
+    """
+    debounce_ms = int(os.environ.get('DASHBOARD_DEBOUNCE_MS', DEFAULT_DEBOUNCE_MS))
+    ttl = int(os.environ.get('DASHBOARD_SESSION_TTL', DEFAULT_TTL_SECONDS))
+    try:
+        store = FileGenerationStore(os.environ.get('DASHBOARD_COALESCING_DIR'), ttl=ttl)
+    except OSError:
+        store = MemoryGenerationStore()
+    return FilterCoalescer(debounce_ms=debounce_ms, store=store)
@@ -0,0 +1,126 @@
+"""
+État serveur par session : dernier sous-ensemble filtré du dashboard
+Quand les nouveaux filtres affinent les précédents (période plus courte, moins de pays
+ou de catégories), seul le sous-ensemble déjà filtré est refiltré
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_MAX_SESSIONS = 256
+DEFAULT_TTL_SECONDS = 15 * 60
+
+
+class FilterState:
+    """État de filtres normalisé (dates en Timestamp, listes en frozenset)"""
+
+    __slots__ = ('start', 'end', 'countries', 'categories')
+
+    def __init__(self, start_date=None, end_date=None, countries=None, categories=None):
+        self.start = pd.to_datetime(start_date) if start_date else None
+        self.end = pd.to_datetime(end_date) if end_date else None
+        # Liste vide = pas de filtre (comme dans DataModel.get_filtered_data)
+        self.countries = frozenset(countries) if countries else None
+        self.categories = frozenset(categories) if categories else None
+
+    def refines(self, previous):
+        """True si toutes les lignes retenues par self le sont aussi par previous"""
+        if previous.start is not None and (self.start is None or self.start < previous.start):
+            return False
+        if previous.end is not None and (self.end is None or self.end > previous.end):
+            return False
+        if previous.countries is not None and (self.countries is None or not self.countries <= previous.countries):
+            return False
+        if previous.categories is not None and (self.categories is None or not self.categories <= previous.categories):
+            return False
+        return True
+
+
+class SessionFilterCache:
+    """
+    Dernier état de filtres et positions des lignes retenues, par session
+
+    Seules les positions (int32) sont conservées, pas les DataFrames : une session
+    coûte au plus 4 octets par ligne de full_dataset. Les sessions sont évincées
+    par LRU au-delà de max_sessions et après ttl secondes d'inactivité.
+    """
+
+    def __init__(self, max_sessions=DEFAULT_MAX_SESSIONS, ttl=DEFAULT_TTL_SECONDS):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, session_id):
+        """Retourne (FilterState, positions) de la session, ou None si absente/expirée"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return None
+            state, positions, last_seen = entry
+            if now - last_seen > self.ttl:
+                del self._entries[session_id]
+                return None
+            self._entries.move_to_end(session_id)
+            return state, positions
+
+    def set(self, session_id, state, positions):
+        now = time.monotonic()
+        with self._lock:
+            self._entries[session_id] = (state, positions, now)
+            self._entries.move_to_end(session_id)
+            self._evict(now)
+
+    def _evict(self, now):
+        while len(self._entries) > self.max_sessions:
+            self._entries.popitem(last=False)
+        # Les plus anciennes sont en tête : on s'arrête à la première encore valide
+        while self._entries:
+            _, (_, _, last_seen) = next(iter(self._entries.items()))
+            if now - last_seen <= self.ttl:
+                break
+            self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def filter_positions(dataset, state, positions=None):
+    """
+    Positions des lignes de dataset retenues par state
+
+    Args:
+        positions: sous-ensemble de départ (None = toutes les lignes)
+    """
+    if positions is None:
+        positions = np.arange(len(dataset), dtype=np.int32)
+
+    mask = np.ones(len(positions), dtype=bool)
+    if state.start is not None or state.end is not None:
+        dates = dataset['orderDate'].to_numpy()[positions]
+        if state.start is not None:
+            mask &= dates >= state.start.to_datetime64()
+        if state.end is not None:
+            mask &= dates <= state.end.to_datetime64()
+    if state.countries is not None:
+        mask &= dataset['country'].iloc[positions].isin(state.countries).to_numpy()
+    if state.categories is not None:
+        mask &= dataset['categoryName'].iloc[positions].isin(state.categories).to_numpy()
+
+    return positions[mask]
+
+
+def create_session_cache():
+    """Cache de sessions configuré par DASHBOARD_SESSION_MAX et DASHBOARD_SESSION_TTL"""
+    return SessionFilterCache(
+        max_sessions=int(os.environ.get('DASHBOARD_SESSION_MAX', DEFAULT_MAX_SESSIONS)),
+        ttl=int(os.environ.get('DASHBOARD_SESSION_TTL', DEFAULT_TTL_SECONDS))
+    )
@@ -0,0 +1,177 @@
+"""
+Chronologie du démarrage d'un worker (imports, chargement des données, modèle, layout, callbacks)
+Chaque phase est mesurée (durée, variation de la mémoire résidente) puis la chronologie
+est affichée en fin de démarrage, en tableau ou en JSON (DASHBOARD_STARTUP_TIMELINE)
+
+Module volontairement sans dépendance : il est importé avant dash et pandas pour
+mesurer leurs imports.
+"""
+
+import json
+import os
+import time
+from contextlib import contextmanager
+
+
+def resident_memory_bytes():
+    """RSS du processus courant (/proc sous Linux, pic RSS sinon)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def process_memory(pid='self'):
+    """
+    Mémoire d'un processus selon /proc/<pid>/smaps_rollup (Linux ≥ 4.14), en octets
+
+    - rss : pages résidentes, y compris celles partagées avec le master gunicorn (preload)
+    - uss : pages propres au processus (Private_*), libérées à sa mort
+    - pss : pages propres + part des pages partagées (somme exacte entre workers)
+    - shared : pages partagées avec d'autres processus
+
+    Returns:
+        dict, ou None si smaps_rollup n'est pas disponible
+    """
+    fields = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == 'kB':
+                    fields[parts[0].rstrip(':')] = int(parts[1]) * 1024
+    except (OSError, ValueError):
+        return None
+    if 'Rss' not in fields:
+        return None
+    return {
+        'rss': fields['Rss'],
+        'uss': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0),
+        'pss': fields.get('Pss', 0),
+        'shared': fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0)
+    }
+
+
+class StartupTimeline:
+    """
+    Phases du démarrage, mesurées de deux façons :
+
+    - lap(nom) clôt une phase de premier niveau : elle couvre tout ce qui s'est passé
+      depuis le lap précédent (ou start()), sans réindenter le code de app.py
+    - with phase(nom) mesure un bloc, imbriqué dans la phase de premier niveau en cours
+      (ex: lecture de chaque CSV dans DataModel)
+
+    Hors de start()/finish(), les deux sont sans effet (DataModel utilisé par un script).
+    """
+
+    def __init__(self):
+        self.active = False
+        self.entries = []
+        self._stack = []
+        self._origin = None
+        self._last = None
+        self._last_rss = None
+        self.total = None
+
+    def start(self):
+        self.active = True
+        self.entries = []
+        self._origin = self._last = time.perf_counter()
+        self._last_rss = resident_memory_bytes()
+
+    def _record(self, name, depth, started, rss_before, status='ok'):
+        now = time.perf_counter()
+        rss = resident_memory_bytes()
+        self.entries.append({
+            'phase': name,
+            'depth': depth,
+            'start_ms': round((started - self._origin) * 1000, 1),
+            'duration_ms': round((now - started) * 1000, 1),
+            'rss_delta_mb': round((rss - rss_before) / 1024**2, 1),
+            'status': status
+        })
+        return now, rss
+
+    def lap(self, name):
+        if not self.active:
+            return
+        self._last, self._last_rss = self._record(name, 0, self._last, self._last_rss)
+
+    @contextmanager
+    def phase(self, name):
+        if not self.active:
+            yield
+            return
+        depth = len(self._stack) + 1
+        self._stack.append(name)
+        started, rss_before = time.perf_counter(), resident_memory_bytes()
+        status = 'ok'
+        try:
+            yield
+        except BaseException:
+            status = 'error'
+            raise
+        finally:
+            self._stack.pop()
+            self._record(name, depth, started, rss_before, status)
+
+    def ordered_entries(self):
+        """Phases dans l'ordre chronologique, chaque phase avant ses sous-phases"""
+        return sorted(self.entries, key=lambda entry: (entry['start_ms'], entry['depth']))
+
+    def as_dict(self):
+        return {
+            'pid': os.getpid(),
+            'total_ms': self.total,
+            'rss_mb': round(resident_memory_bytes() / 1024**2, 1),
+            'phases': self.ordered_entries()
+        }
+
+    def finish(self, mode=None):
+        """
+        Termine la chronologie et l'affiche
+
+        Args:
+            mode: 'text' (tableau), 'json' (une ligne) ou 'off' ; défaut DASHBOARD_STARTUP_TIMELINE
+        """
+        if not self.active:
+            return
+        self.total = round((time.perf_counter() - self._origin) * 1000, 1)
+        self.active = False
+
+        mode = mode or os.environ.get('DASHBOARD_STARTUP_TIMELINE', 'text')
+        if mode == 'json':
+            print(json.dumps({'startup': self.as_dict()}), flush=True)
+        elif mode != 'off':
+            self.print_table()
+
+    def print_table(self):
+        summary = self.as_dict()
+        widest = max((entry['duration_ms'] for entry in self.entries if entry['depth'] == 0), default=1) or 1
+
+        print("\n" + "="*60)
+        print(f"⏱️  DÉMARRAGE DU WORKER {summary['pid']} : {self.total / 1000:.2f} s, RSS {summary['rss_mb']:.0f} Mo")
+        print("="*60)
+        print(f"   {'phase':<30} {'début':>8} {'durée':>9} {'Δ RSS':>9}")
+        for entry in summary['phases']:
+            name = '  ' * entry['depth'] + entry['phase'] + (' ❌' if entry['status'] != 'ok' else '')
+            bar = '█' * int(round(12 * entry['duration_ms'] / widest)) if entry['depth'] == 0 else ''
+            print(f"   {name:<30} {entry['start_ms']:>6.0f}ms {entry['duration_ms']:>7.0f}ms "
+                  f"{entry['rss_delta_mb']:>+7.1f}Mo {bar}")
+        print("="*60 + "\n", flush=True)
+
+    def collector(self):
+        """Durées du dernier démarrage, au format des collecteurs de instrumentation.py"""
+        return [
+            ('dashboard_startup_phase_seconds', 'gauge', "Durée des phases de démarrage du worker",
+             [({'phase': entry['phase']}, entry['duration_ms'] / 1000)
+              for entry in self.entries if entry['depth'] == 0]),
+            ('dashboard_startup_seconds', 'gauge', "Durée totale du démarrage du worker",
+             [({}, (self.total or 0) / 1000)])
+        ]
+
+
+# Chronologie du processus courant (démarrée par app.py)
+timeline = StartupTimeline()
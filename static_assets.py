@@ -0,0 +1,343 @@
+"""
+Assets statiques auto-hébergés (Bootstrap, Font Awesome, CSS personnalisé)
+Les feuilles de style et leurs polices sont committées dans assets/vendor/, minifiées
+et avec une empreinte de contenu dans le nom ; assets/vendor/manifest.json est lu par
+app.py au démarrage et assets/vendor/SHA256SUMS contient l'empreinte de chaque fichier
+
+Usage :
+  python static_assets.py                  vérifie assets/vendor/ hors ligne (build Docker)
+  python static_assets.py --fetch          télécharge depuis le CDN les feuilles manquantes
+  python static_assets.py --source fontawesome=node_modules/@fortawesome/fontawesome-free/css/all.min.css
+                                           vendorise depuis une copie locale de la distribution
+Les sources (CDN ou locales) sont contrôlées contre SOURCE_INTEGRITY avant d'être vendorisées.
+Code de sortie 1 si une feuille de style manque ou ne correspond plus à SHA256SUMS
+(sauf --allow-cdn) : le build Docker échoue au lieu de livrer une image dépendante des CDN
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import os
+import re
+import sys
+import urllib.request
+from pathlib import Path
+from urllib.parse import urljoin
+
+from flask import request
+
+from styles import CUSTOM_CSS
+
+VENDOR_DIR = Path("assets/vendor")
+MANIFEST_PATH = VENDOR_DIR / "manifest.json"
+CHECKSUMS_PATH = VENDOR_DIR / "SHA256SUMS"
+
+# Feuilles de style distantes (nom logique -> URL CDN), dans l'ordre d'inclusion.
+# Versions figées : l'URL sert aussi de repli quand la copie locale manque
+REMOTE_STYLESHEETS = {
+    'bootstrap': "https://cdn.jsdelivr.net/npm/bootstrap@5.3.5/dist/css/bootstrap.min.css",
+    'fontawesome': "https://cdn.jsdelivr.net/npm/@fortawesome/fontawesome-free@6.4.0/css/all.min.css"
+}
+
+# Empreintes SRI publiées des fichiers de distribution ci-dessus (avant minification)
+SOURCE_INTEGRITY = {
+    'bootstrap': "sha384-SgOJa3DmI69IUzQ2PVdRZhwQ+dy64/BUtbMJw1MZ8t5HZApcHrRKUc4W0kG879m7",
+    'fontawesome': "sha512-iecdLmaskl7CVkqkXNQ/ZH/XLlvWZOJyj7Yy7tcenmpD1ypASozpmT/E0iPtmFIB46ZmdtAc9eNBvH0H/ZpiBw=="
+}
+
+# Noms de fichiers avec empreinte (ex: bootstrap.3f2a9c1b0d.css) : servis avec un cache
+# long et exclus de l'inclusion automatique des assets par Dash
+FINGERPRINT_LENGTH = 10
+FINGERPRINTED_RE = r'\.[0-9a-f]{%d}\.(css|js|woff2?|ttf|eot|svg)$' % FINGERPRINT_LENGTH
+
+# Un an : le nom change avec le contenu, le navigateur n'a jamais à revalider
+LONG_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+CSS_URL_RE = re.compile(r'url\(\s*[\'"]?([^\'")]+)[\'"]?\s*\)')
+
+
+def minify_css(css):
+    """Minification simple : commentaires, espaces et points-virgules superflus"""
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};,>])\s*', r'\1', css)
+    css = re.sub(r':\s+', ':', css)
+    css = css.replace(';}', '}')
+    return css.strip()
+
+
+def custom_css_bytes():
+    """CSS personnalisé de styles.py, minifié"""
+    return minify_css(CUSTOM_CSS).encode('utf-8')
+
+
+def fingerprint_name(name, content):
+    """bootstrap.css + contenu -> bootstrap.<sha1[:10]>.css"""
+    stem, _, ext = name.rpartition('.')
+    digest = hashlib.sha1(content).hexdigest()[:FINGERPRINT_LENGTH]
+    return f"{stem}.{digest}.{ext}"
+
+
+def is_remote(location):
+    return location.startswith(('http://', 'https://'))
+
+
+def fetch(location):
+    """Contenu d'une URL (téléchargement) ou d'un fichier local"""
+    if is_remote(location):
+        print(f"   ⬇️  {location}")
+        with urllib.request.urlopen(location, timeout=30) as response:
+            return response.read()
+    print(f"   📄 {location}")
+    return Path(location).read_bytes()
+
+
+def resolve(base, reference):
+    """Cible d'un url(...) relatif à la feuille de style (URL ou chemin local)"""
+    reference = reference.split('?')[0].split('#')[0]
+    if is_remote(base):
+        return urljoin(base, reference)
+    return os.path.normpath(os.path.join(os.path.dirname(base), reference))
+
+
+def integrity(content, algorithm):
+    """Empreinte au format Subresource Integrity (ex: sha384-...)"""
+    return f"{algorithm}-{base64.b64encode(hashlib.new(algorithm, content).digest()).decode()}"
+
+
+def check_integrity(name, content):
+    """ValueError si la source ne correspond pas à l'empreinte publiée"""
+    expected = SOURCE_INTEGRITY[name]
+    actual = integrity(content, expected.split('-', 1)[0])
+    if actual != expected:
+        raise ValueError(f"empreinte inattendue pour {name} : {actual} (attendu {expected})")
+
+
+def write_fingerprinted(name, content, subdir=''):
+    """Écrit le fichier sous son nom avec empreinte et retourne son chemin relatif à VENDOR_DIR"""
+    relative = f"{subdir}/{fingerprint_name(name, content)}" if subdir else fingerprint_name(name, content)
+    path = VENDOR_DIR / relative
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+    return relative
+
+
+def vendor_stylesheet(name, location):
+    """
+    Vendorise une feuille de style (URL du CDN ou fichier local) et les fichiers
+    qu'elle référence (polices)
+
+    La source est contrôlée contre SOURCE_INTEGRITY ; les url(...) relatives sont
+    réécrites vers les copies locales avec empreinte.
+    """
+    content = fetch(location)
+    check_integrity(name, content)
+    css = content.decode('utf-8')
+    localized = {}
+
+    def localize(match):
+        reference = match.group(1)
+        if reference.startswith('data:'):
+            return match.group(0)
+        target = resolve(location, reference)
+        if target not in localized:
+            local = write_fingerprinted(target.rsplit('/', 1)[-1], fetch(target), subdir='webfonts')
+            localized[target] = f"url({local})"
+        return localized[target]
+
+    css = CSS_URL_RE.sub(localize, css)
+    css = re.sub(r'/\*# sourceMappingURL=.*?\*/', '', css)
+    return write_fingerprinted(f"{name}.css", minify_css(css).encode('utf-8'))
+
+
+def load_manifest(manifest_path=MANIFEST_PATH):
+    """Retourne {nom logique: chemin dans assets/vendor} ({} si le build n'a pas été lancé)"""
+    manifest_path = Path(manifest_path)
+    if not manifest_path.exists():
+        return {}
+    manifest = json.loads(manifest_path.read_text())
+    # Ignorer les entrées dont le fichier a disparu
+    manifest = {name: rel for name, rel in manifest.items() if (manifest_path.parent / rel).exists()}
+    # CSS personnalisé modifié dans styles.py depuis le dernier build : il repasse inline
+    if manifest.get('custom') != fingerprint_name('custom.css', custom_css_bytes()):
+        manifest.pop('custom', None)
+    return manifest
+
+
+def stylesheet_urls(manifest, assets_url='/assets'):
+    """
+    Feuilles de style à passer à dash.Dash(external_stylesheets=...)
+
+    Les copies locales sont utilisées quand elles existent, sinon l'URL du CDN.
+    Le CSS personnalisé n'y figure que s'il a été construit (sinon il reste inline).
+    """
+    urls = [
+        f"{assets_url}/vendor/{manifest[name]}" if name in manifest else url
+        for name, url in REMOTE_STYLESHEETS.items()
+    ]
+    if 'custom' in manifest:
+        urls.append(f"{assets_url}/vendor/{manifest['custom']}")
+    return urls
+
+
+def install_cache_headers(server, assets_url='/assets'):
+    """Cache long (immutable) pour les fichiers avec empreinte de assets/vendor"""
+    pattern = re.compile(FINGERPRINTED_RE)
+    prefix = f"{assets_url}/vendor/"
+
+    @server.after_request
+    def _long_cache(response):
+        if request.path.startswith(prefix) and pattern.search(request.path) and response.status_code in (200, 304):
+            response.headers['Cache-Control'] = LONG_CACHE_CONTROL
+        return response
+
+
+def sha256_file(path):
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+
+def load_checksums(checksums_path=CHECKSUMS_PATH):
+    """{chemin relatif à assets/vendor: sha256} (format de sha256sum)"""
+    checksums_path = Path(checksums_path)
+    if not checksums_path.exists():
+        return {}
+    checksums = {}
+    for line in checksums_path.read_text().splitlines():
+        if line.strip():
+            digest, relative = line.split(maxsplit=1)
+            checksums[relative.lstrip('*')] = digest
+    return checksums
+
+
+def vendored_files(relative):
+    """Une feuille de style vendorisée et les fichiers locaux qu'elle référence"""
+    css = (VENDOR_DIR / relative).read_text(encoding='utf-8')
+    references = [ref for ref in CSS_URL_RE.findall(css) if not ref.startswith('data:')]
+    return [relative] + sorted(set(references))
+
+
+def verify_stylesheet(relative, checksums):
+    """Liste des problèmes d'une feuille de style vendorisée ([] si intacte)"""
+    if not (VENDOR_DIR / relative).exists():
+        return [f"{relative} absent"]
+    problems = []
+    for file in vendored_files(relative):
+        path = VENDOR_DIR / file
+        if not path.exists():
+            problems.append(f"{file} absent")
+        elif file not in checksums:
+            problems.append(f"{file} absent de {CHECKSUMS_PATH.name}")
+        elif sha256_file(path) != checksums[file]:
+            problems.append(f"{file} modifié (empreinte différente de {CHECKSUMS_PATH.name})")
+    return problems
+
+
+def build(fetch_missing=False, refresh=False, sources=None):
+    """
+    Vérifie et complète assets/vendor/, réécrit le manifest et SHA256SUMS
+
+    Sans fetch_missing, refresh ni sources, aucun accès réseau : les feuilles déjà
+    vendorisées sont contrôlées contre SHA256SUMS et seul le CSS personnalisé est reconstruit.
+    Une feuille invalide non revendorisée garde ses empreintes d'origine (rien n'est
+    supprimé : restaurer le fichier suffit).
+    sources : {nom logique: chemin local du fichier de distribution}
+    Retourne (manifest, noms des feuilles invalides)
+    """
+    sources = sources or {}
+    VENDOR_DIR.mkdir(parents=True, exist_ok=True)
+    manifest = load_manifest()
+    checksums = load_checksums()
+    invalid = []
+
+    for name, url in REMOTE_STYLESHEETS.items():
+        if name in manifest and not refresh and name not in sources:
+            problems = verify_stylesheet(manifest[name], checksums)
+            if not problems:
+                print(f"   ✅ {name} vérifié ({manifest[name]})")
+                continue
+            for problem in problems:
+                print(f"   ❌ {name} : {problem}")
+            if name not in sources and not fetch_missing:
+                invalid.append(name)
+                continue
+            del manifest[name]
+        if name not in sources and not (fetch_missing or refresh):
+            manifest.pop(name, None)
+            print(f"   ❌ {name} non vendorisé (python static_assets.py --fetch ou --source {name}=...)")
+            continue
+        try:
+            manifest[name] = vendor_stylesheet(name, sources.get(name, url))
+            print(f"   ✅ {name} → {manifest[name]}")
+        except (OSError, ValueError) as e:
+            manifest.pop(name, None)
+            print(f"   ⚠️  {name} non vendorisé ({e}) : le CDN restera utilisé")
+
+    # Le CSS personnalisé est reconstruit à chaque fois (source dans styles.py)
+    manifest['custom'] = write_fingerprinted('custom.css', custom_css_bytes())
+    print(f"   ✅ custom → {manifest['custom']}")
+
+    # Supprimer les anciennes versions (et polices) qui ne sont plus référencées
+    referenced = sorted({file for relative in manifest.values() for file in vendored_files(relative)})
+    for path in VENDOR_DIR.rglob('*'):
+        if path.is_file() and re.search(FINGERPRINTED_RE, path.name):
+            if path.relative_to(VENDOR_DIR).as_posix() not in referenced:
+                path.unlink()
+
+    kept = {file for name in invalid for file in vendored_files(manifest[name])}
+    manifest = {name: manifest[name] for name in [*REMOTE_STYLESHEETS, 'custom'] if name in manifest}
+    MANIFEST_PATH.write_text(json.dumps(manifest, indent=2) + "\n")
+    CHECKSUMS_PATH.write_text(''.join(
+        f"{checksums[file] if file in kept else sha256_file(VENDOR_DIR / file)}  {file}\n"
+        for file in referenced if file in checksums or file not in kept
+    ))
+    return manifest, invalid
+
+
+def parse_sources(values):
+    """['fontawesome=path/all.min.css', ...] -> {'fontawesome': 'path/all.min.css'}"""
+    sources = {}
+    for value in values:
+        name, sep, path = value.partition('=')
+        if not sep or name not in REMOTE_STYLESHEETS:
+            raise argparse.ArgumentTypeError(
+                f"--source attend NOM=CHEMIN avec NOM parmi {', '.join(REMOTE_STYLESHEETS)} : {value}")
+        sources[name] = path
+    return sources
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vérifie (hors ligne) ou vendorise les assets statiques")
+    parser.add_argument('--fetch', action='store_true',
+                        help="télécharge depuis le CDN les feuilles de style absentes ou invalides")
+    parser.add_argument('--refresh', action='store_true',
+                        help="retélécharge toutes les feuilles de style distantes")
+    parser.add_argument('--source', action='append', default=[], metavar='NOM=CHEMIN',
+                        help="vendorise NOM depuis un fichier de distribution local (polices relatives à ce fichier)")
+    parser.add_argument('--allow-cdn', action='store_true',
+                        help="code de sortie 0 même si une feuille de style reste servie par CDN (développement)")
+    args = parser.parse_args()
+    try:
+        sources = parse_sources(args.source)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+
+    print("\n" + "="*60)
+    print("📦 BUILD DES ASSETS STATIQUES")
+    print("="*60 + "\n")
+
+    manifest, invalid = build(fetch_missing=args.fetch, refresh=args.refresh, sources=sources)
+    missing = [name for name in REMOTE_STYLESHEETS if name not in manifest]
+
+    print("\n" + "="*60)
+    print(f"✅ {len(manifest)} feuille(s) de style dans {VENDOR_DIR}/ ({MANIFEST_PATH.name}, {CHECKSUMS_PATH.name})")
+    if missing:
+        print(f"{'⚠️ ' if args.allow_cdn else '❌'} Toujours servis par CDN : {', '.join(missing)}")
+    if invalid:
+        print(f"❌ Différent de {CHECKSUMS_PATH.name} : {', '.join(invalid)} (restaurer ou --fetch)")
+    print("="*60 + "\n")
+    return 1 if invalid or (missing and not args.allow_cdn) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
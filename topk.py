@@ -0,0 +1,196 @@
+"""
+Top-K par somme (Top Produits, Top Clients) sans groupby sur tout le jeu filtré
+- Clés codées en entiers (codes des colonnes category de full_dataset)
+- Classement par mois maintenu sous forme de sommes cumulées : une période de mois
+  entiers se lit en une soustraction, quel que soit le nombre de lignes
+- Les mois coupés par les dates du filtre sont ajoutés ligne à ligne (bincount)
+- Sélection des k premiers par argpartition (pas de tri complet)
+"""
+
+import numpy as np
+import pandas as pd
+
+from session_state import filter_positions
+
+# Dimensions filtrables du dashboard : colonne -> attribut de FilterState
+FILTER_DIMENSIONS = {'country': 'countries', 'categoryName': 'categories'}
+
+# Taille maximale des partitions (cellules mois x dimension x clé)
+DEFAULT_BUDGET_CELLS = 4_000_000
+
+
+def category_codes(column):
+    """(codes entiers, libellés) d'une colonne ; -1 = valeur manquante"""
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return column.cat.codes.to_numpy().astype(np.int32), column.cat.categories
+    codes, labels = pd.factorize(column, sort=True)
+    return codes.astype(np.int32), pd.Index(labels)
+
+
+def top_indices(totals, present, k):
+    """
+    Positions des k plus grandes valeurs parmi present, de la plus grande à la plus petite
+
+    Ex aequo départagés par position croissante, comme Series.nlargest(keep='first')
+    """
+    candidates = np.flatnonzero(present)
+    k = min(k, len(candidates))
+    if k == 0:
+        return candidates
+    values = totals[candidates]
+    threshold = values[np.argpartition(-values, k - 1)[:k]].min()
+    above = candidates[values > threshold]
+    tied = candidates[values == threshold][:k - len(above)]
+    chosen = np.concatenate([above, tied])
+    return chosen[np.lexsort((chosen, -totals[chosen]))]
+
+
+def top_k_rows(frame, key, k, value='lineTotal'):
+    """
+    k premières valeurs de key par somme de value sur les lignes de frame
+
+    Même résultat que groupby(key)[value].sum().nlargest(k), par bincount sur les codes
+    """
+    codes, labels = category_codes(frame[key])
+    values = np.nan_to_num(frame[value].to_numpy(dtype=np.float64))
+    keyed = codes >= 0
+    totals = np.bincount(codes[keyed], weights=values[keyed], minlength=len(labels))
+    counts = np.bincount(codes[keyed], minlength=len(labels))
+    chosen = top_indices(totals, counts > 0, k)
+    return pd.Series(totals[chosen], index=pd.Index(labels[chosen], name=key), name=value)
+
+
+class TopKIndex:
+    """
+    Classement de key par somme de value, par mois (et par dimension de filtre si besoin)
+
+    Pour chaque dimension filtrable (pays, catégorie) :
+    - si la clé la détermine (un produit n'a qu'une catégorie, un client qu'un pays), le
+      filtre devient un masque sur les clés
+    - sinon les partitions mensuelles sont découpées selon cette dimension, dans la limite
+      de budget_cells ; au-delà, un filtre sur cette dimension repasse par les lignes filtrées
+
+    Args:
+        dataset: full_dataset
+        month_index: MonthIndex de dataset['orderDate']
+    """
+
+    def __init__(self, dataset, month_index, key, value='lineTotal', budget_cells=DEFAULT_BUDGET_CELLS):
+        self.dataset = dataset
+        self.month_index = month_index
+        self.key = key
+        self.value = value
+        self.codes, self.labels = category_codes(dataset[key])
+        self.values = np.nan_to_num(dataset[value].to_numpy(dtype=np.float64))  # sum() ignore les NaN
+        n_keys = len(self.labels)
+        keyed = self.codes >= 0
+
+        # Dimensions déterminées par la clé (masque) ou découpant les partitions
+        self.key_dimension = {}
+        self.split = {}
+        self.dimension_labels = {}
+        split_cells = (month_index.n_months + 1) * n_keys
+        for column in FILTER_DIMENSIONS:
+            codes, labels = category_codes(dataset[column])
+            self.dimension_labels[column] = labels
+            pairs = np.unique(self.codes[keyed].astype(np.int64) * (len(labels) + 1) + codes[keyed] + 1)
+            if len(pairs) == len(np.unique(pairs // (len(labels) + 1))):
+                by_key = np.full(n_keys, -1, dtype=np.int32)
+                by_key[pairs // (len(labels) + 1)] = pairs % (len(labels) + 1) - 1
+                self.key_dimension[column] = by_key
+            elif split_cells * (len(labels) + 1) <= budget_cells:
+                self.split[column] = codes
+                split_cells *= len(labels) + 1
+
+        # Partitions : (mois, dimensions découpées..., clé) ; dernier indice = valeur manquante
+        shape = [month_index.n_months + 1] + [len(self.dimension_labels[c]) + 1 for c in self.split] + [n_keys]
+        cell = np.where(month_index.codes >= 0, month_index.codes, month_index.n_months).astype(np.int64)
+        for column, codes in self.split.items():
+            size = len(self.dimension_labels[column]) + 1
+            cell = cell * size + np.where(codes >= 0, codes, size - 1)
+        cell = cell * n_keys + self.codes
+
+        totals = np.bincount(cell[keyed], weights=self.values[keyed], minlength=int(np.prod(shape)))
+        counts = np.bincount(cell[keyed], minlength=int(np.prod(shape)))
+        totals, counts = totals.reshape(shape), counts.reshape(shape)
+
+        # Sommes cumulées sur les mois datés ; les lignes sans date à part
+        zeros = np.zeros((1,) + tuple(shape[1:]))
+        self.cumulative_totals = np.concatenate([zeros, np.cumsum(totals[:-1], axis=0)])
+        self.cumulative_counts = np.concatenate([zeros, np.cumsum(counts[:-1], axis=0)]).astype(np.int32)
+        self.undated_totals, self.undated_counts = totals[-1], counts[-1]
+
+    def memory_usage(self):
+        return self.cumulative_totals.nbytes + self.cumulative_counts.nbytes
+
+    def _selection(self, column, selected):
+        """Indices retenus d'une dimension découpée (None : toutes, y compris manquante)"""
+        labels = self.dimension_labels[column]
+        if selected is None:
+            return np.arange(len(labels) + 1)
+        return np.flatnonzero(labels.isin(list(selected)))
+
+    def query(self, state, k, filtered=None):
+        """
+        k premières clés sous state (FilterState)
+
+        Args:
+            filtered: lignes déjà filtrées (optionnel), utilisées si un filtre porte sur
+                une dimension ni masquable ni découpée
+
+        Returns:
+            Series (index : libellés de la clé, valeurs : sommes), par valeur décroissante
+        """
+        uncovered = [column for column, attr in FILTER_DIMENSIONS.items()
+                     if getattr(state, attr) is not None
+                     and column not in self.key_dimension and column not in self.split]
+        if uncovered:
+            return self._query_rows(state, k, filtered)
+
+        n_keys = len(self.labels)
+        full_months, partial_months = self.month_index.coverage(state)
+        selection = tuple(self._selection(column, getattr(state, FILTER_DIMENSIONS[column])) for column in self.split)
+        split_axes = tuple(range(len(self.split)))
+
+        def reduce(cells):
+            return cells[np.ix_(*selection)].sum(axis=split_axes) if selection else cells
+
+        # Mois entiers : contigus, lus dans les sommes cumulées
+        totals, counts = np.zeros(n_keys), np.zeros(n_keys, dtype=np.int64)
+        if len(full_months):
+            first, last = full_months[0], full_months[-1] + 1
+            totals += reduce(self.cumulative_totals[last] - self.cumulative_totals[first])
+            counts += reduce(self.cumulative_counts[last] - self.cumulative_counts[first])
+        if state.start is None and state.end is None:
+            totals += reduce(self.undated_totals)
+            counts += reduce(self.undated_counts)
+
+        # Mois coupés : leurs lignes seulement
+        edge = filter_positions(self.dataset, state, self.month_index.rows(partial_months))
+        edge = edge[self.codes[edge] >= 0]
+        totals += np.bincount(self.codes[edge], weights=self.values[edge], minlength=n_keys)
+        counts += np.bincount(self.codes[edge], minlength=n_keys)
+
+        # Dimensions déterminées par la clé : masque
+        present = counts > 0
+        for column, by_key in self.key_dimension.items():
+            selected = getattr(state, FILTER_DIMENSIONS[column])
+            if selected is not None:
+                present &= np.isin(by_key, self._selection(column, selected))
+        return self._series(totals, present, k)
+
+    def _query_rows(self, state, k, filtered=None):
+        """Repli : bincount sur les lignes filtrées"""
+        if filtered is not None:
+            return top_k_rows(filtered, self.key, k, self.value)
+        positions = filter_positions(self.dataset, state)
+        codes, values = self.codes[positions], self.values[positions]
+        keyed = codes >= 0
+        n_keys = len(self.labels)
+        totals = np.bincount(codes[keyed], weights=values[keyed], minlength=n_keys)
+        counts = np.bincount(codes[keyed], minlength=n_keys)
+        return self._series(totals, counts > 0, k)
+
+    def _series(self, totals, present, k):
+        chosen = top_indices(totals, present, k)
+        return pd.Series(totals[chosen], index=pd.Index(self.labels[chosen], name=self.key), name=self.value)
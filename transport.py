@@ -0,0 +1,137 @@
+"""
+Allègement des réponses envoyées au navigateur
+- Figures Plotly : tableaux numériques encodés en binaire base64 (typed arrays plotly.js)
+- Réponses Flask/Dash : compression brotli ou gzip selon le navigateur
+- Layout Dash : sérialisé une seule fois, revalidé par ETag
+"""
+
+import base64
+import hashlib
+import threading
+
+import numpy as np
+from flask import Response, request
+from plotly.io.json import to_json_plotly
+
+try:
+    from flask_compress import Compress
+    COMPRESS_AVAILABLE = True
+except ImportError:
+    COMPRESS_AVAILABLE = False
+
+# Attributs de trace susceptibles de porter de longues séries numériques
+TRACE_ARRAY_KEYS = ('x', 'y', 'z', 'values', 'customdata', 'lat', 'lon')
+MARKER_ARRAY_KEYS = ('color', 'size')
+
+COMPRESS_MIMETYPES = [
+    'application/json',
+    'application/javascript',
+    'text/html',
+    'text/css',
+    'text/javascript'
+]
+
+
+def encode_array(values):
+    """
+    Encode un tableau numérique au format typed array de plotly.js
+
+    Returns:
+        {'dtype': ..., 'bdata': base64} ou None si le tableau n'est pas numérique
+    """
+    if isinstance(values, dict):  # déjà encodé (plotly >= 6)
+        return None
+
+    array = np.asarray(values)
+    if array.ndim != 1 or array.dtype.kind not in 'iuf':
+        return None
+
+    if array.dtype.kind in 'iu' and array.size and np.abs(array).max() < 2**31:
+        array = array.astype('<i4')
+        dtype = 'i4'
+    else:
+        array = array.astype('<f8')
+        dtype = 'f8'
+
+    return {'dtype': dtype, 'bdata': base64.b64encode(array.tobytes()).decode('ascii')}
+
+
+def encode_figure(fig):
+    """
+    Convertit une figure Plotly en dict dont les séries numériques sont binaires
+
+    Les tableaux de nombres (x, y, values, marker.color...) sont envoyés en base64
+    au lieu de listes JSON : ~8 octets par point au lieu de ~18, et plus de
+    parsing JSON nombre par nombre côté navigateur.
+    """
+    figure = fig.to_plotly_json() if hasattr(fig, 'to_plotly_json') else dict(fig)
+
+    for trace in figure.get('data', []):
+        for key in TRACE_ARRAY_KEYS:
+            if key in trace and not isinstance(trace[key], (str, int, float)):
+                encoded = encode_array(trace[key])
+                if encoded is not None:
+                    trace[key] = encoded
+
+        marker = trace.get('marker')
+        if isinstance(marker, dict):
+            for key in MARKER_ARRAY_KEYS:
+                if key in marker and not isinstance(marker[key], (str, int, float)):
+                    encoded = encode_array(marker[key])
+                    if encoded is not None:
+                        marker[key] = encoded
+
+    return figure
+
+
+def enable_compression(server, brotli_level=4, gzip_level=6, min_size=500):
+    """
+    Active la compression des réponses (HTML, JSON des callbacks, assets)
+
+    Brotli est proposé en premier avec un niveau modéré : le niveau par défaut (11)
+    coûte trop de CPU pour des réponses générées à chaque requête.
+
+    Returns:
+        True si flask-compress est installé et la compression activée
+    """
+    if not COMPRESS_AVAILABLE:
+        return False
+
+    server.config.update(
+        COMPRESS_ALGORITHM=['br', 'gzip'],
+        COMPRESS_BR_LEVEL=brotli_level,
+        COMPRESS_LEVEL=gzip_level,
+        COMPRESS_MIN_SIZE=min_size,
+        COMPRESS_MIMETYPES=COMPRESS_MIMETYPES
+    )
+    Compress(server)
+    return True
+
+
+def cache_layout_response(app):
+    """
+    Sert /_dash-layout depuis une sérialisation faite une seule fois
+
+    Dash resérialise tout l'arbre de composants (les trois pages, et la table
+    pré-agrégée en mode clientside) à chaque chargement de page. Le layout de
+    l'application étant statique, le JSON est calculé au premier appel puis
+    réutilisé ; un ETag permet au navigateur de recevoir un 304 sans corps.
+    """
+    endpoint = app.config.routes_pathname_prefix + '_dash-layout'
+    lock = threading.Lock()
+    cached = {}
+
+    def serve_cached_layout():
+        if 'body' not in cached:
+            with lock:
+                if 'body' not in cached:
+                    body = to_json_plotly(app._layout_value()).encode('utf-8')
+                    cached['etag'] = hashlib.md5(body).hexdigest()
+                    cached['body'] = body
+
+        response = Response(cached['body'], mimetype='application/json')
+        response.set_etag(cached['etag'])
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
+
+    app.server.view_functions[endpoint] = serve_cached_layout